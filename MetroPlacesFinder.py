@@ -16,9 +16,35 @@ Assignment: Final Project, DC Travel Guide
 Date: 4/19/2025
 
 """
-#pip install requests
-import requests
+import functools
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+#numpy (geo_utils) and requests (http_transport) are imported where they are first needed, so starting
+#the program and answering from the cache never pays for loading them
+from activity_categories import place_types
+from instrumentation import get_metrics
+from places import Place, PlaceColumns, with_score
+import places_new_api
+from rate_limiter import INTERACTIVE, get_default_scheduler
+from ranking import PlaceScorer
+from response_cache import ResponseCache
+from station_coordinates import lookup_station_coordinates
+
+#Google Maps API endpoints used by the finder
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+NEARBY_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+#seconds to wait before a Nearby Search next_page_token becomes valid
+PAGE_TOKEN_DELAY = 2.0
+
+#the Distance Matrix API allows at most 25 destinations per request
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+
+logger = logging.getLogger(__name__)
 
 def load_api_key(filepath= "google_api_key.txt"):
     """ This function loads the Google API key from a local file
@@ -34,22 +60,172 @@ def load_api_key(filepath= "google_api_key.txt"):
     with open(filepath, "r") as f:
         return f.read().strip()
 
+@functools.lru_cache(maxsize=None)
+def get_api_key(filepath="google_api_key.txt"):
+    """ This function loads the Google API key the first time it is asked for, then keeps it for the rest of the process.
+
+        Args:
+            filepath(str): path to the file containing the API key. Default is "google_api_key.txt"
+
+        Returns:
+            str: the API key as a string
+        """
+    return load_api_key(filepath)
+
 class MetroPlacesFinder:
     """A class for finding and recommending places in the near the Washingotn, DC 
     Metro Green Line based on user preferences such as type of activity and walking distance from the metro.
     """
 
-    def __init__(self, metro_stop_name, api_key):
+    def __init__(self, metro_stop_name, api_key=None, cache=None, transport=None, metrics=None, scheduler=None):
         """ This method will initialize the MetroPlacesFinder object
         
         Args: 
             metro_stop_name (str): the name of the metro green line stop.
-            api_key (str): Google Maps API ky
+            api_key (str): Google Maps API ky. Default is None, which reads google_api_key.txt (once per process)
+                just before the first request is sent
+            cache (ResponseCache): optional response cache checked before every API call. Default is None (no caching)
+            transport (HttpTransport): object used to send requests. Default is None, which uses the
+                pooled transport shared by all finders, created (and requests imported) on the first request
+            metrics (Metrics): where stage timings and call counters are recorded. Default is None, which
+                uses the metrics shared by the whole process
+            scheduler (RequestScheduler): rate limiter every request waits on. Default is None, which uses
+                the scheduler shared by all finders
         """
         self.metro_stop_name = metro_stop_name
-        self.api_key = api_key
+        self._api_key = api_key
+        self.cache = cache
+        self._transport = transport
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.scheduler = scheduler if scheduler is not None else get_default_scheduler()
+        #requests of a background refresh set this to rate_limiter.BACKGROUND so they wait behind interactive ones
+        self.priority = INTERACTIVE
+        #"new" searches with the field-masked Places API (New), falling back to "legacy" if it fails
+        self.nearby_search_api = "legacy"
+        #stages whose fields the Places API (New) is asked for, see places_new_api.FIELDS_BY_STAGE
+        self.enabled_stages = places_new_api.DEFAULT_STAGES
         self.places_data = []
-        self.location = self.get_location_coordinates()
+        #number of HTTP calls made to each Google endpoint by this finder
+        self.api_call_counts = {"geocode": 0, "nearbysearch": 0, "distancematrix": 0}
+        self._counts_lock = threading.Lock()
+        #places checked by the straight-line prefilter, and how many it dropped (each one is a Distance Matrix element not paid for)
+        self.prefilter_counts = {"checked": 0, "dropped": 0}
+        self.page_token_delay = PAGE_TOKEN_DELAY
+        #the stop's coordinates are looked up the first time self.location is used
+        self._location = None
+        self._location_resolved = False
+
+    @property
+    def api_key(self):
+        """str: the Google Maps API key, read with get_api_key the first time a request needs it."""
+        if self._api_key is None:
+            self._api_key = get_api_key()
+        return self._api_key
+
+    @api_key.setter
+    def api_key(self, value):
+        self._api_key = value
+
+    @property
+    def transport(self):
+        """HttpTransport: the object used to send requests, the shared one if none was given."""
+        if self._transport is None:
+            from http_transport import get_default_transport
+            self._transport = get_default_transport()
+        return self._transport
+
+    @transport.setter
+    def transport(self, value):
+        self._transport = value
+
+    @property
+    def location(self):
+        """ dict or None: the 'lat' and 'lng' of the metro stop. The built-in Green Line station table
+        is checked first, and the Geocoding API is only called for stops that are not in it.
+        """
+        if not self._location_resolved:
+            self._location = lookup_station_coordinates(self.metro_stop_name)
+            if self._location is None:
+                self._location = self.get_location_coordinates()
+            self._location_resolved = True
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = value
+        self._location_resolved = True
+
+    def _get_json(self, url, params, endpoint, cache_params=None, fresh=False):
+        """ This method sends a GET request to a Google endpoint and counts the call.
+        If the finder has a cache, a fresh cached response is returned instead and no call is made.
+        Cache hits and misses, calls and Distance Matrix elements (the billed unit) go to self.metrics.
+        Every HTTP call is counted, including ones Google refused with OVER_QUERY_LIMIT, but only answered
+        Distance Matrix elements are.
+        Every call waits its turn in self.scheduler, which also retries OVER_QUERY_LIMIT answers.
+
+        Args:
+            url (str): the endpoint url
+            params (dict): query parameters for the request, without the API key, which is added when it is sent
+            endpoint (str): short endpoint name used for counting, ie: "distancematrix"
+            cache_params (dict): parameters the response is cached under instead of params, ie: for a
+                result page whose page token changes every time. Default is None (params)
+            fresh (bool): whether to send the request even if the cache has a response. The new response
+                is still stored. Default is False.
+
+        Returns:
+            dict: the decoded JSON response
+
+        Raises:
+            RateLimitError: if Google keeps answering OVER_QUERY_LIMIT or a daily quota is reached
+        """
+        return self._send_request(endpoint, params if cache_params is None else cache_params,
+                                  lambda: self.transport.get_json(url, {**params, "key": self.api_key}), fresh)
+
+    def _post_json(self, url, body, field_mask, endpoint):
+        """ This method sends a POST request to the Places API (New), the same way _get_json sends a GET request.
+
+        Args:
+            url (str): the endpoint url
+            body (dict): the JSON request body
+            field_mask (str): the fields to return, sent as X-Goog-FieldMask
+            endpoint (str): short endpoint name used for counting, ie: "places_new_nearby"
+
+        Returns:
+            dict: the decoded JSON response
+        """
+        return self._send_request(endpoint, places_new_api.cache_params(body, field_mask),
+                                  lambda: self.transport.post_json(url, body, {"X-Goog-Api-Key": self.api_key,
+                                                                              "X-Goog-FieldMask": field_mask}))
+
+    def _send_request(self, endpoint, params, send, fresh=False):
+        """Checks the cache, counts the call and sends it through the scheduler (see _get_json)."""
+        if self.cache is not None and not fresh:
+            cached = self.cache.get(endpoint, params)
+            if cached is not None:
+                self.metrics.increment(f"cache_hits.{endpoint}")
+                return cached
+            self.metrics.increment(f"cache_misses.{endpoint}")
+
+        cost = 1
+        if endpoint == "distancematrix":
+            #billed and rate limited per origin x destination pair
+            cost = len(params["origins"].split("|")) * len(params["destinations"].split("|"))
+
+        def counted_send():
+            #runs only once the scheduler has let the request through, and again for each of its retries
+            with self._counts_lock:
+                self.api_call_counts[endpoint] = self.api_call_counts.get(endpoint, 0) + 1
+            self.metrics.increment(f"http_calls.{endpoint}")
+            return send()
+
+        response = self.scheduler.request(endpoint, counted_send, cost, self.priority)
+        if endpoint == "distancematrix":
+            #the billed unit, so only elements Google actually answered are counted
+            self.metrics.increment("distancematrix_elements", cost)
+
+        if self.cache is not None:
+            self.cache.set(endpoint, params, response)
+        return response
 
     def get_location_coordinates(self):
         """ This method uses the Geocoding API to get latitude and longitude coordinates
@@ -58,180 +234,564 @@ class MetroPlacesFinder:
         Returns:
             dict or None: a dictionary with 'lat' and 'lng' if successful, otherwise, None
         """
-        geo_url = f"https://maps.googleapis.com/maps/api/geocode/json"
-        parameters = {
-            "address": f"{self.metro_stop_name} Metro Station, DMV Area", 
-            "key": self.api_key
+        with self.metrics.span("geocode"):
+            response = self._get_json(GEOCODE_URL, self._geocode_params(), "geocode")
+            return self._parse_geocode_response(response)
+
+    def _geocode_params(self):
+        """Builds the Geocoding API parameters for the metro stop."""
+        return {
+            "address": f"{self.metro_stop_name} Metro Station, DMV Area"
         }
-        response = requests.get(geo_url, params=parameters).json()
-        
+
+    def _parse_geocode_response(self, response):
+        """ This method picks the coordinates out of a Geocoding API response.
+
+        Returns:
+            dict or None: a dictionary with 'lat' and 'lng' if successful, otherwise, None
+        """
         if response["results"]:
             location = response["results"][0]["geometry"]["location"]
-            print("Location Coordinates:", location)  
+            logger.debug("Location coordinates for %s: %s", self.metro_stop_name, location)
             return location
         return None
     
-    def get_nearby_places(self, radius_meters=5000, included_types=["tourist_attraction"]):
-        """This method uses the Google Nearby Search (New) API to get retrieve nearby places within a certain
-        radius of the Metro stop.
+    def get_nearby_places(self, radius_meters=5000, included_types=["tourist_attraction"], max_pages=1,
+                          enough=None, qualifies=None, per_type=False, max_workers=10):
+        """This method uses the Google Nearby Search API to get retrieve nearby places within a certain
+        radius of the Metro stop. Any places from an earlier call are replaced.
+        See iter_nearby_places for which API is used.
 
         Args:
-            radius_meters(int): radius around the metro station in meters to search. Default is 1000.
+            radius_meters(int): radius around the metro station in meters to search. Default is 5000.
             included_types(list): List of place types to include in the search. Default is ["tourist_attraction"]
+            max_pages(int): most result pages (up to 20 places each) to fetch. Default is 1.
+            enough(int): stop fetching pages once this many places qualify. Default is None (no early stop)
+            qualifies(callable): function of a place that says whether it counts toward enough.
+                Default is None, which counts every place
+            per_type(bool): search each type on its own, at the same time, and merge the results
+                (see search_each_type). enough and qualifies are not used then. Default is False.
+            max_workers(int): most type searches in flight at once when per_type is True. Default is 10.
 
         Returns:
             self.places_data(list): a list of dictionaries with information about each place found
         """
+        self.places_data = []
         if not self.location:
-            print("Error: Could not get location coordinates.")
+            logger.error("Could not get location coordinates for %s.", self.metro_stop_name)
             return
 
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        #headers = {
-            #"Content-Type": "application/json",
-            #"Google-Api-Key": self.api_key,
-            #"Google-FieldMask": "places.displayName,places.primaryType,places.location"
-            #Field masks are a way for API callers to list fields that a request should return or update. 
-            #Using a FieldMask allows the API to avoid unnecessary work and improves performance
-        #} 
+        if per_type:
+            with self.metrics.span("nearby_search"):
+                self.places_data = self.search_each_type(radius_meters, included_types, max_pages, max_workers)
+            logger.debug("Found %d places near %s", len(self.places_data), self.metro_stop_name)
+            return self.places_data
+
+        qualifying = 0
+        with self.metrics.span("nearby_search"):
+            for place in self.iter_nearby_places(radius_meters, included_types, max_pages=max_pages):
+                self.places_data.append(place)
+                if enough is not None and (qualifies is None or qualifies(place)):
+                    qualifying += 1
+                    if qualifying >= enough:
+                        #stops here so the next page is never requested
+                        break
+
+        logger.debug("Found %d places near %s", len(self.places_data), self.metro_stop_name)
+        return self.places_data
+
+    def iter_nearby_places(self, radius_meters=5000, included_types=["tourist_attraction"], max_pages=3):
+        """This method yields nearby places one at a time, following next_page_token to later pages.
+        A page is only requested once every place on the page before it has been used, so a caller
+        that stops early never pays for pages it does not need. Places already yielded (same place_id)
+        are skipped.
+
+        If self.nearby_search_api is "new", one field-masked Places API (New) request is sent instead
+        (it has no later pages, so max_pages is not used). If that request fails, the finder switches
+        to the legacy endpoint.
 
+        Args:
+            radius_meters(int): radius around the metro station in meters to search. Default is 5000.
+            included_types(list): List of place types to include in the search. Default is ["tourist_attraction"]
+            max_pages(int): most result pages to fetch. Google returns at most 3. Default is 3.
+
+        Yields:
+            dict: information about one place
+        """
+        if not self.location:
+            logger.error("Could not get location coordinates for %s.", self.metro_stop_name)
+            return
+
+        if self.nearby_search_api == "new":
+            response = self._search_nearby_new(radius_meters, included_types)
+            if "error" not in response:
+                places = [places_new_api.parse_place(result) for result in response.get("places", [])]
+                self.metrics.increment("places_parsed.places_new_nearby", len(places))
+                yield from places
+                return
+            logger.warning("Places API (New) failed (%s), falling back to the legacy Nearby Search.",
+                           response["error"].get("message"))
+            self.nearby_search_api = "legacy"
+
+        seen_place_ids = set()
+        params = self._nearby_search_params(radius_meters, included_types)
+        #a page token only works for a short time, so a token read from the cache is never sent. Later pages
+        #are cached under the search parameters plus their page number instead of under their token
+        token_is_fresh = not self._is_cached("nearbysearch", params)
+        # Make the GET request
+        response = self._get_json(NEARBY_SEARCH_URL, params, "nearbysearch")
+        for page in range(max_pages):
+            if page:
+                page_params = {**params, "page": page}
+                if not self._is_cached("nearbysearch", page_params) and not token_is_fresh:
+                    response = self._refresh_page_token(params, page)
+                    if response is None:
+                        return
+                token_is_fresh = not self._is_cached("nearbysearch", page_params)
+                response = self._get_next_page(response["next_page_token"], page_params)
+
+            self.metrics.increment("places_parsed.nearbysearch", len(response.get("results", [])))
+            for result in response.get("results", []):
+                place = self._parse_nearby_result(result)
+                if place["place_id"] is not None:
+                    if place["place_id"] in seen_place_ids:
+                        continue
+                    seen_place_ids.add(place["place_id"])
+                yield place
+
+            if not response.get("next_page_token") or page + 1 >= max_pages:
+                return
+
+    def search_each_type(self, radius_meters=5000, included_types=["tourist_attraction"], max_pages=1, max_workers=10):
+        """This method sends one nearby search per Google type instead of one search for "a|b|c", which the
+        legacy endpoint does not filter reliably. The searches run at the same time, except for types
+        whose first page is already in the cache, which are read from it without waiting for a thread.
+        Results are merged in the order of included_types, keeping one place per place_id, and every
+        place gets a "matched_types" list of the searched types that returned it.
+
+        Args:
+            radius_meters(int): radius around the metro station in meters to search. Default is 5000.
+            included_types(list): Google place types, each searched on its own. Default is ["tourist_attraction"]
+            max_pages(int): most result pages per type. Default is 1.
+            max_workers(int): most searches in flight at once. Default is 10, the size of
+                HttpTransport's connection pool.
+
+        Returns:
+            list: the merged places
+        """
+        place_types = list(dict.fromkeys(included_types))
+
+        def search(place_type):
+            return list(self.iter_nearby_places(radius_meters, [place_type], max_pages=max_pages))
+
+        results = {}
+        if self.cache is not None:
+            for place_type in place_types:
+                if self._is_cached("nearbysearch", self._nearby_search_params(radius_meters, [place_type])):
+                    results[place_type] = search(place_type)
+            self.metrics.increment("nearby_types_cached", len(results))
+
+        remaining = [place_type for place_type in place_types if place_type not in results]
+        if max_workers > 1 and len(remaining) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(remaining))) as pool:
+                results.update(zip(remaining, pool.map(search, remaining)))
+        else:
+            results.update((place_type, search(place_type)) for place_type in remaining)
+
+        merged = {}
+        for place_type in place_types:
+            for place in results[place_type]:
+                #places without an id cannot be matched up, so each one is kept
+                key = place["place_id"] if place["place_id"] is not None else id(place)
+                if key in merged:
+                    merged[key]["matched_types"].append(place_type)
+                else:
+                    place["matched_types"] = [place_type]
+                    merged[key] = place
+        return list(merged.values())
+
+    def _is_cached(self, endpoint, params):
+        """Checks whether the cache has a fresh response for a request, without counting a hit or miss."""
+        return self.cache is not None and (endpoint, params) in self.cache
+
+    def _get_next_page(self, next_page_token, page_params, fresh=False):
+        """ This method gets one later page of a Nearby Search. Google only activates a token a couple of
+        seconds after handing it out and returns INVALID_REQUEST before that, so the request waits first
+        and is tried again a few times. A page that is already in the cache is returned without waiting.
+
+        Args:
+            next_page_token (str): the token from the page before
+            page_params (dict): the search parameters plus "page", used as the cache key
+            fresh (bool): whether to send the request even if the page is cached. Default is False.
+
+        Returns:
+            dict: the decoded JSON response
+        """
+        request = {"pagetoken": next_page_token}
+        if fresh or not self._is_cached("nearbysearch", page_params):
+            time.sleep(self.page_token_delay)
+        response = self._get_json(NEARBY_SEARCH_URL, request, "nearbysearch", page_params, fresh)
+        retries = 0
+        while response.get("status") == "INVALID_REQUEST" and retries < 3:
+            time.sleep(self.page_token_delay)
+            response = self._get_json(NEARBY_SEARCH_URL, request, "nearbysearch", page_params, fresh)
+            retries += 1
+        return response
+
+    def _refresh_page_token(self, params, page):
+        """ This method searches again up to the page before page, skipping the cache, to get a token that
+        still works. It is used when the pages before page came from the cache and page did not.
+
+        Args:
+            params (dict): the first page's search parameters
+            page (int): the page that needs a token, 1 or more
+
+        Returns:
+            dict or None: the new response of page - 1, or None if the search now has fewer pages
+        """
+        response = self._get_json(NEARBY_SEARCH_URL, params, "nearbysearch", fresh=True)
+        for earlier in range(1, page):
+            if not response.get("next_page_token"):
+                return None
+            response = self._get_next_page(response["next_page_token"], {**params, "page": earlier}, fresh=True)
+        return response if response.get("next_page_token") else None
+
+    def _search_nearby_new(self, radius_meters, included_types):
+        """ This method sends one Places API (New) searchNearby request for the fields of self.enabled_stages.
+
+        Args:
+            radius_meters(int): radius around the metro station in meters to search
+            included_types(list): List of place types to include in the search
+
+        Returns:
+            dict: the decoded response, with a "places" list or an "error"
+        """
+        body = places_new_api.search_nearby_body(self.location, radius_meters, included_types)
+        field_mask = places_new_api.build_field_mask(self.enabled_stages)
+        return self._post_json(places_new_api.SEARCH_NEARBY_URL, body, field_mask, "places_new_nearby")
+
+    def _nearby_search_params(self, radius_meters, included_types):
+        """Builds the Nearby Search parameters for the metro stop."""
         # Parameters for the GET request
-        params = {
+        return {
             "location": f"{self.location['lat']},{self.location['lng']}",  # coordinates from Geocoding API
             "radius": radius_meters,  # search radius in meters
-            "types": "|".join(included_types),  # type of places to filter (comma-separated list)
-            "key": self.api_key  # your API key
+            "types": "|".join(included_types)  # type of places to filter (comma-separated list)
         }
 
-        # Make the GET request
-        response = requests.get(url, params=params).json()
-        #print("API Response:", response)
+    def _parse_nearby_result(self, place):
+        """ This method keeps the fields we use from one Nearby Search result.
+
+        Args:
+            place (dict): one entry of the response's "results" list
 
-        if "results" in response:
-            for place in response["results"]:
-                self.places_data.append({
-                    "name": place.get("name", "Unknown Name"),
-                    "type_of_activity": place.get("types", ["Unknown Type of Activity"])[0],
-                    "location": place.get("geometry", {}).get("location", {})
-                })  
+        Returns:
+            Place: the place's place_id, name, type_of_activity (its first Google type), location
+                and types (all of its Google types)
+        """
+        types = place.get("types", ["Unknown Type of Activity"])
+        return Place(
+            place.get("place_id"),
+            place.get("name", "Unknown Name"),
+            types[0],
+            place.get("geometry", {}).get("location", {}),
+            types=types,
+        )
+
+    def straight_line_distance(self, place):
+        """ This method gives the great-circle distance from the metro stop to one place.
 
-        #print("Processed Places Data:", self.places_data)
+        Args:
+            place (dict): a place with a "location" dictionary
 
-    def calculate_walking_distance(self):
+        Returns:
+            float: distance in meters, or infinity if the place or the stop has no coordinates
+        """
+        location = place.get("location")
+        if not location or not self.location:
+            return float('inf')
+        from geo_utils import haversine_meters
+        return float(haversine_meters(self.location, [location.get("lat")], [location.get("lng")])[0])
+
+    def prefilter_by_straight_line(self, max_walking_distance):
+        """ This method drops places whose straight-line distance from the metro stop is already longer than
+        the maximum walking distance, since no walking route can be shorter than a straight line.
+        The remaining places are ordered from closest to farthest and get a "straight_line_distance" key.
+        Places without coordinates are kept at the end for calculate_walking_distance to report.
+        A PlaceColumns is filtered and reordered the same way, without the "straight_line_distance" column.
+
+        Args:
+            max_walking_distance (float): maximum walking distance allowed (in meters)
+
+        Returns:
+            int: number of places dropped
+        """
+        if isinstance(self.places_data, PlaceColumns):
+            return self._prefilter_columns(max_walking_distance)
+
+        located = [place for place in self.places_data if place.get("location")]
+        unlocated = [place for place in self.places_data if not place.get("location")]
+        if not located or not self.location:
+            return 0
+
+        from geo_utils import haversine_meters
+
+        distances = haversine_meters(
+            self.location,
+            [place["location"].get("lat") for place in located],
+            [place["location"].get("lng") for place in located],
+        )
+        order = distances.argsort(kind="stable")
+        kept = []
+        for index in order:
+            if distances[index] > max_walking_distance:
+                break
+            located[index]["straight_line_distance"] = float(distances[index])
+            kept.append(located[index])
+
+        dropped = len(located) - len(kept)
+        self.prefilter_counts["checked"] += len(located)
+        self.prefilter_counts["dropped"] += dropped
+        self.places_data = kept + unlocated
+        return dropped
+
+    def _prefilter_columns(self, max_walking_distance):
+        """prefilter_by_straight_line for places stored as a PlaceColumns."""
+        import numpy as np
+        from geo_utils import haversine_meters
+
+        columns = self.places_data
+        has_location = ~np.isnan(columns.lats)
+        located = np.flatnonzero(has_location)
+        if not len(located) or not self.location:
+            return 0
+
+        distances = haversine_meters(self.location, columns.lats[located], columns.lngs[located])
+        order = distances.argsort(kind="stable")
+        kept = located[order[distances[order] <= max_walking_distance]]
+
+        dropped = len(located) - len(kept)
+        self.prefilter_counts["checked"] += len(located)
+        self.prefilter_counts["dropped"] += dropped
+        self.places_data = columns.take(np.concatenate([kept, np.flatnonzero(~has_location)]))
+        return dropped
+
+    def calculate_walking_distance(self, batch_size=DISTANCE_MATRIX_MAX_DESTINATIONS, max_workers=4,
+                                   max_walking_distance=None):
         """
         This method calculates the walking distance for each destination using the Distance Matrix API.
-        
+        Destinations are packed into batches so one request covers up to 25 places, and batches
+        are sent at the same time. self.places_data can be a list of places or a PlaceColumns.
+
+        Args:
+            batch_size (int): number of destinations per request, capped at 25. Default is 25.
+            max_workers (int): number of batch requests allowed in flight at once. Default is 4.
+            max_walking_distance (float): if given (in meters), places that are farther than this in a
+                straight line are dropped first with prefilter_by_straight_line. Default is None.
         """
 
-        if not self.places_data:
-            print("Error: No places data to calculate the distances")
-            return
-        
-        distance_url = "https://maps.googleapis.com/maps/api/distancematrix/json"
+        with self.metrics.span("walking_distance"):
+            if max_walking_distance is not None:
+                self.prefilter_by_straight_line(max_walking_distance)
+
+            if not len(self.places_data):
+                logger.error("No places data to calculate the distances for %s.", self.metro_stop_name)
+                return
+
+            if isinstance(self.places_data, PlaceColumns):
+                self._walking_distance_columns(batch_size, max_workers)
+            else:
+                batches = self._distance_batches(batch_size)
+                responses = self._fetch_distance_batches([self._distance_params(batch) for batch in batches], max_workers)
+                for batch, response in zip(batches, responses):
+                    self._apply_distance_elements(batch, response)
+
+        logger.debug("Updated %d places with walking distances", len(self.places_data))
+
+    def _fetch_distance_batches(self, params_list, max_workers):
+        """ This method sends Distance Matrix requests, up to max_workers at the same time.
+
+        Args:
+            params_list (list): parameters of each request
+            max_workers (int): number of requests allowed in flight at once
+
+        Returns:
+            list: the decoded responses, in the same order as params_list
+        """
+        def fetch_batch(params):
+            return self._get_json(DISTANCE_MATRIX_URL, params, "distancematrix")
 
+        if max_workers > 1 and len(params_list) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(params_list))) as pool:
+                return list(pool.map(fetch_batch, params_list))
+        return [fetch_batch(params) for params in params_list]
+
+    def _walking_distance_columns(self, batch_size, max_workers):
+        """ This method is the walking distance stage for places stored as a PlaceColumns. Coordinates are
+        read from its arrays and distances are written into its walking_distances array, so no Place is built.
+
+        Args:
+            batch_size (int): number of destinations per request, capped at 25
+            max_workers (int): number of batch requests allowed in flight at once
+        """
+        import numpy as np
+
+        columns = self.places_data
+        routable = np.flatnonzero(~np.isnan(columns.lats) & ~np.isnan(columns.lngs))
+        if len(routable) < len(columns):
+            logger.info("Skipping %d places due to missing coordinates.", len(columns) - len(routable))
+
+        batch_size = max(1, min(batch_size, DISTANCE_MATRIX_MAX_DESTINATIONS))
+        batches = [routable[i:i + batch_size] for i in range(0, len(routable), batch_size)]
+        responses = self._fetch_distance_batches(
+            [self._coordinates_params(columns.lats[batch].tolist(), columns.lngs[batch].tolist()) for batch in batches],
+            max_workers)
+
+        for batch, response in zip(batches, responses):
+            for position, index in enumerate(batch):
+                try:
+                    element = response['rows'][0]['elements'][position]
+                    if element.get("status") == "OK":
+                        columns.walking_distances[index] = element['distance']['value']
+                        continue
+                    logger.info("Distance data not available for '%s', status: %s", columns.names[index], element.get('status'))
+                except (IndexError, KeyError) as e:
+                    logger.warning("Error processing distance for '%s': %s", columns.names[index], e)
+                columns.walking_distances[index] = float('inf')  # Consider unreachable
+
+    def _distance_batches(self, batch_size):
+        """ This method splits the places that have coordinates into Distance Matrix batches.
+
+        Args:
+            batch_size (int): number of destinations per request, capped at 25
+
+        Returns:
+            list: lists of places, each small enough for one request
+        """
+        routable_places = []
         for place in self.places_data:
             location = place.get("location")
             if not location:
-                print(f"Skipping place '{place.get('name')}' due to missing coordinates.")
+                logger.info("Skipping place '%s' due to missing coordinates.", place.get('name'))
                 continue
+            routable_places.append(place)
+
+        batch_size = max(1, min(batch_size, DISTANCE_MATRIX_MAX_DESTINATIONS))
+        return [routable_places[i:i + batch_size] for i in range(0, len(routable_places), batch_size)]
+
+    def _distance_params(self, batch):
+        """Builds the Distance Matrix parameters for walking from the metro stop to a batch of places."""
+        return self._coordinates_params([place['location'].get('lat') for place in batch],
+                                        [place['location'].get('lng') for place in batch])
+
+    def _coordinates_params(self, lats, lngs):
+        """Builds the Distance Matrix parameters for walking from the metro stop to each (lat, lng) pair."""
+        return {
+            "origins": f"{self.location['lat']},{self.location['lng']}",
+            "destinations": "|".join(f"{lat},{lng}" for lat, lng in zip(lats, lngs)),
+            "mode": "walking"
+        }
 
-            destination = f"{location.get('lat')},{location.get('lng')}"
-            origin = f"{self.location['lat']},{self.location['lng']}"
-
-            params = {
-                "origins": origin,
-                "destinations": destination,
-                "mode": "walking",
-                "key": self.api_key
-            }
-
-            response = requests.get(distance_url, params=params).json()
+    def _apply_distance_elements(self, batch, response):
+        """ This method copies the distances from one Distance Matrix response onto its batch of places.
+        The elements of the response come back in the same order as the destinations were sent.
 
+        Args:
+            batch (list): the places that were sent as destinations
+            response (dict): the decoded Distance Matrix response
+        """
+        for index, place in enumerate(batch):
             try:
-                element = response['rows'][0]['elements'][0]
+                element = response['rows'][0]['elements'][index]
                 if element.get("status") == "OK":
                     place["walking_distance"] = element['distance']['value']
                 else:
-                    print(f"Distance data not available for '{place.get('name')}', status: {element.get('status')}")
+                    logger.info("Distance data not available for '%s', status: %s", place.get('name'), element.get('status'))
                     place["walking_distance"] = float('inf')  # Consider unreachable
             except (IndexError, KeyError) as e:
-                print(f"Error processing distance for '{place.get('name')}': {e}")
+                logger.warning("Error processing distance for '%s': %s", place.get('name'), e)
                 place["walking_distance"] = float('inf')  # Also treat as unreachable
 
-        print("Updated Places with Walking Distances:", self.places_data)
-
     def places_filter(self, user_preferences):
         """ This method filters nearby places based on user-defined preferences
 
         Args:
             user_prefereces (dict): dictionary with keys
-                - "type_of_activity" (list of str): desired types of activities
+                - "type_of_activity" (list of str): desired types of activities. A place matches if any of
+                  its Google types is one of them.
                 - "max_walking_distance" (float): maximum walking distance allowed (in meters)
 
         Returns:
-            list: filtered list of places based off of user_preferences
+            list: filtered list of places based off of user_preferences. If self.places_data is a
+                PlaceColumns, the filtered places are a PlaceColumns too.
         """
+        if isinstance(self.places_data, PlaceColumns):
+            mask = self.places_data.filter_mask(user_preferences["type_of_activity"], user_preferences["max_walking_distance"])
+            return self.places_data.take(mask.nonzero()[0])
+
+        wanted = set(user_preferences["type_of_activity"])
         filtered_list = []
         for place in self.places_data:
-            if (place["type_of_activity"] in user_preferences["type_of_activity"] and
+            if (not wanted.isdisjoint(place_types(place)) and
                 place["walking_distance"] <= user_preferences["max_walking_distance"]):
                 filtered_list.append(place)
         return filtered_list
     
-    def places_ranker(self, filtered_places, user_preferences, weights):
+    def places_ranker(self, filtered_places, user_preferences, weights, k=None):
         """ This method ranks the list of filtered places to provide the 
         best matches based on the user preferences and weights using a scoring system.
 
         Args:
-            filtered_places (list): the list of places from places_filter
+            filtered_places (list or PlaceColumns): the places from places_filter
             user_preferences (dict): dict with keys including
                 - type_of_activity" list of preferred activity types (in order of preference)
                 - max_walking_distance: max acceptable walking distance
             weights (dict): weight values for each factor. for example (activity:5, distance: 3, rating: 1)
+            k (int): only return the k best places. Default is None (all of them)
 
         Returns:
-            list: list of recommended places, sorted from best to worst match for the user.
+            list: list of recommended places with a "score" key, sorted from best to worst match for the user.
+                Places are copied, so Place objects come back as compact Place copies.
         """
-        def calculate_score(place):
-            score = 0
-
-            #type of activity score (higher number for higher ranked activity type)
-            if place["type_of_activity"] in user_preferences["type_of_activity"]:
-                rank_of_activity = user_preferences["type_of_activity"].index(place["type_of_activity"])
-                score += (len(user_preferences["type_of_activity"]) - rank_of_activity) * weights.get("activity", 1)
-
-            #distance score
-            distance_score = max(0, user_preferences["max_walking_distance"] - place["walking_distance"])
-            score += distance_score * weights.get("distance", 1)
-
-            #rating score
-            #rating_score = max(0, place["rating"] - user_preferences["min_rating"])
-            #score += rating_score * weights.get("rating", 1)
-
-            return score
-        
-        #add scores to each place
-        # ** unpacks the key-value pairs in a dictionary. allows you to not need to add every key manually
-        scored_places = [
-            {**place, "score": calculate_score(place)}
-            for place in filtered_places
+        #add scores to each of the best places
+        return [
+            with_score(place, score)
+            for score, place in self.top_places(filtered_places, user_preferences, weights, k)
         ]
-
-        #return the sorted list by score
-        #key=lambda x: x["score"] tells python how to sort (ie: for each x look at its score and then use it to sort)
-        #reverse=True means sorting from highest to lowest score
-        return sorted(scored_places, key=lambda x: x["score"], reverse=True)
     
         # expected output [ {"name": "restaurant", "score": 10}, {"name": "museum", "score": 8},{"name": "park", "score": 6}]
 
+    def top_places(self, filtered_places, user_preferences, weights, k=5):
+        """ This method picks the k best places without copying them.
+
+        Args:
+            filtered_places (list or PlaceColumns): the places from places_filter
+            user_preferences (dict): same as for places_ranker
+            weights (dict): same as for places_ranker. The rating weight is not used.
+            k (int): how many places to return. Default is 5, None returns all of them
+
+        Returns:
+            list: (score, place) pairs from best to worst, where place is the original dictionary
+        """
+        scorer = PlaceScorer(
+            user_preferences["type_of_activity"],
+            user_preferences["max_walking_distance"],
+            activity_weight=weights.get("activity", 1),
+            distance_weight=weights.get("distance", 1),
+        )
+        with self.metrics.span("ranking"):
+            return scorer.top_k(filtered_places, k)
+
 if __name__ == "__main__":
-    API_KEY = load_api_key() 
-    scraper = MetroPlacesFinder("Columbia Heights", API_KEY)
+    scraper = MetroPlacesFinder("Columbia Heights", cache=ResponseCache())
     
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
     # Get nearby places first
     scraper.get_nearby_places()
-    print("Places Data After Fetching:", scraper.places_data)
+    print("Places found:", len(scraper.places_data))
     
     # Now calculate walking distances for each place
     scraper.calculate_walking_distance()
-    print("Places Data After Calculating Walking Distance:", scraper.places_data)
\ No newline at end of file
+    print("Places with a walking distance:", sum("walking_distance" in place for place in scraper.places_data))
+    scraper.metrics.log_snapshot()
\ No newline at end of file
@@ -1,5 +1,8 @@
+import threading
 import unittest
 from MetroPlacesFinder import MetroPlacesFinder, load_api_key
+from http_transport import RecordedTransport
+from response_cache import ResponseCache
 
 class TestMetroPlacesFinder(unittest.TestCase):
     def setUp(self):
@@ -54,5 +57,207 @@ class TestMetroPlacesFinder(unittest.TestCase):
         self.assertTrue(ranked[0]["score"] > ranked[1]["score"], "First place should have a higher score")
 
 
+def fake_google_get(url, params):
+    """Answers geocode and Distance Matrix requests without the network.
+    Every destination is 100 meters away except ones at latitude 0, which have no route."""
+    if "geocode" in url:
+        return {"results": [{"geometry": {"location": {"lat": 38.8765, "lng": -77.0050}}}]}
+    elements = []
+    for destination in params["destinations"].split("|"):
+        if destination.startswith("0,"):
+            elements.append({"status": "ZERO_RESULTS"})
+        else:
+            elements.append({"status": "OK", "distance": {"value": 100}})
+    return {"rows": [{"elements": elements}]}
+
+
+class TestWalkingDistanceBatching(unittest.TestCase):
+    def setUp(self):
+        """Creates a finder that talks to the fake Google responder."""
+        self.transport = RecordedTransport(fake_google_get)
+        self.finder = MetroPlacesFinder("Navy-Yard Ballpark", api_key="dummy_test_key", transport=self.transport)
+        self.finder.places_data = [
+            {"name": f"Place {i}", "type_of_activity": "park", "location": {"lat": 38.88, "lng": -77.0}}
+            for i in range(60)
+        ]
+
+    def test_batches_destinations(self):
+        """60 places should need 3 Distance Matrix calls instead of 60."""
+        self.finder.calculate_walking_distance()
+        self.assertEqual(self.finder.api_call_counts["distancematrix"], 3)
+        self.assertTrue(all(place["walking_distance"] == 100 for place in self.finder.places_data))
+
+    def test_per_place_fallbacks(self):
+        """A place without a route gets infinity while the rest of its batch keeps real distances."""
+        self.finder.places_data[5]["location"] = {"lat": 0, "lng": 0}
+        self.finder.calculate_walking_distance(batch_size=10, max_workers=1)
+        self.assertEqual(self.finder.api_call_counts["distancematrix"], 6)
+        self.assertEqual(self.finder.places_data[5]["walking_distance"], float('inf'))
+        self.assertEqual(self.finder.places_data[6]["walking_distance"], 100)
+
+
+    def test_warm_cache_skips_network(self):
+        """A second finder sharing the cache should not make any HTTP calls for the same station and places."""
+        cache = ResponseCache(":memory:")
+        self.addCleanup(cache.close)
+        cold = MetroPlacesFinder("Navy-Yard Ballpark", api_key="dummy_test_key", cache=cache, transport=self.transport)
+        cold.places_data = self.finder.places_data
+        cold.calculate_walking_distance()
+
+        warm = MetroPlacesFinder("Navy-Yard Ballpark", api_key="another_key", cache=cache, transport=self.transport)
+        warm.places_data = [dict(place) for place in self.finder.places_data]
+        warm.calculate_walking_distance()
+        self.assertEqual(sum(warm.api_call_counts.values()), 0)
+        self.assertEqual(warm.places_data[0]["walking_distance"], 100)
+
+    def test_straight_line_prefilter(self):
+        """Places farther than the limit in a straight line are dropped before any Distance Matrix call."""
+        self.finder.location = {"lat": 38.88, "lng": -77.0}
+        self.finder.places_data = [
+            {"name": "Far", "type_of_activity": "park", "location": {"lat": 38.95, "lng": -77.0}},
+            {"name": "Near", "type_of_activity": "park", "location": {"lat": 38.881, "lng": -77.0}},
+            {"name": "Nearest", "type_of_activity": "park", "location": {"lat": 38.8801, "lng": -77.0}},
+        ]
+        self.finder.calculate_walking_distance(max_walking_distance=1000)
+        self.assertEqual([place["name"] for place in self.finder.places_data], ["Nearest", "Near"])
+        self.assertEqual(self.finder.prefilter_counts, {"checked": 3, "dropped": 1})
+        sent = self.transport.requests[0][1]["destinations"].split("|")
+        self.assertEqual(len(sent), 2)
+
+
+class TestLazyLocation(unittest.TestCase):
+    def setUp(self):
+        self.transport = RecordedTransport(fake_google_get)
+
+    def test_construction_makes_no_requests(self):
+        """Building a finder for a Green Line stop should use the station table instead of geocoding."""
+        finder = MetroPlacesFinder("Archives", api_key="dummy_test_key", transport=self.transport)
+        self.assertEqual(finder.location, {"lat": 38.8936, "lng": -77.0217})
+        self.assertEqual(self.transport.requests, [])
+
+    def test_unknown_stop_is_geocoded(self):
+        """A stop that is not in the table still falls back to the Geocoding API, but only when needed."""
+        finder = MetroPlacesFinder("Dupont Circle", api_key="dummy_test_key", transport=self.transport)
+        self.assertEqual(self.transport.requests, [])
+        self.assertEqual(finder.location["lat"], 38.8765)
+        self.assertEqual(finder.api_call_counts["geocode"], 1)
+
+def fake_nearby_pages(url, params):
+    """Answers Nearby Search with three pages of 20 places. The last place of each page is repeated
+    at the start of the next one, and the token for page 3 is not active on its first use."""
+    if "pagetoken" not in params:
+        page = 1
+    elif params["pagetoken"] == "page-3" and not fake_nearby_pages.page_3_activated:
+        fake_nearby_pages.page_3_activated = True
+        return {"status": "INVALID_REQUEST", "results": []}
+    else:
+        page = int(params["pagetoken"][-1])
+    first = (page - 1) * 19
+    results = [
+        {"place_id": f"id-{i}", "name": f"Place {i}", "types": ["museum", "point_of_interest"],
+         "geometry": {"location": {"lat": 38.89, "lng": -77.02}}}
+        for i in range(first, first + 20)
+    ]
+    response = {"status": "OK", "results": results}
+    if page < 3:
+        response["next_page_token"] = f"page-{page + 1}"
+    return response
+
+
+class TestNearbyPagination(unittest.TestCase):
+    def setUp(self):
+        """Creates a finder for the paged fake whose page tokens need no waiting."""
+        fake_nearby_pages.page_3_activated = False
+        self.transport = RecordedTransport(fake_nearby_pages)
+        self.finder = MetroPlacesFinder("Archives", api_key="dummy_test_key", transport=self.transport)
+        self.finder.page_token_delay = 0
+
+    def test_follows_pages_and_dedupes(self):
+        """All three pages are read, the overlapping places appear once, and the inactive token is retried."""
+        places = list(self.finder.iter_nearby_places(included_types=["museum"]))
+        self.assertEqual(len(places), 58)
+        self.assertEqual(len({place["place_id"] for place in places}), 58)
+        self.assertEqual(self.finder.api_call_counts["nearbysearch"], 4)
+
+    def test_stops_once_enough_places(self):
+        """Asking for 15 qualifying places should never fetch the second page."""
+        self.finder.get_nearby_places(included_types=["museum"], max_pages=3, enough=15)
+        self.assertEqual(len(self.finder.places_data), 15)
+        self.assertEqual(self.finder.api_call_counts["nearbysearch"], 1)
+
+    def test_repeated_calls_do_not_pile_up(self):
+        """Calling get_nearby_places twice replaces the places instead of adding duplicates."""
+        self.finder.get_nearby_places(included_types=["museum"])
+        self.finder.get_nearby_places(included_types=["museum"])
+        self.assertEqual(len(self.finder.places_data), 20)
+
+    def _cached_finder(self, cache):
+        finder = MetroPlacesFinder("Archives", api_key="dummy_test_key", transport=self.transport, cache=cache)
+        finder.page_token_delay = 0
+        return finder
+
+    def test_cached_page_token_is_not_sent(self):
+        """When only page 1 is cached, its stored token is not sent. Page 1 is fetched again for a live token."""
+        cache = ResponseCache(":memory:")
+        self.addCleanup(cache.close)
+        self._cached_finder(cache).get_nearby_places(included_types=["museum"], max_pages=3, enough=15)
+        del self.transport.requests[:]
+
+        warm = self._cached_finder(cache)
+        places = warm.get_nearby_places(included_types=["museum"], max_pages=3)
+        self.assertEqual(len(places), 58)
+        self.assertNotIn("pagetoken", self.transport.requests[0][1])
+        self.assertEqual(warm.api_call_counts["nearbysearch"], 4)
+
+    def test_fully_cached_pages_make_no_requests(self):
+        """Later pages are cached by page number, so a warm run reads every page without sending a token."""
+        cache = ResponseCache(":memory:")
+        self.addCleanup(cache.close)
+        self._cached_finder(cache).get_nearby_places(included_types=["museum"], max_pages=3)
+        del self.transport.requests[:]
+
+        warm = self._cached_finder(cache)
+        self.assertEqual(len(warm.get_nearby_places(included_types=["museum"], max_pages=3)), 58)
+        self.assertEqual(self.transport.requests, [])
+
+
+def fake_nearby_by_type(url, params):
+    """Answers a Nearby Search for one type. "bar" and "restaurant" share the place "both"."""
+    place_type = params["types"]
+    ids = {"museum": ["museum-1"], "bar": ["bar-1", "both"], "restaurant": ["both", "restaurant-1"]}[place_type]
+    fake_nearby_by_type.barrier.wait()
+    return {"status": "OK", "results": [
+        {"place_id": place_id, "name": place_id, "types": [place_type, "point_of_interest"],
+         "geometry": {"location": {"lat": 38.89, "lng": -77.02}}}
+        for place_id in ids
+    ]}
+
+
+class TestPerTypeSearch(unittest.TestCase):
+    def setUp(self):
+        self.transport = RecordedTransport(fake_nearby_by_type)
+        self.cache = ResponseCache(":memory:")
+        self.addCleanup(self.cache.close)
+        self.finder = MetroPlacesFinder("Archives", api_key="dummy_test_key", transport=self.transport, cache=self.cache)
+
+    def test_types_searched_at_once_and_merged(self):
+        """Each type gets its own request, all in flight together, and shared places are kept once with every matched type."""
+        #the barrier only opens once all three searches are waiting on it at the same time
+        fake_nearby_by_type.barrier = threading.Barrier(3, timeout=5)
+        places = self.finder.get_nearby_places(included_types=["museum", "bar", "restaurant"], per_type=True)
+        self.assertEqual([place["place_id"] for place in places], ["museum-1", "bar-1", "both", "restaurant-1"])
+        self.assertEqual(places[2]["matched_types"], ["bar", "restaurant"])
+        self.assertEqual(places[2]["types"], ["bar", "point_of_interest"])
+        self.assertEqual(sorted(params["types"] for _, params in self.transport.requests), ["bar", "museum", "restaurant"])
+
+    def test_cached_types_are_skipped(self):
+        """Types whose results are already cached send no request."""
+        fake_nearby_by_type.barrier = threading.Barrier(1)
+        self.finder.get_nearby_places(included_types=["bar"], per_type=True)
+        self.finder.get_nearby_places(included_types=["bar", "restaurant"], per_type=True)
+        self.assertEqual([params["types"] for _, params in self.transport.requests], ["bar", "restaurant"])
+        self.assertEqual(len(self.finder.places_data), 3)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds the mapping between the activity categories the user picks ("food", "social", ...)
+and Google Places API types ("restaurant", "bar", ...), compiled once at import into an index that
+works in both directions:
+
+- google_types(categories) gives the Google types to search for, as a sorted tuple without
+  duplicates, so the same categories always give the same tuple and it can be used as a cache key.
+- categories(google_type) gives every category a Google type belongs to ("cafe" is both "food"
+  and "social").
+- rank_google_types(ranks) turns the user's category points into points per Google type, so a
+  scorer can score a place's Google types with one dictionary lookup each.
+"""
+
+#the user's activity categories and the Google Places API types that match each one
+GOOGLE_TYPES_BY_CATEGORY = {
+    "food": ("restaurant", "cafe", "bakery", "meal_takeaway", "meal_delivery"),
+    "museums and monuments": ("museum", "art_gallery", "historical_landmark", "tourist_attraction"),
+    "sporty": ("gym", "stadium", "park", "sports_club"),
+    "social": ("bar", "night_club", "cafe"),
+    "nature": ("park", "campground", "natural_feature"),
+}
+
+
+def place_types(place):
+    """ This function gives every Google type of a place: its type_of_activity, then the rest of its "types".
+
+    Args:
+        place (dict or Place): a place with "type_of_activity" and optionally "types"
+
+    Returns:
+        tuple: the place's types, without duplicates
+    """
+    types = place.get("types")
+    if not types:
+        return (place.get("type_of_activity"),)
+    return tuple(dict.fromkeys((place.get("type_of_activity"), *types)))
+
+
+class ActivityIndex:
+    """Category to Google type and Google type to category lookups, built once from a mapping like GOOGLE_TYPES_BY_CATEGORY."""
+
+    def __init__(self, google_types_by_category):
+        """ This method compiles both directions of the mapping.
+
+        Args:
+            google_types_by_category (dict): category mapped to its Google types
+        """
+        self.google_types_by_category = {category: tuple(dict.fromkeys(types))
+                                         for category, types in google_types_by_category.items()}
+        categories_by_type = {}
+        for category, types in self.google_types_by_category.items():
+            for google_type in types:
+                categories_by_type.setdefault(google_type, []).append(category)
+        self.categories_by_google_type = {google_type: tuple(categories)
+                                          for google_type, categories in categories_by_type.items()}
+        #canonical tuples already built, keyed by the categories asked for
+        self._google_types = {}
+
+    def google_types(self, categories):
+        """ This method gives the Google types of some categories. Unknown categories are ignored.
+
+        Args:
+            categories (iterable): activity categories, ie: ["food", "social"]
+
+        Returns:
+            tuple: the Google types, sorted and without duplicates
+        """
+        #unknown categories are left out of the key, so junk input cannot grow the memo past one entry
+        #per subset of known categories
+        key = frozenset(category for category in categories if category in self.google_types_by_category)
+        google_types = self._google_types.get(key)
+        if google_types is None:
+            google_types = tuple(sorted({google_type for category in key
+                                         for google_type in self.google_types_by_category[category]}))
+            self._google_types[key] = google_types
+        return google_types
+
+    def categories(self, google_type):
+        """ This method gives the categories a Google type belongs to.
+
+        Args:
+            google_type (str): a Google place type, ie: "cafe"
+
+        Returns:
+            tuple: the categories in the order of the mapping, empty if the type is in none
+        """
+        return self.categories_by_google_type.get(google_type, ())
+
+    def rank_google_types(self, ranks):
+        """ This method extends category points with points for every Google type, so scoring a place's
+        Google types is one lookup per type. A type in several categories gets its best category's points.
+
+        Args:
+            ranks (dict): category mapped to points, ie: from ranking.build_activity_rank_map
+
+        Returns:
+            dict: the same entries plus each Google type of a ranked category mapped to its points
+        """
+        expanded = dict(ranks)
+        for google_type, categories in self.categories_by_google_type.items():
+            points = max(ranks.get(category, 0) for category in categories)
+            if points > expanded.get(google_type, 0):
+                expanded[google_type] = points
+        return expanded
+
+
+#compiled once and shared by every user
+ACTIVITY_INDEX = ActivityIndex(GOOGLE_TYPES_BY_CATEGORY)
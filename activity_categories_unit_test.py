@@ -0,0 +1,58 @@
+import unittest
+from activity_categories import ACTIVITY_INDEX, ActivityIndex, place_types
+from places import Place, PlaceColumns
+from user_preference import User_Preference
+
+
+class TestActivityIndex(unittest.TestCase):
+    def test_google_types_are_canonical(self):
+        """The same categories in any order give the same sorted tuple, with shared types listed once."""
+        types = ACTIVITY_INDEX.google_types(["social", "food"])
+        self.assertEqual(types, ACTIVITY_INDEX.google_types(["food", "social", "food"]))
+        self.assertEqual(list(types), sorted(set(types)))
+        self.assertEqual(types.count("cafe"), 1)
+        self.assertEqual(ACTIVITY_INDEX.google_types(["unknown"]), ())
+
+    def test_unknown_categories_are_not_memoized(self):
+        """Unknown categories do not add memo entries, so junk query strings cannot grow it."""
+        index = ActivityIndex({"food": ["cafe"], "social": ["bar"]})
+        self.assertEqual(index.google_types(["food", "junk 1"]), ("cafe",))
+        for i in range(100):
+            index.google_types([f"junk {i}"])
+            index.google_types(["food", f"junk {i}"])
+        self.assertEqual(len(index._google_types), 2)
+
+    def test_both_directions(self):
+        """A Google type maps back to every category that lists it."""
+        index = ActivityIndex({"food": ["cafe", "restaurant"], "social": ["bar", "cafe"]})
+        self.assertEqual(index.categories("cafe"), ("food", "social"))
+        self.assertEqual(index.categories("museum"), ())
+        self.assertEqual(index.rank_google_types({"social": 2, "food": 1}), {"social": 2, "food": 1, "cafe": 2,
+                                                                              "restaurant": 1, "bar": 2})
+
+    def test_place_types(self):
+        """type_of_activity comes first, then the rest of the place's types."""
+        self.assertEqual(place_types({"type_of_activity": "park"}), ("park",))
+        self.assertEqual(place_types(Place("1", "Cafe", "cafe", types=["cafe", "food", "establishment"])),
+                         ("cafe", "food", "establishment"))
+
+
+class TestCategoryScoring(unittest.TestCase):
+    def test_google_types_score_by_category(self):
+        """A place is scored by the best category among all its Google types, for lists and columns alike."""
+        user = User_Preference("Bob")
+        user.preferences["type_of_activity"] = ["social", "food"]
+        user.preferences["max_walking_distance"] = 1000
+        places = [
+            Place("1", "Diner", "restaurant", walking_distance=500),
+            Place("2", "Pub", "restaurant", types=["restaurant", "bar"], walking_distance=500),
+            Place("3", "Shop", "store", walking_distance=500),
+        ]
+        self.assertEqual([place["name"] for place in user.sort_activity_types(places)], ["Pub", "Diner", "Shop"])
+        ranked = user.sort_activity_types(PlaceColumns.from_places(places))
+        self.assertEqual([place["name"] for place in ranked], ["Pub", "Diner", "Shop"])
+        self.assertEqual(ranked[0]["types"], ["restaurant", "bar"])
+
+
+if __name__ == '__main__':
+    unittest.main()
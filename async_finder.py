@@ -0,0 +1,190 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds an asyncio version of MetroPlacesFinder and a driver that refreshes
+every Green Line station at the same time. Each station still runs geocode, nearby search
+and distance calls in order, but all stations run side by side, so a full-line refresh
+takes about as long as the slowest station instead of the sum of all of them.
+
+The blocking HTTP calls run on worker threads through the shared pooled transport, and a
+single semaphore caps how many requests (or nearby searches, which may be several requests)
+are in flight across every station.
+"""
+import asyncio
+import logging
+
+from MetroPlacesFinder import DISTANCE_MATRIX_MAX_DESTINATIONS, DISTANCE_MATRIX_URL, GEOCODE_URL, MetroPlacesFinder
+from rate_limiter import BACKGROUND
+from station_coordinates import lookup_station_coordinates
+from user_preference import ALL_METRO_STOPS
+
+#default number of Google requests allowed in flight at once
+DEFAULT_MAX_CONCURRENCY = 8
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMetroPlacesFinder(MetroPlacesFinder):
+    """A MetroPlacesFinder whose API methods are coroutines.
+
+    Filtering and ranking are the same as in MetroPlacesFinder and stay synchronous.
+    """
+
+    def __init__(self, metro_stop_name, api_key=None, cache=None, transport=None, semaphore=None, metrics=None):
+        """ This method will initialize the AsyncMetroPlacesFinder object
+
+        Args:
+            metro_stop_name (str): the name of the metro green line stop.
+            api_key (str): Google Maps API key, or None to read google_api_key.txt only when a request is actually sent
+            cache (ResponseCache): optional response cache checked before every API call
+            transport (HttpTransport): object used to send requests. Default is the shared transport
+            semaphore (asyncio.Semaphore): limit shared with other finders on how many requests run at once.
+                Default is None, which gives this finder its own limit of DEFAULT_MAX_CONCURRENCY
+            metrics (Metrics): where stage timings and call counters are recorded. Default is the shared metrics
+        """
+        super().__init__(metro_stop_name, api_key, cache=cache, transport=transport, metrics=metrics)
+        self.semaphore = semaphore if semaphore is not None else asyncio.Semaphore(DEFAULT_MAX_CONCURRENCY)
+
+    @property
+    def location(self):
+        """ dict or None: the 'lat' and 'lng' of the metro stop. Unlike MetroPlacesFinder this never
+        geocodes on access; await resolve_location() first for stops that are not in the station table.
+        """
+        if not self._location_resolved:
+            self._location = lookup_station_coordinates(self.metro_stop_name)
+            self._location_resolved = self._location is not None
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = value
+        self._location_resolved = True
+
+    async def _get_json_async(self, url, params, endpoint):
+        """Runs one cached, counted request on a worker thread while holding the concurrency limit."""
+        async with self.semaphore:
+            return await asyncio.to_thread(self._get_json, url, params, endpoint)
+
+    async def resolve_location(self):
+        """ This method makes sure self.location is set, geocoding only if the station table does not know the stop.
+
+        Returns:
+            dict or None: the stop's coordinates
+        """
+        if self.location is None:
+            self.location = await self.get_location_coordinates()
+        return self.location
+
+    async def get_location_coordinates(self):
+        """ This method uses the Geocoding API to get latitude and longitude coordinates
+        of the given Metro stop.
+
+        Returns:
+            dict or None: a dictionary with 'lat' and 'lng' if successful, otherwise, None
+        """
+        with self.metrics.span("geocode"):
+            response = await self._get_json_async(GEOCODE_URL, self._geocode_params(), "geocode")
+            return self._parse_geocode_response(response)
+
+    async def get_nearby_places(self, radius_meters=5000, included_types=["tourist_attraction"], max_pages=1,
+                                enough=None, qualifies=None, per_type=False, max_workers=10):
+        """This method runs MetroPlacesFinder.get_nearby_places on a worker thread, so later result pages,
+        self.nearby_search_api and per_type searches work the same as in the regular finder. The whole
+        search holds one slot of the concurrency limit, even when it sends several requests.
+
+        Args:
+            radius_meters(int): radius around the metro station in meters to search. Default is 5000.
+            included_types(list): List of place types to include in the search. Default is ["tourist_attraction"]
+            max_pages(int): most result pages (up to 20 places each) to fetch. Default is 1.
+            enough(int): stop fetching pages once this many places qualify. Default is None (no early stop)
+            qualifies(callable): function of a place that says whether it counts toward enough.
+                Default is None, which counts every place
+            per_type(bool): search each type on its own and merge the results. Default is False.
+            max_workers(int): most type searches in flight at once when per_type is True. Default is 10.
+
+        Returns:
+            self.places_data(list): a list of dictionaries with information about each place found
+        """
+        self.places_data = []
+        if not await self.resolve_location():
+            logger.error("Could not get location coordinates for %s.", self.metro_stop_name)
+            return
+
+        async with self.semaphore:
+            return await asyncio.to_thread(super().get_nearby_places, radius_meters, included_types, max_pages,
+                                           enough, qualifies, per_type, max_workers)
+
+    async def calculate_walking_distance(self, batch_size=DISTANCE_MATRIX_MAX_DESTINATIONS, max_walking_distance=None):
+        """This method calculates the walking distance for each place using the Distance Matrix API,
+        sending every batch of destinations at the same time.
+
+        Args:
+            batch_size (int): number of destinations per request, capped at 25. Default is 25.
+            max_walking_distance (float): if given (in meters), places that are farther than this in a
+                straight line are dropped first with prefilter_by_straight_line. Default is None.
+        """
+        if not self.places_data:
+            logger.error("No places data to calculate the distances for %s.", self.metro_stop_name)
+            return
+        if not await self.resolve_location():
+            logger.error("Could not get location coordinates for %s.", self.metro_stop_name)
+            return
+
+        with self.metrics.span("walking_distance"):
+            if max_walking_distance is not None:
+                self.prefilter_by_straight_line(max_walking_distance)
+
+            batches = self._distance_batches(batch_size)
+            responses = await asyncio.gather(*(
+                self._get_json_async(DISTANCE_MATRIX_URL, self._distance_params(batch), "distancematrix")
+                for batch in batches
+            ))
+            for batch, response in zip(batches, responses):
+                self._apply_distance_elements(batch, response)
+
+
+async def refresh_all_stations(api_key=None, stations=None, included_types=["tourist_attraction"], radius_meters=5000,
+                               max_concurrency=DEFAULT_MAX_CONCURRENCY, cache=None, transport=None):
+    """ This function fetches places and walking distances for many stations at the same time.
+
+    Args:
+        api_key (str): Google Maps API key, or None to read google_api_key.txt only when a request is actually sent
+        stations (list): station names to refresh. Default is every stop in user_preference.ALL_METRO_STOPS
+        included_types (list): Google place types to search for. Default is ["tourist_attraction"]
+        radius_meters (int): nearby search radius in meters. Default is 5000.
+        max_concurrency (int): most requests in flight at once across all stations. Default is 8.
+        cache (ResponseCache): optional response cache shared by every station
+        transport (HttpTransport): object used to send requests. Default is the shared transport
+
+    Returns:
+        dict: station name mapped to its finder, with places_data filled in
+    """
+    if stations is None:
+        stations = ALL_METRO_STOPS
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    finders = [
+        AsyncMetroPlacesFinder(station, api_key, cache=cache, transport=transport, semaphore=semaphore)
+        for station in stations
+    ]
+
+    async def refresh(finder):
+        #a full-line refresh waits behind any interactive requests sharing the scheduler
+        finder.priority = BACKGROUND
+        await finder.get_nearby_places(radius_meters=radius_meters, included_types=included_types)
+        await finder.calculate_walking_distance()
+
+    await asyncio.gather(*(refresh(finder) for finder in finders))
+    return {finder.metro_stop_name: finder for finder in finders}
+
+
+def run_all_stations(api_key=None, **kwargs):
+    """ This function runs refresh_all_stations from regular (non-async) code.
+
+    Args:
+        api_key (str): Google Maps API key, or None to read google_api_key.txt only when a request is actually sent
+        **kwargs: any other arguments of refresh_all_stations
+
+    Returns:
+        dict: station name mapped to its finder, with places_data filled in
+    """
+    return asyncio.run(refresh_all_stations(api_key, **kwargs))
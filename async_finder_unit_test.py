@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+import unittest
+from async_finder import AsyncMetroPlacesFinder, run_all_stations
+from http_transport import RecordedTransport
+from user_preference import ALL_METRO_STOPS
+
+
+class SlowFakeGoogle:
+    """Answers every endpoint after a short delay and remembers the most requests it saw at once."""
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, url, params):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if "geocode" in url:
+            return {"results": [{"geometry": {"location": {"lat": 38.9, "lng": -77.0}}}]}
+        if "nearbysearch" in url:
+            return {"results": [{"name": "Spot", "types": ["museum"], "geometry": {"location": {"lat": 38.9, "lng": -77.01}}}]}
+        return {"rows": [{"elements": [{"status": "OK", "distance": {"value": 250}}]}]}
+
+
+class TestAsyncMetroPlacesFinder(unittest.TestCase):
+    def test_single_station_pipeline(self):
+        """The awaitable methods should fill in places and walking distances like the regular finder."""
+        transport = RecordedTransport(SlowFakeGoogle(delay=0))
+        finder = AsyncMetroPlacesFinder("Archives", "dummy_test_key", transport=transport)
+
+        async def run():
+            await finder.get_nearby_places(included_types=["museum"])
+            await finder.calculate_walking_distance()
+        asyncio.run(run())
+        self.assertEqual(finder.places_data[0]["walking_distance"], 250)
+        self.assertEqual(finder.api_call_counts, {"geocode": 0, "nearbysearch": 1, "distancematrix": 1})
+
+    def test_nearby_search_follows_later_pages(self):
+        """The awaitable nearby search follows next_page_token like the regular finder."""
+        def paged_google(url, params):
+            page = 1 if "pagetoken" in params else 0
+            return {"status": "OK", "next_page_token": "token" if page == 0 else None, "results": [
+                {"place_id": f"id-{page}", "name": f"Spot {page}", "types": ["museum"],
+                 "geometry": {"location": {"lat": 38.9, "lng": -77.01}}}
+            ]}
+        transport = RecordedTransport(paged_google)
+        finder = AsyncMetroPlacesFinder("Archives", "dummy_test_key", transport=transport)
+        finder.page_token_delay = 0
+        places = asyncio.run(finder.get_nearby_places(included_types=["museum"], max_pages=2))
+        self.assertEqual([place["place_id"] for place in places], ["id-0", "id-1"])
+        self.assertEqual(finder.places_data, places)
+        self.assertEqual(transport.requests[1][1]["pagetoken"], "token")
+
+    def test_unknown_station_is_geocoded_when_awaited(self):
+        """A stop that is not in the station table is geocoded through the awaitable method."""
+        finder = AsyncMetroPlacesFinder("Dupont Circle", "dummy_test_key", transport=RecordedTransport(SlowFakeGoogle(delay=0)))
+        self.assertIsNone(finder.location)
+        self.assertEqual(asyncio.run(finder.resolve_location()), {"lat": 38.9, "lng": -77.0})
+
+    def test_all_stations_run_concurrently(self):
+        """Every station should be refreshed, with requests overlapping but never beyond the limit."""
+        fake = SlowFakeGoogle()
+        finders = run_all_stations("dummy_test_key", transport=RecordedTransport(fake), max_concurrency=4)
+        self.assertEqual(list(finders), ALL_METRO_STOPS)
+        self.assertTrue(all(finder.places_data[0]["walking_distance"] == 250 for finder in finders.values()))
+        self.assertGreater(fake.max_in_flight, 1)
+        self.assertLessEqual(fake.max_in_flight, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+"""DC Metro Travel Guide for UMD Students
+
+This script is a non-interactive version of the travel guide. Instead of asking one person
+for their preferences with input(), it reads many profiles from a JSONL or CSV file, each with:
+- name
+- station (Green Line stop)
+- activity_types (list, or a comma separated string, ie: "food, social")
+- max_distance (maximum walking distance in miles)
+
+Profiles are grouped by station so the places and walking distances around each station are
+fetched only once, the profiles are scored in parallel with a process pool, and each person's
+top 5 recommendations are written out as one JSON line as soon as they are ready.
+
+Usage: python3 batch_mode.py profiles.jsonl [-o results.jsonl] [--workers 4]
+"""
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from activity_categories import place_types
+from MetroPlacesFinder import MetroPlacesFinder
+from rate_limiter import BACKGROUND
+from response_cache import ResponseCache
+from station_coordinates import match_station_name
+from user_preference import User_Preference
+
+#1 mile = 1609.34 meters
+METERS_PER_MILE = 1609.34
+
+#profiles scored together in one worker task
+CHUNK_SIZE = 200
+
+
+def read_profiles(path):
+    """ This function reads user profiles from a JSONL or CSV file (chosen by the file extension).
+
+    Args:
+        path (str): path of the profile file
+
+    Returns:
+        list: one dictionary per profile with "name", "station", "activity_types" (list of lowercase str)
+            and "max_distance" (float, miles)
+    """
+    with open(path, "r", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    profiles = []
+    for row in rows:
+        activity_types = row.get("activity_types", [])
+        if isinstance(activity_types, str):
+            activity_types = activity_types.split(",")
+        profiles.append({
+            "name": row.get("name", "Guest"),
+            "station": row["station"],
+            "activity_types": [activity.strip().lower() for activity in activity_types if activity.strip()],
+            "max_distance": float(row.get("max_distance", 1)),
+        })
+    return profiles
+
+
+def group_by_station(profiles):
+    """ This function groups profiles that get off at the same stop. Station names are matched to the
+    official Green Line names first, so "archives " and "Archives" share one fetch.
+
+    Args:
+        profiles (list): profiles from read_profiles
+
+    Returns:
+        dict: station name (the official one if it matched) mapped to its list of profiles, in the
+            order stations first appear
+    """
+    groups = {}
+    for profile in profiles:
+        station = match_station_name(profile["station"]) or profile["station"]
+        groups.setdefault(station, []).append(profile)
+    return groups
+
+
+def fetch_station_places(station, profiles, api_key=None, cache=None, transport=None):
+    """ This function fetches the places every profile at one station could need, with walking distances.
+
+    Args:
+        station (str): the station name
+        profiles (list): the profiles getting off at this station
+        api_key (str): Google Maps API key, or None to read google_api_key.txt only when a request is actually sent. Default is None.
+        cache (ResponseCache): optional response cache
+        transport (HttpTransport): object used to send requests. Default is the shared transport
+
+    Returns:
+        list: places with "walking_distance", covering every profile's activity types and distance
+    """
+    user = User_Preference()
+    google_types = set()
+    for profile in profiles:
+        google_types.update(user.map_activity_types_to_google_places_api(profile["activity_types"]))
+    if not google_types:
+        return []
+
+    finder = MetroPlacesFinder(station, api_key, cache=cache, transport=transport)
+    finder.priority = BACKGROUND
+    finder.get_nearby_places(included_types=sorted(google_types))
+    if finder.places_data:
+        farthest = max(profile["max_distance"] for profile in profiles) * METERS_PER_MILE
+        finder.calculate_walking_distance(max_walking_distance=farthest)
+    return [place for place in finder.places_data if "walking_distance" in place]
+
+
+def score_profiles(places, profiles, k=5):
+    """ This function ranks a station's places for several profiles. It runs inside the worker processes.
+
+    Args:
+        places (list): the station's places with walking distances
+        profiles (list): profiles getting off at that station
+        k (int): recommendations per profile. Default is 5.
+
+    Returns:
+        list: one result dictionary per profile with its "recommendations"
+    """
+    results = []
+    for profile in profiles:
+        user = User_Preference(profile["name"])
+        user.metro_stop_name = profile["station"]
+        user.preferences["type_of_activity"] = profile["activity_types"]
+        #in meters, like the places' walking_distance the scorer subtracts it from
+        max_meters = profile["max_distance"] * METERS_PER_MILE
+        user.preferences["max_walking_distance"] = max_meters
+
+        google_types = set(user.map_activity_types_to_google_places_api(profile["activity_types"]))
+        candidates = [place for place in places
+                      if not google_types.isdisjoint(place_types(place)) and place["walking_distance"] <= max_meters]
+
+        results.append({
+            "name": profile["name"],
+            "station": profile["station"],
+            "recommendations": [
+                {
+                    "name": place["name"],
+                    "type_of_activity": place["type_of_activity"],
+                    "distance_miles": round(place["walking_distance"] / METERS_PER_MILE, 2),
+                }
+                for _, place in user.place_scorer().top_k(candidates, k)
+            ],
+        })
+    return results
+
+
+def run_batch(profiles, api_key, output, workers=None, k=5, cache=None, transport=None):
+    """ This function fetches every station once, scores all profiles in parallel and streams JSON lines.
+
+    Args:
+        profiles (list): profiles from read_profiles
+        api_key (str): Google Maps API key, or None to read google_api_key.txt only when a request is actually sent
+        output (file): open text file the JSON lines are written to
+        workers (int): number of scoring processes. Default is None (one per CPU)
+        k (int): recommendations per profile. Default is 5.
+        cache (ResponseCache): optional response cache
+        transport (HttpTransport): object used to send requests. Default is the shared transport
+
+    Returns:
+        int: number of profiles written
+    """
+    groups = group_by_station(profiles)
+
+    #fetching is network bound, so stations are fetched on threads at the same time
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(groups)))) as pool:
+        station_places = dict(zip(groups, pool.map(
+            lambda station: fetch_station_places(station, groups[station], api_key, cache=cache, transport=transport),
+            groups,
+        )))
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(score_profiles, station_places[station], station_profiles[i:i + CHUNK_SIZE], k)
+            for station, station_profiles in groups.items()
+            for i in range(0, len(station_profiles), CHUNK_SIZE)
+        ]
+        for future in as_completed(futures):
+            for result in future.result():
+                output.write(json.dumps(result) + "\n")
+                written += 1
+            output.flush()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank places for many travel guide profiles at once.")
+    parser.add_argument("profiles", help="JSONL or CSV file of profiles")
+    parser.add_argument("-o", "--output", help="file for the JSONL results. Default is the terminal")
+    parser.add_argument("--workers", type=int, default=None, help="number of scoring processes")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        #the API key is read only if some station is not in the response cache
+        run_batch(read_profiles(args.profiles), None, output, workers=args.workers, cache=ResponseCache())
+    finally:
+        if args.output:
+            output.close()
@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from batch_mode import group_by_station, read_profiles, run_batch, score_profiles
+from http_transport import RecordedTransport
+from response_cache import ResponseCache
+
+
+def fake_food_google(url, params):
+    """Every station has a restaurant 200 meters away and a cafe 2000 meters away."""
+    if "nearbysearch" in url:
+        return {"status": "OK", "results": [
+            {"place_id": "near", "name": "Near Restaurant", "types": ["restaurant"],
+             "geometry": {"location": {"lat": 38.8940, "lng": -77.0217}}},
+            {"place_id": "far", "name": "Far Cafe", "types": ["cafe"],
+             "geometry": {"location": {"lat": 38.9050, "lng": -77.0217}}},
+        ]}
+    meters = [200 if destination.startswith("38.894,") else 2000 for destination in params["destinations"].split("|")]
+    return {"rows": [{"elements": [{"status": "OK", "distance": {"value": value}} for value in meters]}]}
+
+
+class TestBatchMode(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_reads_jsonl_and_csv(self):
+        """Both file formats give the same cleaned-up profiles."""
+        jsonl = self.write("profiles.jsonl", '{"name": "Ana", "station": "Archives", "activity_types": ["Food", " Social"], "max_distance": 2}\n')
+        csv_path = self.write("profiles.csv", 'name,station,activity_types,max_distance\nAna,Archives,"Food, Social",2\n')
+        expected = [{"name": "Ana", "station": "Archives", "activity_types": ["food", "social"], "max_distance": 2.0}]
+        self.assertEqual(read_profiles(jsonl), expected)
+        self.assertEqual(read_profiles(csv_path), expected)
+
+    def test_groups_by_station(self):
+        """Profiles at the same stop end up in the same group."""
+        profiles = [{"station": "Archives"}, {"station": "Waterfront"}, {"station": "archives "},
+                    {"station": "Gallery PI-Chinatown"}, {"station": "Gallery Pl-Chinatown"}]
+        groups = group_by_station(profiles)
+        self.assertEqual([len(group) for group in groups.values()], [2, 1, 2])
+        self.assertIn("Archives", groups)
+
+    def test_nearer_place_ranks_first(self):
+        """Of two places of the same category, the one that is nearer on foot comes first whatever the input order."""
+        places = [
+            {"place_id": "far", "name": "Far Diner", "type_of_activity": "restaurant", "walking_distance": 1500},
+            {"place_id": "near", "name": "Near Diner", "type_of_activity": "restaurant", "walking_distance": 300},
+        ]
+        profile = {"name": "Ana", "station": "Archives", "activity_types": ["food"], "max_distance": 1.0}
+        recommendations = score_profiles(places, [profile])[0]["recommendations"]
+        self.assertEqual([place["name"] for place in recommendations], ["Near Diner", "Far Diner"])
+
+    def test_run_batch_shares_station_fetches(self):
+        """Many profiles at two stations need one nearby search per station, and each profile gets its own limit."""
+        profiles = [
+            {"name": f"Student {i}", "station": ["Archives", "Waterfront"][i % 2], "activity_types": ["food"],
+             "max_distance": 0.5 if i % 3 else 2.0}
+            for i in range(30)
+        ]
+        transport = RecordedTransport(fake_food_google)
+        output = io.StringIO()
+        written = run_batch(profiles, "dummy_test_key", output, workers=2, transport=transport)
+
+        results = {result["name"]: result for result in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual(written, 30)
+        self.assertEqual(sum("nearbysearch" in url for url, _ in transport.requests), 2)
+        self.assertEqual([place["name"] for place in results["Student 1"]["recommendations"]], ["Near Restaurant"])
+        self.assertEqual(len(results["Student 0"]["recommendations"]), 2)
+
+    def test_cached_batch_needs_no_api_key(self):
+        """With every station in the response cache, a batch run without a key sends nothing and reads no key file."""
+        cache = ResponseCache(":memory:")
+        self.addCleanup(cache.close)
+        profiles = [{"name": "Ana", "station": "Archives", "activity_types": ["food"], "max_distance": 1.0}]
+        run_batch(profiles, "dummy_test_key", io.StringIO(), workers=1, cache=cache,
+                  transport=RecordedTransport(fake_food_google))
+
+        offline = RecordedTransport(fake_food_google)
+        output = io.StringIO()
+        self.assertEqual(run_batch(profiles, None, output, workers=1, cache=cache, transport=offline), 1)
+        self.assertEqual(offline.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+"""DC Metro Travel Guide for UMD Students
+
+This script benchmarks the travel guide pipeline against the local fake Google Maps server
+(fake_google_server.py), so performance can be measured without hitting Google. For each
+stage (geocode, nearby search, walking distance, ranking) and for the whole pipeline it reports
+wall time, HTTP calls per endpoint, bytes transferred and peak Python memory. Every run uses the
+same seed and settings, so results can be saved and compared against a later run.
+
+Usage:
+    python3 benchmark.py --output baseline.json
+    python3 benchmark.py --compare baseline.json   (exits with status 1 if something got slower)
+    python3 benchmark.py --places-api new          (field-masked Places API (New) nearby search)
+    python3 benchmark.py --per-type --latency-ms 50   (one nearby search per type, sent at the same time)
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from fake_google_server import FakeGoogleMaps, start_fake_server
+from http_transport import HttpTransport
+from MetroPlacesFinder import MetroPlacesFinder
+from rate_limiter import DEFAULT_RATE_LIMITS, RequestScheduler
+from user_preference import ALL_METRO_STOPS, User_Preference
+
+#the benchmark user's preferences
+ACTIVITY_TYPES = ["food", "museums and monuments"]
+MAX_DISTANCE_MILES = 1.5
+
+#1 mile = 1609.34 meters
+METERS_PER_MILE = 1609.34
+
+STAGES = ["geocode", "nearby_search", "walking_distance", "ranking", "end_to_end"]
+
+
+class Benchmark:
+    """Runs the pipeline stages against one fake server and measures them."""
+
+    def __init__(self, fake, base_url, stations, places_api="legacy", per_type=False):
+        """ This method sets up the transport and the benchmark user.
+
+        Args:
+            fake (FakeGoogleMaps): the running fake's state, used for request counts
+            base_url (str): base url of the fake server
+            stations (list): station names to run
+            places_api (str): "legacy" or "new", the nearby search API the finders use. Default is "legacy".
+            per_type (bool): whether nearby search sends one request per type at the same time. Default is False.
+        """
+        self.fake = fake
+        self.places_api = places_api
+        self.per_type = per_type
+        #short backoff so injected errors do not dominate the timings
+        self.transport = HttpTransport(base_url=base_url, backoff_base=0.01, backoff_cap=0.05)
+        self.stations = stations
+        #the fake has no quotas, so Google's rate limits would only measure the token buckets
+        self.scheduler = RequestScheduler({endpoint: (rate * 1000, capacity * 1000)
+                                           for endpoint, (rate, capacity) in DEFAULT_RATE_LIMITS.items()})
+        self.user = User_Preference("Benchmark")
+        self.user.preferences["type_of_activity"] = ACTIVITY_TYPES
+        self.user.preferences["max_walking_distance"] = MAX_DISTANCE_MILES
+        self.google_types = sorted(self.user.map_activity_types_to_google_places_api(ACTIVITY_TYPES))
+        self.finders = []
+
+    def new_finders(self):
+        """Creates a fresh finder per station that never waits for page tokens."""
+        self.finders = []
+        for station in self.stations:
+            finder = MetroPlacesFinder(station, "benchmark_key", transport=self.transport, scheduler=self.scheduler)
+            finder.page_token_delay = 0
+            finder.nearby_search_api = self.places_api
+            self.finders.append(finder)
+
+    def geocode(self):
+        self.new_finders()
+        for finder in self.finders:
+            #geocodes directly so the stage measures the API even for stations in the built-in table
+            finder.location = finder.get_location_coordinates()
+
+    def nearby_search(self):
+        for finder in self.finders:
+            finder.get_nearby_places(included_types=self.google_types, max_pages=3, per_type=self.per_type)
+
+    def walking_distance(self):
+        for finder in self.finders:
+            finder.calculate_walking_distance(max_walking_distance=MAX_DISTANCE_MILES * METERS_PER_MILE)
+
+    def ranking(self):
+        for finder in self.finders:
+            self.user.sort_activity_types(finder.places_data, k=5)
+
+    def end_to_end(self):
+        self.geocode()
+        self.nearby_search()
+        self.walking_distance()
+        self.ranking()
+
+    def measure(self, stage, trace_memory):
+        """ This method runs one stage once and measures it.
+
+        Args:
+            stage (str): one of STAGES
+            trace_memory (bool): whether to track peak memory (which slows the run down)
+
+        Returns:
+            dict: wall_seconds, http_calls per endpoint, bytes_received and peak_memory_kb (if traced)
+        """
+        self.fake.reset_counts()
+        bytes_before = self.transport.bytes_received
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            getattr(self, stage)()
+        wall = time.perf_counter() - start
+        result = {
+            "wall_seconds": wall,
+            "http_calls": dict(self.fake.request_counts),
+            "bytes_received": self.transport.bytes_received - bytes_before,
+        }
+        if trace_memory:
+            result["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        return result
+
+
+def run_benchmark(stations=None, repeats=5, latency_ms=0, error_rate=0.0, results_per_search=60, places_api="legacy",
+                  per_type=False):
+    """ This function runs every stage several times against a fresh fake server.
+
+    Args:
+        stations (list): station names. Default is every stop in ALL_METRO_STOPS
+        repeats (int): timed runs of the pipeline; the median wall time of each stage is reported. Default is 5.
+        latency_ms (float): delay the fake adds to every response. Default is 0.
+        error_rate (float): fraction of requests the fake answers with HTTP 500. Default is 0.
+        results_per_search (int): places per nearby search (20 per page). Default is 60.
+        places_api (str): "legacy" or "new" nearby search. Default is "legacy".
+        per_type (bool): one nearby search per type, sent at the same time. Default is False.
+
+    Returns:
+        dict: the settings and, for each stage, median wall time, HTTP calls, bytes and peak memory
+    """
+    stations = stations or ALL_METRO_STOPS
+    fake = FakeGoogleMaps(latency_ms=latency_ms, error_rate=error_rate, results_per_search=results_per_search)
+    server, base_url = start_fake_server(fake)
+    try:
+        benchmark = Benchmark(fake, base_url, stations, places_api, per_type)
+        report = {
+            "settings": {"stations": len(stations), "repeats": repeats, "latency_ms": latency_ms,
+                         "error_rate": error_rate, "results_per_search": results_per_search, "places_api": places_api,
+                         "per_type": per_type},
+            "stages": {},
+        }
+        pipeline = [stage for stage in STAGES if stage != "end_to_end"]
+        runs = []
+        #the stages run in pipeline order, since each one needs the data from the one before it.
+        #the last pass tracks memory, which slows it down, so its times are not used
+        for run in range(repeats + 1):
+            trace_memory = run == repeats
+            measured = {stage: benchmark.measure(stage, trace_memory) for stage in pipeline}
+            measured["end_to_end"] = benchmark.measure("end_to_end", trace_memory)
+            runs.append(measured)
+
+        for stage in STAGES:
+            result = dict(runs[0][stage])
+            result["wall_seconds"] = statistics.median(measured[stage]["wall_seconds"] for measured in runs[:-1])
+            result["peak_memory_kb"] = runs[-1][stage]["peak_memory_kb"]
+            report["stages"][stage] = result
+        benchmark.transport.close()
+        return report
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def compare_reports(baseline, current, tolerance=0.2):
+    """ This function finds stages that got slower or make more HTTP calls than in a baseline report.
+
+    Args:
+        baseline (dict): an earlier report from run_benchmark
+        current (dict): the new report
+        tolerance (float): allowed slowdown as a fraction, ie: 0.2 is 20%. Default is 0.2.
+
+    Returns:
+        list: one message per regression, empty if there are none
+    """
+    regressions = []
+    for stage, now in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before is None:
+            continue
+        if now["wall_seconds"] > before["wall_seconds"] * (1 + tolerance):
+            regressions.append(f"{stage}: {before['wall_seconds']:.4f}s -> {now['wall_seconds']:.4f}s")
+        if sum(now["http_calls"].values()) > sum(before["http_calls"].values()):
+            regressions.append(f"{stage}: {sum(before['http_calls'].values())} -> {sum(now['http_calls'].values())} HTTP calls")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the travel guide against a local fake Google Maps server.")
+    parser.add_argument("--stations", type=int, default=None, help="only run the first N stations")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--results", type=int, default=60, help="places per nearby search")
+    parser.add_argument("--places-api", choices=["legacy", "new"], default="legacy", help="nearby search API")
+    parser.add_argument("--per-type", action="store_true", help="one nearby search per type, sent at the same time")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    stations = ALL_METRO_STOPS[:args.stations] if args.stations else ALL_METRO_STOPS
+    report = run_benchmark(stations, args.repeats, args.latency_ms, args.error_rate, args.results, args.places_api,
+                           args.per_type)
+
+    for stage, result in report["stages"].items():
+        print(f"{stage:17} {result['wall_seconds'] * 1000:9.2f} ms, {sum(result['http_calls'].values()):4} calls, "
+              f"{result['bytes_received'] / 1024:8.1f} KB, peak {result['peak_memory_kb']:.0f} KB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        sys.exit(1 if regressions else 0)
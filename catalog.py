@@ -0,0 +1,321 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module builds a catalog of places for many Green Line stations at once. Neighbouring
+stops such as Archives, Gallery Pl-Chinatown and Mt Vernon are only a few hundred meters
+apart, so their nearby searches mostly return the same places. The catalog keeps each
+place's information once (keyed by place_id) and keeps walking distances separately as a
+sparse station -> {place_id: meters} mapping, so memory grows with the number of unique
+places instead of stations x places.
+
+A saved catalog is also the snapshot for incremental refreshes: refresh_catalog searches
+again, compares the results with the catalog and only asks the Distance Matrix API about
+places that are new at a station or whose coordinates changed.
+"""
+import json
+import time
+
+from geo_utils import haversine_meters
+from MetroPlacesFinder import MetroPlacesFinder
+from places import Place, PlaceColumns
+from rate_limiter import BACKGROUND
+from spatial_index import GridIndex
+from user_preference import ALL_METRO_STOPS
+
+#coordinates that move less than this (in meters) between refreshes count as unchanged
+MOVED_TOLERANCE_METERS = 1.0
+
+
+class PlaceCatalog:
+    """Unique places shared by every station, plus the walking distance from each station to its places."""
+
+    def __init__(self):
+        """ This method creates an empty catalog."""
+        #place_id: {"place_id", "name", "type_of_activity", "location"}, plus "types" (all its Google types) if known
+        self.places = {}
+        #station name: {place_id: walking distance in meters}
+        self.station_distances = {}
+        #station name: {place_id: time (seconds since the epoch) the station's nearby search last returned it}
+        self.station_fetched_at = {}
+        #HTTP calls made to each Google endpoint while building the catalog
+        self.api_call_counts = {}
+        #grid index over self.places for offline radius and nearest queries, built by index_places
+        self.spatial_index = None
+
+    def add_place(self, place):
+        """ This method stores a place's information if the catalog does not have it yet.
+
+        Args:
+            place (dict): a place from MetroPlacesFinder with a "place_id"
+
+        Returns:
+            bool: True if the place was new
+        """
+        place_id = place["place_id"]
+        if place_id in self.places:
+            return False
+        self.places[place_id] = {
+            "place_id": place_id,
+            "name": place.get("name"),
+            "type_of_activity": place.get("type_of_activity"),
+            "location": place.get("location", {}),
+        }
+        if place.get("types"):
+            self.places[place_id]["types"] = list(place["types"])
+        return True
+
+    def update_place(self, place):
+        """ This method stores a new place, or refreshes a known one. If a known place moved, its walking
+        distances from every station are removed, since they no longer hold.
+
+        Args:
+            place (dict): a place from MetroPlacesFinder with a "place_id"
+
+        Returns:
+            str: "added", "moved" or "unchanged"
+        """
+        place_id = place["place_id"]
+        existing = self.places.get(place_id)
+        if existing is None:
+            self.add_place(place)
+            return "added"
+
+        existing["name"] = place.get("name")
+        existing["type_of_activity"] = place.get("type_of_activity")
+        if place.get("types"):
+            existing["types"] = list(place["types"])
+        old, new = existing.get("location") or {}, place.get("location") or {}
+        if old == new or (old and new and haversine_meters(old, [new["lat"]], [new["lng"]])[0] <= MOVED_TOLERANCE_METERS):
+            return "unchanged"
+        existing["location"] = new
+        for distances in self.station_distances.values():
+            distances.pop(place_id, None)
+        return "moved"
+
+    def record_distance(self, station, place_id, walking_distance):
+        """ This method stores the walking distance from a station to a place.
+
+        Args:
+            station (str): the station name
+            place_id (str): the place's id
+            walking_distance (float): walking distance in meters
+        """
+        self.station_distances.setdefault(station, {})[place_id] = walking_distance
+
+    def places_for_station(self, station):
+        """ This method lists a station's places in the format used by places_filter and the rankers.
+
+        Args:
+            station (str): the station name
+
+        Returns:
+            list: one new Place per place, with the place's information and its "walking_distance"
+        """
+        distances = self.station_distances.get(station, {})
+        return [Place(**self.places[place_id], walking_distance=distance) for place_id, distance in distances.items()]
+
+    def columns_for_station(self, station):
+        """ This method packs a station's places into columns, ie: to filter and rank many of them at once.
+
+        Args:
+            station (str): the station name
+
+        Returns:
+            PlaceColumns: the station's places with their walking distances
+        """
+        return PlaceColumns.from_places(self.places_for_station(station))
+
+    def index_places(self, cell_size_meters=500):
+        """ This method builds (or rebuilds) the spatial index over every place in the catalog.
+
+        Args:
+            cell_size_meters (float): width of one grid cell in meters. Default is 500.
+
+        Returns:
+            GridIndex: the new index, also stored in self.spatial_index
+        """
+        self.spatial_index = GridIndex.from_places(self.places.values(), cell_size_meters)
+        return self.spatial_index
+
+    def to_dict(self):
+        """Returns the catalog (and its spatial index, if built) as plain data that can be written as JSON."""
+        data = {"places": self.places, "station_distances": self.station_distances,
+                "station_fetched_at": self.station_fetched_at}
+        if self.spatial_index is not None:
+            data["spatial_index"] = self.spatial_index.to_dict(include_places=False)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a catalog from the output of to_dict."""
+        catalog = cls()
+        catalog.places = data.get("places", {})
+        catalog.station_distances = data.get("station_distances", {})
+        #catalogs saved before fetch times were kept count every place with a distance as fetched at an unknown time
+        catalog.station_fetched_at = data.get("station_fetched_at") or {
+            station: dict.fromkeys(distances) for station, distances in catalog.station_distances.items()
+        }
+        if "spatial_index" in data:
+            catalog.spatial_index = GridIndex.from_dict(data["spatial_index"], places=catalog.places)
+        return catalog
+
+    def save(self, path):
+        """ This method writes the catalog to a JSON file.
+
+        Args:
+            path (str): file to write
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        """ This method reads a catalog written by save.
+
+        Args:
+            path (str): file to read
+
+        Returns:
+            PlaceCatalog: the loaded catalog
+        """
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_catalog(api_key, stations=None, included_types=["tourist_attraction"], radius_meters=5000,
+                  max_walking_distance=None, max_pages=1, cache=None, transport=None):
+    """ This function searches around every station and builds one catalog of unique places.
+
+    Args:
+        api_key (str): Google Maps API key
+        stations (list): station names. Default is every stop in user_preference.ALL_METRO_STOPS
+        included_types (list): Google place types to search for. Default is ["tourist_attraction"]
+        radius_meters (int): nearby search radius in meters. Default is 5000.
+        max_walking_distance (float): if given (in meters), distances are only requested for places
+            within this straight-line distance of a station. Default is None.
+        max_pages (int): most nearby search pages per station. Default is 1.
+        cache (ResponseCache): optional response cache shared by every station
+        transport (HttpTransport): object used to send requests. Default is the shared transport
+
+    Returns:
+        PlaceCatalog: the catalog with every station's walking distances
+    """
+    if stations is None:
+        stations = ALL_METRO_STOPS
+
+    catalog = PlaceCatalog()
+    for station in stations:
+        finder = MetroPlacesFinder(station, api_key, cache=cache, transport=transport)
+        finder.priority = BACKGROUND
+
+        #only the ids and coordinates are routed, so the shared place information is never changed
+        station_places = []
+        fetched_at = catalog.station_fetched_at.setdefault(station, {})
+        for place in finder.iter_nearby_places(radius_meters, included_types, max_pages=max_pages):
+            if place["place_id"] is None:
+                continue
+            catalog.add_place(place)
+            fetched_at[place["place_id"]] = time.time()
+            station_places.append({"place_id": place["place_id"], "name": place["name"], "location": place["location"]})
+
+        if station_places:
+            finder.places_data = station_places
+            finder.calculate_walking_distance(max_walking_distance=max_walking_distance)
+            for place in finder.places_data:
+                if "walking_distance" in place:
+                    catalog.record_distance(station, place["place_id"], place["walking_distance"])
+
+        for endpoint, count in finder.api_call_counts.items():
+            catalog.api_call_counts[endpoint] = catalog.api_call_counts.get(endpoint, 0) + count
+    return catalog
+
+
+def refresh_catalog(catalog, api_key, stations=None, included_types=["tourist_attraction"], radius_meters=5000,
+                    max_walking_distance=None, max_pages=1, cache=None, transport=None):
+    """ This function brings a catalog up to date without paying for distances that did not change.
+    Every station is searched again, and the results are compared with the catalog:
+    - added: the station did not return the place last time
+    - moved: the place's coordinates changed, so its old distances are thrown away
+    - unchanged: same place, same coordinates, so its walking distance is kept
+    - removed: the station returned the place last time but not now
+    Walking distances are only requested for added and moved places (and places that never got one).
+
+    Args:
+        catalog (PlaceCatalog): the catalog to update, ie: loaded from last night's snapshot
+        api_key (str): Google Maps API key
+        stations (list): station names. Default is every stop in user_preference.ALL_METRO_STOPS
+        included_types (list): Google place types to search for. Default is ["tourist_attraction"]
+        radius_meters (int): nearby search radius in meters. Default is 5000.
+        max_walking_distance (float): if given (in meters), distances are only requested for places
+            within this straight-line distance of a station. Default is None.
+        max_pages (int): most nearby search pages per station. Default is 1.
+        cache (ResponseCache): optional response cache shared by every station
+        transport (HttpTransport): object used to send requests. Default is the shared transport
+
+    Returns:
+        dict: "added", "moved", "unchanged" and "removed" counts, "distance_elements" paid for,
+            and the same counts for each station under "stations"
+    """
+    if stations is None:
+        stations = ALL_METRO_STOPS
+
+    report = {"added": 0, "moved": 0, "unchanged": 0, "removed": 0, "distance_elements": 0, "stations": {}}
+    moved_ids = set()
+    checked_ids = set()
+    for station in stations:
+        finder = MetroPlacesFinder(station, api_key, cache=cache, transport=transport)
+        finder.priority = BACKGROUND
+        previous = catalog.station_fetched_at.get(station, {})
+        counts = {"added": 0, "moved": 0, "unchanged": 0, "removed": 0, "distance_elements": 0}
+
+        now = time.time()
+        current = {}
+        for place in finder.iter_nearby_places(radius_meters, included_types, max_pages=max_pages):
+            place_id = place["place_id"]
+            if place_id is None or place_id in current:
+                continue
+            #each place is compared with the catalog once per refresh, even if several stations return it
+            if place_id not in checked_ids:
+                checked_ids.add(place_id)
+                if catalog.update_place(place) == "moved":
+                    moved_ids.add(place_id)
+            current[place_id] = now
+            if place_id not in previous:
+                counts["added"] += 1
+            elif place_id in moved_ids:
+                counts["moved"] += 1
+            else:
+                counts["unchanged"] += 1
+
+        distances = catalog.station_distances.get(station, {})
+        for place_id in set(previous) - set(current):
+            distances.pop(place_id, None)
+            counts["removed"] += 1
+        catalog.station_fetched_at[station] = current
+
+        station_places = [
+            {"place_id": place_id, "name": catalog.places[place_id]["name"], "location": catalog.places[place_id]["location"]}
+            for place_id in current if place_id not in distances
+        ]
+        if station_places:
+            finder.places_data = station_places
+            finder.calculate_walking_distance(max_walking_distance=max_walking_distance)
+            for place in finder.places_data:
+                if "walking_distance" in place:
+                    catalog.record_distance(station, place["place_id"], place["walking_distance"])
+                    counts["distance_elements"] += 1
+
+        for endpoint, count in finder.api_call_counts.items():
+            catalog.api_call_counts[endpoint] = catalog.api_call_counts.get(endpoint, 0) + count
+        report["stations"][station] = counts
+        for name, count in counts.items():
+            report[name] += count
+
+    #places no station returns any more are dropped
+    referenced = set()
+    for fetched_at in catalog.station_fetched_at.values():
+        referenced.update(fetched_at)
+    for place_id in set(catalog.places) - referenced:
+        del catalog.places[place_id]
+    if catalog.spatial_index is not None:
+        catalog.index_places(catalog.spatial_index.cell_size_meters)
+    return report
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from catalog import PlaceCatalog, build_catalog, refresh_catalog
+from http_transport import RecordedTransport
+
+
+def fake_overlapping_google(url, params):
+    """Every station's nearby search returns the same three places, each 300 meters away on foot."""
+    if "nearbysearch" in url:
+        return {"status": "OK", "results": [
+            {"place_id": f"id-{i}", "name": f"Place {i}", "types": ["museum"],
+             "geometry": {"location": {"lat": 38.894 + i * 0.001, "lng": -77.022}}}
+            for i in range(3)
+        ]}
+    destinations = params["destinations"].split("|")
+    return {"rows": [{"elements": [{"status": "OK", "distance": {"value": 300}} for _ in destinations]}]}
+
+
+class TestPlaceCatalog(unittest.TestCase):
+    def setUp(self):
+        self.stations = ["Archives", "Gallery Pl-Chinatown", "Mt Vernon"]
+        self.catalog = build_catalog("dummy_test_key", stations=self.stations, included_types=["museum"],
+                                     transport=RecordedTransport(fake_overlapping_google))
+
+    def test_places_stored_once(self):
+        """Places found from three overlapping stations are stored only once."""
+        self.assertEqual(len(self.catalog.places), 3)
+        self.assertEqual(self.catalog.api_call_counts, {"geocode": 0, "nearbysearch": 3, "distancematrix": 3})
+
+    def test_station_distances_are_sparse(self):
+        """Each station keeps its own distances, and its places come back ready for the rankers."""
+        self.assertEqual(set(self.catalog.station_distances), set(self.stations))
+        places = self.catalog.places_for_station("Archives")
+        self.assertEqual(len(places), 3)
+        self.assertTrue(all(place["walking_distance"] == 300 for place in places))
+        self.assertNotIn("walking_distance", self.catalog.places["id-0"])
+
+    def test_save_and_load(self):
+        """A saved catalog loads back with the same places and distances."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.json")
+            self.catalog.save(path)
+            loaded = PlaceCatalog.load(path)
+        self.assertEqual(loaded.to_dict(), self.catalog.to_dict())
+
+    def test_spatial_index_saved_with_catalog(self):
+        """The spatial index is saved with the catalog and answers queries offline after loading."""
+        self.catalog.index_places(cell_size_meters=200)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.json")
+            self.catalog.save(path)
+            loaded = PlaceCatalog.load(path)
+        nearest = loaded.spatial_index.nearest({"lat": 38.8936, "lng": -77.0217}, k=1, types={"museum"})
+        self.assertEqual(nearest[0][1]["place_id"], "id-0")
+        self.assertIs(nearest[0][1], loaded.places["id-0"])
+
+
+
+class TestRefreshCatalog(unittest.TestCase):
+    def test_only_new_and_moved_places_are_routed(self):
+        """A refresh keeps unchanged distances and only pays for the added and the moved place."""
+        catalog = build_catalog("dummy_test_key", stations=["Archives"], included_types=["museum"],
+                                transport=RecordedTransport(fake_overlapping_google))
+
+        def next_day(url, params):
+            if "nearbysearch" in url:
+                #id-0 is gone, id-1 moved about 100 meters, id-2 is the same and id-3 is new
+                return {"status": "OK", "results": [
+                    {"place_id": "id-1", "name": "Place 1", "types": ["museum"], "geometry": {"location": {"lat": 38.896, "lng": -77.022}}},
+                    {"place_id": "id-2", "name": "Place 2", "types": ["museum"], "geometry": {"location": {"lat": 38.896, "lng": -77.022}}},
+                    {"place_id": "id-3", "name": "Place 3", "types": ["museum"], "geometry": {"location": {"lat": 38.897, "lng": -77.022}}},
+                ]}
+            return fake_overlapping_google(url, params)
+
+        transport = RecordedTransport(next_day)
+        report = refresh_catalog(catalog, "dummy_test_key", stations=["Archives"], included_types=["museum"],
+                                 transport=transport)
+        self.assertEqual({name: report[name] for name in ("added", "moved", "unchanged", "removed", "distance_elements")},
+                         {"added": 1, "moved": 1, "unchanged": 1, "removed": 1, "distance_elements": 2})
+        distance_requests = [params for url, params in transport.requests if "distancematrix" in url]
+        self.assertEqual(distance_requests[0]["destinations"].count("|"), 1)
+        self.assertEqual(set(catalog.places), {"id-1", "id-2", "id-3"})
+        self.assertEqual(set(catalog.station_distances["Archives"]), {"id-1", "id-2", "id-3"})
+        self.assertEqual(catalog.places["id-1"]["location"], {"lat": 38.896, "lng": -77.022})
+
+
+if __name__ == '__main__':
+    unittest.main()
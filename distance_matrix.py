@@ -0,0 +1,292 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module exports a PlaceCatalog into one binary file that recommendation queries can use
+with no network access and no parsing. The file holds a station x place walking distance matrix
+in CSR form (for each station, the places it has a distance to and those distances), plus one
+array per place field (type code, type set code, latitude, longitude, name and place_id). A type set
+code points at one of the distinct lists of Google types stored in the header, the same way
+PlaceColumns stores them.
+
+The file is opened with a memory map, so opening it only reads a small header, the arrays are
+read straight from the OS page cache when a query touches them, and every worker process that
+opens the same file shares one copy in memory.
+
+File layout:
+    8 bytes     MAGIC
+    8 bytes     length of the header (little-endian unsigned integer)
+    header      UTF-8 JSON: stations, type names, type sets, place count and where each array starts
+    arrays      each one starting at a multiple of ALIGNMENT bytes after the header
+
+Usage: python3 distance_matrix.py catalog.json station_matrix.bin
+"""
+import json
+import struct
+import sys
+
+#pip install numpy
+import numpy as np
+
+from places import Place
+from ranking import PlaceScorer, select_top_k
+
+MAGIC = b"DCMTRX02"
+ALIGNMENT = 64
+
+#array name: dtype, in the order they are written
+SECTIONS = {
+    "indptr": "<i8",
+    "indices": "<i4",
+    "distances": "<f4",
+    "type_codes": "<i4",
+    "type_set_codes": "<i4",
+    "lats": "<f8",
+    "lngs": "<f8",
+    "name_offsets": "<i8",
+    "name_bytes": "u1",
+    "id_offsets": "<i8",
+    "id_bytes": "u1",
+}
+
+
+def _aligned(offset):
+    """Rounds an offset up to the next multiple of ALIGNMENT."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _pack_strings(strings):
+    """Encodes strings as one byte array plus len(strings) + 1 offsets into it."""
+    encoded = [(string or "").encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def export_distance_matrix(catalog, path):
+    """ This function writes a catalog's places and station distances to a memory-mappable file.
+
+    Args:
+        catalog (PlaceCatalog): the catalog to export
+        path (str): file to write
+
+    Returns:
+        dict: the file's header
+    """
+    place_ids = sorted(catalog.places)
+    place_index = {place_id: index for index, place_id in enumerate(place_ids)}
+    stations = sorted(catalog.station_distances)
+
+    type_names = []
+    type_codes = {}
+    codes = np.empty(len(place_ids), dtype=np.int32)
+    type_sets = {}
+    set_codes = np.full(len(place_ids), -1, dtype=np.int32)
+    lats = np.full(len(place_ids), np.nan)
+    lngs = np.full(len(place_ids), np.nan)
+    for index, place_id in enumerate(place_ids):
+        place = catalog.places[place_id]
+        type_name = place.get("type_of_activity")
+        if type_name not in type_codes:
+            type_codes[type_name] = len(type_names)
+            type_names.append(type_name)
+        codes[index] = type_codes[type_name]
+        types = place.get("types")
+        if types:
+            set_codes[index] = type_sets.setdefault(tuple(types), len(type_sets))
+        location = place.get("location") or {}
+        lats[index] = location.get("lat", np.nan)
+        lngs[index] = location.get("lng", np.nan)
+
+    #CSR rows: each station's places sorted by place index
+    indptr = np.zeros(len(stations) + 1, dtype=np.int64)
+    indices, distances = [], []
+    for row, station in enumerate(stations):
+        row_places = sorted((place_index[place_id], distance)
+                            for place_id, distance in catalog.station_distances[station].items() if place_id in place_index)
+        indices.extend(index for index, _ in row_places)
+        distances.extend(distance for _, distance in row_places)
+        indptr[row + 1] = len(indices)
+
+    name_offsets, name_bytes = _pack_strings(catalog.places[place_id].get("name") for place_id in place_ids)
+    id_offsets, id_bytes = _pack_strings(place_ids)
+    arrays = {
+        "indptr": indptr,
+        "indices": np.asarray(indices, dtype=np.int32),
+        "distances": np.asarray(distances, dtype=np.float32),
+        "type_codes": codes,
+        "type_set_codes": set_codes,
+        "lats": lats,
+        "lngs": lngs,
+        "name_offsets": name_offsets,
+        "name_bytes": name_bytes,
+        "id_offsets": id_offsets,
+        "id_bytes": id_bytes,
+    }
+
+    sections = {}
+    offset = 0
+    for name, dtype in SECTIONS.items():
+        array = np.ascontiguousarray(arrays[name], dtype=dtype)
+        arrays[name] = array
+        offset = _aligned(offset)
+        sections[name] = [offset, len(array)]
+        offset += array.nbytes
+
+    header = {"version": 2, "stations": stations, "type_names": type_names,
+              "type_sets": [list(types) for types in type_sets], "place_count": len(place_ids), "sections": sections}
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name in SECTIONS:
+            f.seek(data_start + sections[name][0])
+            f.write(arrays[name].tobytes())
+    return header
+
+
+class DistanceMatrix:
+    """A station x place walking distance matrix read from a memory-mapped file made by export_distance_matrix.
+
+    Every array attribute is a read-only view of the mapped file, not a copy.
+    """
+
+    def __init__(self, path):
+        """ This method maps the file and reads its header.
+
+        Args:
+            path (str): file written by export_distance_matrix
+
+        Raises:
+            ValueError: if the file is not a distance matrix file
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a distance matrix file")
+            header_length = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_length))
+
+        self.path = path
+        self.stations = header["stations"]
+        self.station_rows = {station: row for row, station in enumerate(self.stations)}
+        self.type_names = header["type_names"]
+        self.type_sets = [tuple(types) for types in header["type_sets"]]
+        self.place_count = header["place_count"]
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        data_start = _aligned(len(MAGIC) + 8 + header_length)
+        for name, dtype in SECTIONS.items():
+            offset, length = header["sections"][name]
+            start = data_start + offset
+            setattr(self, name, self._map[start:start + length * np.dtype(dtype).itemsize].view(dtype))
+
+    def station_row(self, station):
+        """ This method gives one station's places and walking distances.
+
+        Args:
+            station (str): the station name
+
+        Returns:
+            tuple: (place indices, walking distances in meters), both views of the mapped file.
+                Both are empty for an unknown station.
+        """
+        row = self.station_rows.get(station)
+        if row is None:
+            return self.indices[:0], self.distances[:0]
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.distances[start:end]
+
+    def filter(self, station, activity_types, max_walking_distance):
+        """ This method does what places_filter does, on the mapped arrays.
+
+        Args:
+            station (str): the station name
+            activity_types (list): wanted activity types, matched against all of a place's Google types
+            max_walking_distance (float): maximum walking distance in meters
+
+        Returns:
+            tuple: (place indices, walking distances) of the places that have one of the activity types
+                and are close enough
+        """
+        indices, distances = self.station_row(station)
+        #the extra False is picked by code -1
+        wanted = np.array([name in activity_types for name in self.type_names] + [False])
+        wanted_sets = np.array([not set(types).isdisjoint(activity_types) for types in self.type_sets] + [False])
+        mask = ((wanted[self.type_codes[indices]] | wanted_sets[self.type_set_codes[indices]]) &
+                (distances <= max_walking_distance))
+        return indices[mask], distances[mask]
+
+    def rank(self, station, user_preferences, weights, k=5, filtered=True):
+        """ This method does what places_filter followed by places_ranker does, on the mapped arrays.
+        Only the k places returned are built as Place objects.
+
+        Args:
+            station (str): the station name
+            user_preferences (dict): "type_of_activity" (list, most preferred first) and "max_walking_distance" (meters)
+            weights (dict): weight values, ie: {"activity": 5, "distance": 3}
+            k (int): how many places to return. Default is 5.
+            filtered (bool): whether places are filtered first like places_filter. Default is True.
+
+        Returns:
+            list: Places with "walking_distance" and "score", best first
+        """
+        scorer = PlaceScorer(
+            user_preferences["type_of_activity"],
+            user_preferences["max_walking_distance"],
+            activity_weight=weights.get("activity", 1),
+            distance_weight=weights.get("distance", 1),
+        )
+        if filtered:
+            indices, distances = self.filter(station, user_preferences["type_of_activity"],
+                                             user_preferences["max_walking_distance"])
+        else:
+            indices, distances = self.station_row(station)
+        scores = scorer.score_arrays(self.type_names, self.type_codes[indices], distances,
+                                     type_sets=self.type_sets, type_set_codes=self.type_set_codes[indices])
+        results = []
+        for position in select_top_k(scores, k):
+            place = self.place(indices[position], distances[position])
+            place.score = float(scores[position])
+            results.append(place)
+        return results
+
+    def _string(self, offsets, data, index):
+        return bytes(data[offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+    def place(self, index, walking_distance=None):
+        """ This method builds a Place from one column of the matrix.
+
+        Args:
+            index (int): the place's index
+            walking_distance (float): distance to store on the place. Default is None (not set)
+
+        Returns:
+            Place: the place
+        """
+        code = self.type_codes[index]
+        place = Place(self._string(self.id_offsets, self.id_bytes, index),
+                      self._string(self.name_offsets, self.name_bytes, index),
+                      self.type_names[code] if code >= 0 else "Unknown Type of Activity")
+        if self.type_set_codes[index] >= 0:
+            place.types = list(self.type_sets[self.type_set_codes[index]])
+        if not np.isnan(self.lats[index]):
+            place.location = {"lat": float(self.lats[index]), "lng": float(self.lngs[index])}
+        if walking_distance is not None:
+            place.walking_distance = float(walking_distance)
+        return place
+
+    def close(self):
+        """Drops this object's references to the mapped file, which is unmapped once no view of it is left."""
+        for name in SECTIONS:
+            setattr(self, name, None)
+        self._map = None
+
+
+if __name__ == "__main__":
+    #imported here so loading a matrix never imports the finder and its HTTP stack
+    from catalog import PlaceCatalog
+
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python3 distance_matrix.py catalog.json station_matrix.bin")
+    header = export_distance_matrix(PlaceCatalog.load(sys.argv[1]), sys.argv[2])
+    print(f"Wrote {len(header['stations'])} stations x {header['place_count']} places to {sys.argv[2]}")
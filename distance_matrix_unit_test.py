@@ -0,0 +1,77 @@
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+from catalog import build_catalog
+from distance_matrix import DistanceMatrix, export_distance_matrix
+from http_transport import RecordedTransport
+from MetroPlacesFinder import MetroPlacesFinder
+
+
+def fake_google(url, params):
+    """Each station finds eight places of alternating types, every third one also a cafe, each one 200 meters
+    farther on foot than the last."""
+    if "nearbysearch" in url:
+        return {"status": "OK", "results": [
+            {"place_id": f"id-{i}", "name": f"Place {i}", "types": [["museum", "park"][i % 2]] + ["cafe"] * (i % 3 == 0),
+             "geometry": {"location": {"lat": 38.894 + i * 0.001, "lng": -77.022}}}
+            for i in range(8)
+        ]}
+    destinations = params["destinations"].split("|")
+    return {"rows": [{"elements": [{"status": "OK", "distance": {"value": 200 * (i + 1)}} for i in range(len(destinations))]}]}
+
+
+class TestDistanceMatrix(unittest.TestCase):
+    def setUp(self):
+        self.catalog = build_catalog("dummy_test_key", stations=["Archives", "Mt Vernon"], included_types=["museum"],
+                                     transport=RecordedTransport(fake_google))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "matrix.bin")
+        export_distance_matrix(self.catalog, self.path)
+        self.matrix = DistanceMatrix(self.path)
+        self.addCleanup(self.matrix.close)
+
+    def test_rows_are_views_of_the_file(self):
+        """A station's row matches the catalog and is read from the mapped file without copying."""
+        indices, distances = self.matrix.station_row("Archives")
+        expected = self.catalog.station_distances["Archives"]
+        self.assertEqual({self.matrix.place(index)["place_id"]: float(distance) for index, distance in zip(indices, distances)},
+                         expected)
+        self.assertTrue(np.shares_memory(distances, self.matrix._map))
+        self.assertEqual(len(self.matrix.station_row("Unknown")[0]), 0)
+
+    def test_rank_matches_finder(self):
+        """Filtering and ranking on the matrix gives the same places and scores as places_filter and places_ranker."""
+        preferences = {"type_of_activity": ["park", "museum"], "max_walking_distance": 1200}
+        weights = {"activity": 5, "distance": 3}
+        finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=RecordedTransport({}))
+        finder.places_data = self.catalog.places_for_station("Archives")
+        expected = finder.places_ranker(finder.places_filter(preferences), preferences, weights, k=3)
+        ranked = self.matrix.rank("Archives", preferences, weights, k=3)
+        self.assertEqual([(place["place_id"], place["score"]) for place in ranked],
+                         [(place["place_id"], place["score"]) for place in expected])
+
+    def test_rank_uses_every_type(self):
+        """A park that is also a cafe is filtered and scored as a cafe, the same as places_filter and places_ranker."""
+        preferences = {"type_of_activity": ["cafe", "museum"], "max_walking_distance": 1600}
+        weights = {"activity": 500, "distance": 1}
+        finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=RecordedTransport({}))
+        finder.places_data = self.catalog.places_for_station("Archives")
+        expected = finder.places_ranker(finder.places_filter(preferences), preferences, weights)
+        ranked = self.matrix.rank("Archives", preferences, weights, k=len(expected))
+        self.assertEqual([(place["place_id"], place["score"]) for place in ranked],
+                         [(place["place_id"], place["score"]) for place in expected])
+        self.assertIn("id-3", [place["place_id"] for place in ranked])
+        self.assertEqual(self.matrix.place(self.matrix.station_row("Archives")[0][3])["types"], ["park", "cafe"])
+
+    def test_opens_quickly(self):
+        """Opening the file only reads the header."""
+        start = time.perf_counter()
+        DistanceMatrix(self.path).close()
+        self.assertLess(time.perf_counter() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
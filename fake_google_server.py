@@ -0,0 +1,227 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module runs a local stand-in for the Google Maps endpoints the travel guide uses
+(geocode, nearbysearch with next_page_token paging, distancematrix, and the field-masked
+Places API (New) places:searchNearby), so performance can be
+measured without touching Google or spending quota. Answers are deterministic for the same
+settings and seed: the same station gets the same coordinates, the same search gets the same
+places and walking distances are the straight-line distance times a fixed detour factor.
+
+Latency, the error rate (HTTP 500), the OVER_QUERY_LIMIT rate and the number of results per
+search can all be configured.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from geo_utils import haversine_meters
+from instrumentation import endpoint_name
+
+#walking routes are this much longer than a straight line
+DETOUR_FACTOR = 1.3
+
+#results per nearby search page, same as Google
+PAGE_SIZE = 20
+
+#types handed out when a search does not ask for any
+DEFAULT_TYPES = ["tourist_attraction", "museum", "park", "restaurant", "cafe", "bar"]
+
+
+def _stable_fraction(text):
+    """Maps a string to a repeatable number between 0 and 1."""
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+
+class FakeGoogleMaps:
+    """The fake server's settings, request counts and response logic (independent of HTTP)."""
+
+    def __init__(self, latency_ms=0, error_rate=0.0, over_query_limit_rate=0.0, results_per_search=60, seed=326):
+        """ This method stores the settings.
+
+        Args:
+            latency_ms (float): delay added to every response in milliseconds. Default is 0.
+            error_rate (float): fraction of requests answered with HTTP 500. Default is 0.
+            over_query_limit_rate (float): fraction of requests answered with OVER_QUERY_LIMIT. Default is 0.
+            results_per_search (int): places each nearby search has in total, 20 per page. Default is 60.
+            seed (int): seed for the random error injection. Default is 326.
+        """
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.over_query_limit_rate = over_query_limit_rate
+        self.results_per_search = results_per_search
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_counts = {"geocode": 0, "nearbysearch": 0, "distancematrix": 0, "places_new_nearby": 0}
+        self.bytes_sent = 0
+
+    def reset_counts(self):
+        """Sets every request count and the byte count back to 0."""
+        with self._lock:
+            self.request_counts = {endpoint: 0 for endpoint in self.request_counts}
+            self.bytes_sent = 0
+
+    def handle(self, path, params):
+        """ This method answers one request.
+
+        Args:
+            path (str): url path, ie: "/maps/api/geocode/json"
+            params (dict): query parameters, one value each. For a POST, the JSON body plus the
+                X-Goog-FieldMask header as "fieldMask"
+
+        Returns:
+            tuple: (HTTP status code, response dictionary)
+        """
+        endpoint = endpoint_name(path)
+        if endpoint not in self.request_counts:
+            return 404, {"status": "NOT_FOUND"}
+
+        with self._lock:
+            self.request_counts[endpoint] += 1
+            roll = self._random.random()
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if roll < self.error_rate:
+            return 500, {"status": "UNKNOWN_ERROR"}
+        if roll < self.error_rate + self.over_query_limit_rate:
+            if endpoint == "places_new_nearby":
+                return 429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}
+            return 200, {"status": "OVER_QUERY_LIMIT", "results": []}
+        if endpoint == "places_new_nearby":
+            return self._places_new_nearby(params)
+
+        return 200, getattr(self, f"_{endpoint}")(params)
+
+    def _geocode(self, params):
+        """Places every address somewhere in downtown DC, always at the same spot."""
+        address = params.get("address", "")
+        location = {"lat": 38.88 + 0.05 * _stable_fraction(address), "lng": -77.05 + 0.05 * _stable_fraction(address[::-1])}
+        return {"status": "OK", "results": [{"formatted_address": address, "geometry": {"location": location}}]}
+
+    def _nearbysearch(self, params):
+        """Returns one page of made-up places around the search location."""
+        if "pagetoken" in params:
+            search, offset = params["pagetoken"].rsplit(":", 1)
+            location, radius, types = json.loads(search)
+            offset = int(offset)
+        else:
+            location, radius, types = params["location"], params.get("radius", "5000"), params.get("types", "")
+            offset = 0
+        lat, lng = (float(value) for value in location.split(","))
+        spread = float(radius) / 111320.0
+        type_choices = types.split("|") if types else DEFAULT_TYPES
+
+        results = []
+        for i in range(offset, min(offset + PAGE_SIZE, self.results_per_search)):
+            key = f"{location}|{types}|{i}"
+            place_type = type_choices[i % len(type_choices)]
+            results.append({
+                "place_id": f"fake-{hashlib.md5(key.encode('utf-8')).hexdigest()[:16]}",
+                "name": f"Fake {place_type.replace('_', ' ').title()} {i}",
+                "types": [place_type, "point_of_interest", "establishment"],
+                "geometry": {"location": {
+                    "lat": lat + spread * (2 * _stable_fraction(key + "lat") - 1) * 0.7,
+                    "lng": lng + spread * (2 * _stable_fraction(key + "lng") - 1) * 0.7,
+                }},
+                "rating": round(3 + 2 * _stable_fraction(key + "rating"), 1),
+                "vicinity": f"{i} Fake Street NW, Washington",
+                "business_status": "OPERATIONAL",
+                "photos": [{"height": 1080, "width": 1920, "photo_reference": "x" * 200}],
+            })
+
+        response = {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+        if offset + PAGE_SIZE < self.results_per_search:
+            response["next_page_token"] = f"{json.dumps([location, radius, types])}:{offset + PAGE_SIZE}"
+        return response
+
+    def _places_new_nearby(self, params):
+        """Returns the same places as the first legacy page, in the Places API (New) format and cut down to the field mask."""
+        if not params.get("fieldMask"):
+            return 400, {"error": {"code": 400, "message": "FieldMask is a required parameter", "status": "INVALID_ARGUMENT"}}
+        circle = params["locationRestriction"]["circle"]
+        legacy = self._nearbysearch({
+            "location": f"{circle['center']['latitude']},{circle['center']['longitude']}",
+            "radius": str(circle["radius"]),
+            "types": "|".join(params.get("includedTypes", [])),
+        })
+        wanted = {field.split(".", 1)[1] for field in params["fieldMask"].split(",") if field.startswith("places.")}
+        places = []
+        for result in legacy["results"][:params.get("maxResultCount", 20)]:
+            location = result["geometry"]["location"]
+            place = {
+                "id": result["place_id"],
+                "displayName": {"text": result["name"], "languageCode": "en"},
+                "types": result["types"],
+                "primaryType": result["types"][0],
+                "location": {"latitude": location["lat"], "longitude": location["lng"]},
+                "rating": result["rating"],
+                "formattedAddress": result["vicinity"],
+                "businessStatus": result["business_status"],
+                "photos": [{"name": "places/x/photos/" + "x" * 200, "widthPx": 1920, "heightPx": 1080}],
+            }
+            places.append({field: value for field, value in place.items() if field in wanted})
+        return 200, {"places": places} if places else {}
+
+    def _distancematrix(self, params):
+        """Returns walking distances as the straight-line distance times DETOUR_FACTOR."""
+        lat, lng = (float(value) for value in params["origins"].split(","))
+        destinations = [destination.split(",") for destination in params["destinations"].split("|")]
+        distances = haversine_meters({"lat": lat, "lng": lng},
+                                     [float(d[0]) for d in destinations], [float(d[1]) for d in destinations])
+        elements = [
+            {"status": "OK", "distance": {"value": int(distance * DETOUR_FACTOR), "text": ""},
+             "duration": {"value": int(distance * DETOUR_FACTOR / 1.4), "text": ""}}
+            for distance in distances
+        ]
+        return {"status": "OK", "rows": [{"elements": elements}]}
+
+
+def start_fake_server(fake=None, host="127.0.0.1", port=0):
+    """ This function starts the fake server on a background thread.
+
+    Args:
+        fake (FakeGoogleMaps): settings and state of the fake. Default is None (a FakeGoogleMaps with its defaults)
+        host (str): address to listen on. Default is "127.0.0.1".
+        port (int): port to listen on, 0 picks a free one. Default is 0.
+
+    Returns:
+        tuple: (the running ThreadingHTTPServer, its base url such as "http://127.0.0.1:54321").
+            Call server.shutdown() and server.server_close() to stop it.
+    """
+    fake = fake if fake is not None else FakeGoogleMaps()
+
+    class FakeGoogleHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keeps connections alive like Google does
+        disable_nagle_algorithm = True  # headers and body are written separately, so do not wait to batch them
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+            self._send_json(*fake.handle(url.path, params))
+
+        def do_POST(self):
+            params = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            params["fieldMask"] = self.headers.get("X-Goog-FieldMask", "")
+            self._send_json(*fake.handle(urlparse(self.path).path, params))
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            with fake._lock:
+                fake.bytes_sent += len(body)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), FakeGoogleHandler)
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
@@ -0,0 +1,48 @@
+import unittest
+from benchmark import compare_reports, run_benchmark
+from fake_google_server import FakeGoogleMaps, start_fake_server
+from http_transport import HttpTransport
+from MetroPlacesFinder import MetroPlacesFinder
+
+
+class TestFakeGoogleServer(unittest.TestCase):
+    def setUp(self):
+        """Starts a fake server with 45 places per search and a finder pointed at it."""
+        self.fake = FakeGoogleMaps(results_per_search=45)
+        self.server, base_url = start_fake_server(self.fake)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.transport = HttpTransport(base_url=base_url)
+        self.addCleanup(self.transport.close)
+        self.finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=self.transport)
+        self.finder.page_token_delay = 0
+
+    def test_pages_and_distances(self):
+        """All three pages come back through next_page_token and every place gets a walking distance."""
+        self.finder.get_nearby_places(included_types=["museum"], max_pages=3)
+        self.assertEqual(len(self.finder.places_data), 45)
+        self.finder.calculate_walking_distance()
+        self.assertEqual(self.fake.request_counts, {"geocode": 0, "nearbysearch": 3, "distancematrix": 2, "places_new_nearby": 0})
+        self.assertTrue(all(0 < place["walking_distance"] < 10000 for place in self.finder.places_data))
+        self.assertGreater(self.transport.bytes_received, 0)
+
+    def test_errors_are_retried(self):
+        """With every other request failing, the transport's retries still get an answer."""
+        self.fake.error_rate = 0.5
+        self.transport.backoff_base = 0.001
+        self.assertIsNotNone(self.finder.get_location_coordinates())
+        self.assertGreaterEqual(self.transport.request_count, 1)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_report_and_compare(self):
+        """A small benchmark reports every stage, and an identical report has no regressions."""
+        report = run_benchmark(stations=["Archives", "Waterfront"], repeats=1, results_per_search=20)
+        self.assertEqual(report["stages"]["end_to_end"]["http_calls"]["nearbysearch"], 2)
+        self.assertEqual(compare_reports(report, report), [])
+        slower = {"stages": {"ranking": {**report["stages"]["ranking"], "wall_seconds": 0}}}
+        self.assertEqual(len(compare_reports(slower, report)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds straight-line (great-circle) distance helpers. A walking route can never
+be shorter than the straight line between its two ends, so these distances are a cheap way
+to rule out places before paying for Distance Matrix elements.
+"""
+#pip install numpy
+import numpy as np
+
+#mean radius of the Earth in meters
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def haversine_meters(origin, lats, lngs):
+    """ This function computes the great-circle distance from one point to many points at once.
+
+    Args:
+        origin (dict): a dictionary with 'lat' and 'lng' of the starting point, ie: the metro stop
+        lats (sequence of float): latitudes of the other points
+        lngs (sequence of float): longitudes of the other points
+
+    Returns:
+        numpy.ndarray: distance in meters from the origin to each point, in the same order
+    """
+    lat1 = np.radians(origin["lat"])
+    lng1 = np.radians(origin["lng"])
+    lat2 = np.radians(np.asarray(lats, dtype=float))
+    lng2 = np.radians(np.asarray(lngs, dtype=float))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
@@ -0,0 +1,21 @@
+import unittest
+from geo_utils import haversine_meters
+
+
+class TestHaversine(unittest.TestCase):
+    def test_known_distance(self):
+        """Archives to L'Enfant Plaza is a little under one kilometer in a straight line."""
+        distances = haversine_meters({"lat": 38.8936, "lng": -77.0217}, [38.8848], [-77.0219])
+        self.assertAlmostEqual(distances[0], 978, delta=5)
+
+    def test_many_points_at_once(self):
+        """Distances come back in the same order as the points, and the origin itself is 0 meters away."""
+        origin = {"lat": 38.8936, "lng": -77.0217}
+        distances = haversine_meters(origin, [38.8936, 38.9936, 38.8936], [-77.0217, -77.0217, -76.9217])
+        self.assertEqual(len(distances), 3)
+        self.assertAlmostEqual(distances[0], 0)
+        self.assertGreater(distances[1], distances[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
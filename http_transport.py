@@ -0,0 +1,249 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds the HTTP transport used for every Google Maps API call. One shared
+transport keeps a pooled requests.Session, so connections (and their TLS handshakes)
+are reused between calls, every call has an explicit timeout, and transient failures
+(5xx responses, timeouts and dropped connections) are retried a few times with jittered
+exponential backoff instead of crashing the run. OVER_QUERY_LIMIT is returned at once, so the
+rate_limiter.RequestScheduler that sends every request can slow down and retry it against
+its token buckets and daily quotas.
+
+Any object with get_json(url, params) and post_json(url, body, headers) methods can stand in for
+the transport, such as RecordedTransport below, which answers from canned responses for tests and
+benchmarks. post_json is only needed for the Places API (New).
+"""
+#pip install requests
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import endpoint_name, get_metrics
+
+#scheme and host of every Google Maps API url, and of the Places API (New)
+GOOGLE_MAPS_ORIGIN = "https://maps.googleapis.com"
+PLACES_API_ORIGIN = "https://places.googleapis.com"
+
+
+class TransportError(Exception):
+    """Raised when a request still fails after all of its retries."""
+
+
+class HttpTransport:
+    """A pooled, retrying HTTP client for the Google Maps JSON endpoints."""
+
+    def __init__(self, pool_size=10, timeout=(3.05, 10), max_retries=3, backoff_base=0.5, backoff_cap=8.0,
+                 sleep=time.sleep, base_url=None, metrics=None):
+        """ This method sets up the session and its connection pool.
+
+        Args:
+            pool_size (int): number of keep-alive connections kept per host. Default is 10.
+            timeout (float or tuple): connect and read timeouts in seconds passed to every request
+            max_retries (int): how many times a failed request is retried. Default is 3.
+            backoff_base (float): delay in seconds before the first retry, doubled for every retry after it
+            backoff_cap (float): longest delay in seconds between two retries
+            sleep (callable): function used to wait between retries (replaced in tests)
+            base_url (str): if given, replaces "https://maps.googleapis.com" and "https://places.googleapis.com"
+                in every url, ie: to send requests to a local fake server. Default is None.
+            metrics (Metrics): where response bytes and retries are counted per endpoint. Default is None,
+                which uses the metrics shared by the whole process
+        """
+        self.base_url = base_url.rstrip("/") if base_url else None
+        #attempts sent (retries included) and response body bytes received
+        self.request_count = 0
+        self.bytes_received = 0
+        self._counts_lock = threading.Lock()
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def backoff_delay(self, attempt):
+        """ This method picks how long to wait before a retry ("full jitter" exponential backoff).
+
+        Args:
+            attempt (int): number of attempts that have already failed, starting at 0
+
+        Returns:
+            float: a random delay between 0 and min(backoff_cap, backoff_base * 2 ** attempt) seconds
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def get_json(self, url, params):
+        """ This method sends a GET request and decodes the JSON response, retrying transient failures.
+
+        Args:
+            url (str): the endpoint url
+            params (dict): query parameters for the request
+
+        Returns:
+            dict: the decoded JSON response. An OVER_QUERY_LIMIT response is returned without retrying,
+                since the scheduler handles it.
+
+        Raises:
+            TransportError: if the request still times out, cannot connect or gets a 5xx response after every retry,
+                or if the response is not JSON
+        """
+        return self._send("GET", url, params=params)
+
+    def post_json(self, url, body, headers=None):
+        """ This method sends a JSON POST request (used by the Places API (New)) and decodes the JSON response,
+        retrying the same failures as get_json. HTTP 429 is that API's OVER_QUERY_LIMIT, so it comes back
+        at once with "status": "OVER_QUERY_LIMIT" added.
+
+        Args:
+            url (str): the endpoint url
+            body (dict): the JSON request body
+            headers (dict): extra headers, ie: "X-Goog-Api-Key" and "X-Goog-FieldMask". Default is None.
+
+        Returns:
+            dict: the decoded JSON response. Other 4xx answers are returned as they are, with an "error" key.
+
+        Raises:
+            TransportError: if the request still times out, cannot connect or gets a 5xx response after every retry,
+                or if the response is not JSON
+        """
+        return self._send("POST", url, json=body, headers=headers)
+
+    def _send(self, method, url, **kwargs):
+        """Sends one request with the retries described in get_json."""
+        if self.base_url is not None:
+            for origin in (GOOGLE_MAPS_ORIGIN, PLACES_API_ORIGIN):
+                if url.startswith(origin):
+                    url = self.base_url + url[len(origin):]
+        endpoint = endpoint_name(url)
+
+        for attempt in range(self.max_retries + 1):
+            with self._counts_lock:
+                self.request_count += 1
+            if attempt:
+                self.metrics.increment(f"http_retries.{endpoint}")
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                payload = None
+            else:
+                with self._counts_lock:
+                    self.bytes_received += len(response.content)
+                self.metrics.increment(f"response_bytes.{endpoint}", len(response.content))
+                if response.status_code >= 500:
+                    error = TransportError(f"{url} returned HTTP {response.status_code}")
+                    payload = None
+                else:
+                    try:
+                        payload = response.json()
+                    except ValueError as e:
+                        #ie: an HTML error page from a proxy, which a retry would not change
+                        raise TransportError(f"{url} returned HTTP {response.status_code} that is not JSON") from e
+                    if response.status_code == 429:
+                        payload["status"] = "OVER_QUERY_LIMIT"
+                    return payload
+
+            if attempt < self.max_retries:
+                self.sleep(self.backoff_delay(attempt))
+
+        raise TransportError(f"Request to {url} failed after {self.max_retries + 1} attempts: {error}") from error
+
+    def close(self):
+        """Closes every pooled connection."""
+        self.session.close()
+
+
+class RecordedTransport:
+    """A transport that answers from canned responses instead of the network.
+
+    Responses can be given as a function of (url, params), or as a dictionary from endpoint
+    name (the part of the url such as "geocode" or "distancematrix") to either a response
+    dictionary or a function of params. Every request is kept in self.requests.
+    """
+
+    def __init__(self, responses):
+        """ This method stores the canned responses.
+
+        Args:
+            responses (callable or dict): how to answer each request, as described above
+        """
+        self.responses = responses
+        self.requests = []
+        #headers of each POST request
+        self.headers = []
+        self._lock = threading.Lock()
+
+    def get_json(self, url, params):
+        """ This method records the request and returns its canned response.
+
+        Args:
+            url (str): the endpoint url
+            params (dict): query parameters for the request
+
+        Returns:
+            dict: the canned response
+        """
+        with self._lock:
+            self.requests.append((url, dict(params)))
+        return self._answer(url, params)
+
+    def post_json(self, url, body, headers=None):
+        """ This method records a POST request and returns its canned response. Functions get the body as params.
+
+        Args:
+            url (str): the endpoint url
+            body (dict): the JSON request body
+            headers (dict): request headers, kept in self.headers. Default is None.
+
+        Returns:
+            dict: the canned response
+        """
+        with self._lock:
+            self.requests.append((url, dict(body)))
+            self.headers.append(dict(headers or {}))
+        return self._answer(url, body)
+
+    def _answer(self, url, params):
+        """Finds the canned response for a request."""
+        if callable(self.responses):
+            return self.responses(url, params)
+        for endpoint, response in self.responses.items():
+            if endpoint in url:
+                return response(params) if callable(response) else response
+        raise TransportError(f"No recorded response for {url}")
+
+    def close(self):
+        """Nothing to close for canned responses."""
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """ This function returns the transport shared by every MetroPlacesFinder, creating it on first use.
+
+    Returns:
+        HttpTransport: the shared transport
+    """
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport()
+        return _default_transport
+
+
+def set_default_transport(transport):
+    """ This function swaps the shared transport, ie: for a fake server or a recorded-response transport.
+
+    Args:
+        transport: any object with get_json(url, params) (and post_json) methods, or None to go back to a fresh HttpTransport
+    """
+    global _default_transport
+    with _default_transport_lock:
+        _default_transport = transport
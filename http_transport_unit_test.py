@@ -0,0 +1,76 @@
+import json
+import unittest
+from unittest import mock
+import requests
+import http_transport
+from http_transport import HttpTransport, RecordedTransport, TransportError, get_default_transport, set_default_transport
+
+
+def make_response(status_code, payload=None):
+    """Builds a fake requests response with a status code and JSON payload."""
+    response = mock.Mock(status_code=status_code, content=json.dumps(payload or {}).encode())
+    response.json.return_value = payload or {}
+    return response
+
+
+class TestHttpTransport(unittest.TestCase):
+    def setUp(self):
+        """Creates a transport whose session is mocked and whose retries do not actually wait."""
+        self.delays = []
+        self.transport = HttpTransport(max_retries=2, sleep=self.delays.append)
+        self.transport.session = mock.Mock()
+
+    def test_retries_server_errors(self):
+        """A 503 followed by a good response should retry once and return the good response."""
+        self.transport.session.request.side_effect = [make_response(503), make_response(200, {"status": "OK"})]
+        self.assertEqual(self.transport.get_json("https://example.test/geocode/json", {}), {"status": "OK"})
+        self.assertEqual(len(self.delays), 1)
+        self.assertEqual(self.transport.request_count, 2)
+        self.assertEqual(self.transport.bytes_received, len(b'{}') + len(b'{"status": "OK"}'))
+
+    def test_base_url_redirects_google_requests(self):
+        """With a base_url, Google Maps urls are sent to that server instead."""
+        self.transport.base_url = "http://127.0.0.1:9000"
+        self.transport.session.request.return_value = make_response(200, {"status": "OK"})
+        self.transport.get_json("https://maps.googleapis.com/maps/api/geocode/json", {})
+        self.assertEqual(self.transport.session.request.call_args[0][1], "http://127.0.0.1:9000/maps/api/geocode/json")
+
+    def test_returns_over_query_limit_at_once(self):
+        """OVER_QUERY_LIMIT and HTTP 429 are left to the scheduler, so they are returned without a retry."""
+        self.transport.session.request.return_value = make_response(200, {"status": "OVER_QUERY_LIMIT"})
+        response = self.transport.get_json("https://example.test/geocode/json", {})
+        self.assertEqual(response["status"], "OVER_QUERY_LIMIT")
+        self.transport.session.request.return_value = make_response(429, {"error": {"code": 429}})
+        response = self.transport.post_json("https://example.test/v1/places:searchNearby", {})
+        self.assertEqual(response["status"], "OVER_QUERY_LIMIT")
+        self.assertEqual(self.transport.session.request.call_count, 2)
+        self.assertEqual(self.delays, [])
+
+    def test_gives_up_after_timeouts(self):
+        """Requests that keep timing out raise a TransportError instead of hanging the run."""
+        self.transport.session.request.side_effect = requests.Timeout("too slow")
+        with self.assertRaises(TransportError):
+            self.transport.get_json("https://example.test/geocode/json", {})
+        self.assertTrue(all(0 <= delay <= self.transport.backoff_cap for delay in self.delays))
+
+    def test_non_json_body_is_a_transport_error(self):
+        """An HTML error page (ie: a 403 from a proxy) raises a TransportError at once instead of a JSON error."""
+        response = make_response(403)
+        response.json.side_effect = json.JSONDecodeError("Expecting value", "<html>", 0)
+        self.transport.session.request.return_value = response
+        with self.assertRaises(TransportError):
+            self.transport.get_json("https://example.test/geocode/json", {})
+        self.assertEqual(self.transport.session.request.call_count, 1)
+
+    def test_default_transport_is_shared_and_pluggable(self):
+        """Every caller gets the same default transport until a different one is plugged in."""
+        self.addCleanup(set_default_transport, http_transport._default_transport)
+        self.assertIs(get_default_transport(), get_default_transport())
+        recorded = RecordedTransport({"geocode": {"status": "OK"}})
+        set_default_transport(recorded)
+        self.assertIs(get_default_transport(), recorded)
+        self.assertEqual(recorded.get_json("https://example.test/geocode/json", {"address": "a"}), {"status": "OK"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""DC Metro Travel Guide for UMD Students
+
+This script measures how long the program's entry points take to import, using Python's
+-X importtime in a fresh interpreter for every run, and checks them against a time budget.
+It also checks that importing them does not load the heavy dependencies (requests and numpy),
+which are only meant to be imported once a request is actually sent or an array is needed.
+Many short-lived processes (batch workers, one-off CLI runs) pay the import cost every time,
+so this guards the cold start.
+
+Usage:
+    python3 import_benchmark.py                          (exits with status 1 if a budget is broken)
+    python3 import_benchmark.py --budget user_preference=40 --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+#entry point module: budget in milliseconds for its cumulative import time
+DEFAULT_BUDGETS_MS = {
+    "user_preference": 60,
+    "MetroPlacesFinder": 50,
+    "batch_mode": 80,
+    "recommendation_service": 100,
+}
+
+#modules no entry point should load at import time
+HEAVY_MODULES = ("requests", "numpy")
+
+#this folder, so the entry points can be imported from any working directory
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(code, cwd=None, importtime=False):
+    """ This function runs some code in a fresh interpreter that can import this folder's modules.
+
+    Args:
+        code (str): the code to run
+        cwd (str): working directory. Default is None (this process's)
+        importtime (bool): whether to pass -X importtime. Default is False.
+
+    Returns:
+        subprocess.CompletedProcess: the finished process, with text stdout and stderr
+
+    Raises:
+        subprocess.CalledProcessError: if the code fails
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PACKAGE_DIR, os.environ.get("PYTHONPATH")])))
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+def parse_importtime(output, module):
+    """ This function reads the -X importtime lines of one top-level import.
+
+    Args:
+        output (str): stderr of a run with -X importtime
+        module (str): the module that was imported
+
+    Returns:
+        tuple: (cumulative import time in milliseconds, names of every module it loaded, itself included)
+
+    Raises:
+        ValueError: if the output has no top-level line for module
+    """
+    loaded = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            #the header line
+            continue
+        #children are indented by two spaces per level under the module that imported them
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        loaded.append(name.strip())
+        if depth == 0:
+            if name.strip() == module:
+                return int(cumulative) / 1000, loaded
+            #a top-level import before ours, ie: during interpreter startup
+            loaded = []
+    raise ValueError(f"no import time reported for {module}")
+
+
+def measure_import(module, runs=5):
+    """ This function imports a module in several fresh interpreters.
+
+    Args:
+        module (str): the module to import
+        runs (int): number of interpreters. Default is 5.
+
+    Returns:
+        dict: "module", the median "milliseconds" and the "heavy_modules" from HEAVY_MODULES it loaded
+    """
+    times = []
+    for _ in range(runs):
+        milliseconds, loaded = parse_importtime(run_python(f"import {module}", importtime=True).stderr, module)
+        times.append(milliseconds)
+    heavy = sorted({name.split(".")[0] for name in loaded} & set(HEAVY_MODULES))
+    return {"module": module, "milliseconds": statistics.median(times), "heavy_modules": heavy}
+
+
+def check_budgets(budgets=None, runs=5):
+    """ This function measures every entry point and compares it with its budget.
+
+    Args:
+        budgets (dict): module mapped to its budget in milliseconds. Default is None (DEFAULT_BUDGETS_MS)
+        runs (int): interpreters per module. Default is 5.
+
+    Returns:
+        tuple: (one measure_import result per module, one message per broken budget or heavy import)
+    """
+    budgets = budgets or DEFAULT_BUDGETS_MS
+    results, problems = [], []
+    for module, budget in budgets.items():
+        result = measure_import(module, runs)
+        results.append(result)
+        if result["milliseconds"] > budget:
+            problems.append(f"{module}: {result['milliseconds']:.1f} ms is over the {budget} ms budget")
+        if result["heavy_modules"]:
+            problems.append(f"{module}: imports {', '.join(result['heavy_modules'])} at import time")
+    return results, problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the import time of the travel guide's entry points.")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                        help="budget for one module, replaces the default budgets (can be repeated)")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    budgets = {module: float(ms) for module, ms in (budget.split("=") for budget in args.budget)}
+    results, problems = check_budgets(budgets or None, args.runs)
+    for result in results:
+        print(f"{result['module']:24} {result['milliseconds']:7.1f} ms")
+    for problem in problems:
+        print("OVER BUDGET", problem)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from import_benchmark import DEFAULT_BUDGETS_MS, measure_import, parse_importtime, run_python
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       300 |        300 | site
+import time:       100 |        100 |     json.decoder
+import time:       200 |        300 |   json
+import time:       400 |        700 | user_preference
+"""
+
+CACHED_QUERY = """
+import sys
+from MetroPlacesFinder import MetroPlacesFinder
+from response_cache import ResponseCache
+from user_preference import User_Preference
+
+cache = ResponseCache(":memory:")
+finder = MetroPlacesFinder("Archives", cache=cache)
+cache.set("nearbysearch", finder._nearby_search_params(5000, ["museum"]), {"status": "OK", "results": [
+    {"place_id": "1", "name": "Museum", "types": ["museum"], "geometry": {"location": {"lat": 38.89, "lng": -77.02}}},
+]})
+finder.get_nearby_places(included_types=["museum"])
+user = User_Preference()
+user.preferences["type_of_activity"] = ["museums and monuments"]
+print(len(user.sort_activity_types(finder.places_data)), "requests" in sys.modules, "numpy" in sys.modules)
+"""
+
+
+class TestImportBenchmark(unittest.TestCase):
+    def test_parse_importtime(self):
+        """Only the modules under the measured import are counted, and its cumulative time is read in milliseconds."""
+        milliseconds, loaded = parse_importtime(IMPORTTIME_OUTPUT, "user_preference")
+        self.assertEqual(milliseconds, 0.7)
+        self.assertEqual(loaded, ["json.decoder", "json", "user_preference"])
+        with self.assertRaises(ValueError):
+            parse_importtime(IMPORTTIME_OUTPUT, "batch_mode")
+
+    def test_entry_points_do_not_load_heavy_modules(self):
+        """Importing an entry point loads neither requests nor numpy."""
+        for module in DEFAULT_BUDGETS_MS:
+            self.assertEqual(measure_import(module, runs=1)["heavy_modules"], [], module)
+
+    def test_cached_query_stays_offline(self):
+        """A query answered from the cache reads no API key file and never imports the HTTP stack or NumPy."""
+        with tempfile.TemporaryDirectory() as directory:
+            #no google_api_key.txt in this directory, so reading the key would fail
+            output = run_python(CACHED_QUERY, cwd=directory).stdout.split()
+        self.assertEqual(output, ["1", "False", "False"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module collects performance numbers for a run of the travel guide:
+- timing spans for each stage (geocode, nearby search, walking distance, ranking)
+- counters for HTTP calls per endpoint, response bytes, cache hits and misses
+- response bytes per place parsed, to compare the legacy and field-masked nearby searches
+- an estimate of the billable Google Maps usage (requests and Distance Matrix elements)
+
+Everything is kept in a Metrics object. MetroPlacesFinder, User_Preference and HttpTransport
+all record into the shared one from get_metrics() unless they are given their own. A snapshot
+can be written as JSON or logged as one structured log line.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+#list prices in US dollars per 1000 billable units (requests, or elements for the Distance Matrix API)
+PRICE_PER_1000_USD = {
+    "geocode": 5.00,
+    "nearbysearch": 32.00,
+    "places_new_nearby": 32.00,
+    "distancematrix_elements": 5.00,
+}
+
+#url fragment: endpoint name used in counters
+ENDPOINT_NAMES = {
+    "geocode": "geocode",
+    "nearbysearch": "nearbysearch",
+    "distancematrix": "distancematrix",
+    "places:searchNearby": "places_new_nearby",
+}
+
+
+def endpoint_name(url):
+    """ This function gives the short endpoint name of a Google url, ie: "geocode".
+
+    Args:
+        url (str): the request url
+
+    Returns:
+        str: the endpoint name, or the url itself if it is not a known endpoint
+    """
+    for fragment, name in ENDPOINT_NAMES.items():
+        if fragment in url:
+            return name
+    return url
+
+
+class Metrics:
+    """Thread-safe timing spans and counters for one run (or one process)."""
+
+    def __init__(self):
+        """ This method creates empty spans and counters."""
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+
+    def increment(self, name, amount=1):
+        """ This method adds to a counter.
+
+        Args:
+            name (str): counter name, ie: "http_calls.geocode"
+            amount (int): how much to add. Default is 1.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def span(self, name):
+        """ This method times the code inside a with block and adds it to the named span.
+
+        Args:
+            name (str): stage name, ie: "walking_distance"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                span = self.spans.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+                span["count"] += 1
+                span["total_seconds"] += elapsed
+                span["max_seconds"] = max(span["max_seconds"], elapsed)
+
+    def estimated_billing(self):
+        """ This method estimates the billable Google Maps usage from the HTTP call counters.
+
+        Returns:
+            dict: billable units per SKU and the estimated cost in US dollars at list price
+        """
+        with self._lock:
+            units = {
+                "geocode": self.counters.get("http_calls.geocode", 0),
+                "nearbysearch": self.counters.get("http_calls.nearbysearch", 0),
+                "places_new_nearby": self.counters.get("http_calls.places_new_nearby", 0),
+                "distancematrix_elements": self.counters.get("distancematrix_elements", 0),
+            }
+        cost = sum(units[sku] * PRICE_PER_1000_USD[sku] / 1000 for sku in units)
+        return {"units": units, "estimated_cost_usd": round(cost, 4)}
+
+    def snapshot(self):
+        """ This method copies the current numbers.
+
+        Returns:
+            dict: "spans", "counters", "bytes_per_place" (per nearby search endpoint) and "estimated_billing"
+        """
+        with self._lock:
+            spans = {name: dict(span) for name, span in self.spans.items()}
+            counters = dict(self.counters)
+        bytes_per_place = {}
+        for endpoint in ("nearbysearch", "places_new_nearby"):
+            places = counters.get(f"places_parsed.{endpoint}", 0)
+            if places and f"response_bytes.{endpoint}" in counters:
+                bytes_per_place[endpoint] = counters[f"response_bytes.{endpoint}"] / places
+        return {"spans": spans, "counters": counters, "bytes_per_place": bytes_per_place,
+                "estimated_billing": self.estimated_billing()}
+
+    def log_snapshot(self, level=logging.INFO):
+        """ This method logs the snapshot as one JSON log line.
+
+        Args:
+            level (int): logging level. Default is logging.INFO.
+        """
+        logger.log(level, "metrics %s", json.dumps(self.snapshot(), sort_keys=True))
+
+    def write_json(self, path):
+        """ This method writes the snapshot to a JSON file.
+
+        Args:
+            path (str): file to write
+        """
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+    def reset(self):
+        """Clears every span and counter."""
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """ This function returns the Metrics shared by the whole process.
+
+    Returns:
+        Metrics: the shared metrics
+    """
+    return _metrics
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from http_transport import RecordedTransport
+from instrumentation import Metrics, endpoint_name
+from MetroPlacesFinder import DISTANCE_MATRIX_URL, MetroPlacesFinder
+from response_cache import ResponseCache
+
+
+def fake_distances(url, params):
+    """Every destination is 100 meters away."""
+    return {"status": "OK", "rows": [{"elements": [
+        {"status": "OK", "distance": {"value": 100}} for _ in params["destinations"].split("|")
+    ]}]}
+
+
+class TestMetrics(unittest.TestCase):
+    def test_span_and_counters(self):
+        """Spans count and time each stage, counters add up."""
+        metrics = Metrics()
+        for _ in range(2):
+            with metrics.span("ranking"):
+                pass
+        metrics.increment("http_calls.geocode")
+        metrics.increment("http_calls.geocode", 2)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["spans"]["ranking"]["count"], 2)
+        self.assertGreaterEqual(snapshot["spans"]["ranking"]["total_seconds"], 0)
+        self.assertEqual(snapshot["counters"]["http_calls.geocode"], 3)
+        self.assertEqual(snapshot["estimated_billing"]["units"]["geocode"], 3)
+
+    def test_write_json(self):
+        """The snapshot can be exported as JSON."""
+        metrics = Metrics()
+        metrics.increment("distancematrix_elements", 1000)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.json")
+            metrics.write_json(path)
+            with open(path) as f:
+                exported = json.load(f)
+        self.assertEqual(exported["estimated_billing"]["estimated_cost_usd"], 5.0)
+
+    def test_endpoint_name(self):
+        """Urls are counted under their short endpoint name."""
+        self.assertEqual(endpoint_name(DISTANCE_MATRIX_URL), "distancematrix")
+        self.assertEqual(endpoint_name("http://127.0.0.1:5000/maps/api/geocode/json"), "geocode")
+
+
+class TestFinderInstrumentation(unittest.TestCase):
+    def test_walking_distance_is_measured_quietly(self):
+        """The walking distance stage records calls, billed elements and cache hits without printing every place."""
+        metrics = Metrics()
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(os.path.join(directory, "cache.sqlite3"))
+            for _ in range(2):
+                finder = MetroPlacesFinder("Archives", "dummy_test_key", cache=cache,
+                                           transport=RecordedTransport(fake_distances), metrics=metrics)
+                finder.places_data = [{"name": f"Place {i}", "location": {"lat": 38.89, "lng": -77.02}} for i in range(30)]
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    finder.calculate_walking_distance()
+            cache.close()
+
+        self.assertEqual(output.getvalue(), "")
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["spans"]["walking_distance"]["count"], 2)
+        self.assertEqual(snapshot["counters"]["http_calls.distancematrix"], 2)
+        self.assertEqual(snapshot["counters"]["distancematrix_elements"], 30)
+        self.assertEqual(snapshot["counters"]["cache_hits.distancematrix"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,310 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds compact containers for places, so holding the places of every station
+costs less memory and fewer allocations than one dictionary per place.
+
+- Place keeps one place in fixed __slots__ instead of a dictionary. It can still be used like a
+  dictionary (place["name"], place.get("walking_distance"), "rating" in place, {**place}), so
+  code written for the old place dictionaries keeps working.
+- PlaceColumns keeps many places column by column: lists of ids and names, and NumPy arrays
+  of type codes, coordinates and walking distances. A place's full list of Google types is
+  stored as a code into the distinct type lists, since many places share the same one. places_filter, the rankers and the
+  walking distance stage work on these arrays directly.
+"""
+import math
+from collections.abc import MutableMapping
+
+#fields every Place has a slot for, in the order keys() lists them
+PLACE_FIELDS = ("place_id", "name", "type_of_activity", "location", "types", "matched_types",
+                "walking_distance", "straight_line_distance", "rating", "score")
+_PLACE_FIELD_SET = frozenset(PLACE_FIELDS)
+
+
+class Place(MutableMapping):
+    """One place stored in slots. A field that was never set is missing, the same as a missing dictionary key.
+    Keys that are not in PLACE_FIELDS are kept in a small dictionary that is only created when needed.
+    """
+
+    __slots__ = PLACE_FIELDS + ("_extra",)
+
+    def __init__(self, place_id=None, name="Unknown Name", type_of_activity="Unknown Type of Activity",
+                 location=None, **fields):
+        """ This method stores the place's fields.
+
+        Args:
+            place_id (str): Google's id for the place. Default is None.
+            name (str): the place's name. Default is "Unknown Name".
+            type_of_activity (str): the place's main Google type. Default is "Unknown Type of Activity".
+            location (dict): the place's "lat" and "lng". Default is None (an empty dictionary)
+            **fields: any other keys, ie: walking_distance=250
+        """
+        self.place_id = place_id
+        self.name = name
+        self.type_of_activity = type_of_activity
+        self.location = location if location is not None else {}
+        self._extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """ This method converts a place dictionary into a Place.
+
+        Args:
+            data (dict): a place dictionary, ie: one entry of MetroPlacesFinder.places_data before this module
+
+        Returns:
+            Place: a new Place with the same keys
+        """
+        place = cls.__new__(cls)
+        place._extra = None
+        for key, value in data.items():
+            place[key] = value
+        return place
+
+    def __getitem__(self, key):
+        if key in _PLACE_FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _PLACE_FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _PLACE_FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in _PLACE_FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        """Same as dict.get, without the cost of catching a KeyError."""
+        if key in _PLACE_FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def keys(self):
+        """Returns the keys that are set, slot fields first."""
+        keys = [key for key in PLACE_FIELDS if hasattr(self, key)]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return f"Place({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Returns the place as a plain dictionary, ie: to write it as JSON."""
+        return {key: self[key] for key in self.keys()}
+
+    def copy(self):
+        """Returns a shallow copy, like dict.copy."""
+        return Place.from_dict(self)
+
+
+def with_score(place, score):
+    """ This function gives a copy of a place with a "score" key, as returned by the rankers.
+
+    Args:
+        place (Place or dict): the place
+        score (float): its score
+
+    Returns:
+        Place or dict: a copy of the same kind as place, with "score" set
+    """
+    if isinstance(place, Place):
+        scored = place.copy()
+        scored.score = score
+        return scored
+    return {**place, "score": score}
+
+
+class PlaceColumns:
+    """Many places stored column by column.
+
+    Activity types are stored as int32 codes into self.type_names, and a walking distance that
+    is not known yet is NaN. Indexing gives back a Place; take() gives a smaller PlaceColumns.
+    """
+
+    def __init__(self, place_ids=(), names=(), type_codes=(), lats=(), lngs=(), walking_distances=None,
+                 ratings=None, type_names=(), type_set_codes=None, type_sets=()):
+        """ This method stores the columns. Usually built with from_places instead.
+
+        Args:
+            place_ids (list): place ids
+            names (list): place names
+            type_codes (sequence): index of each place's activity type in type_names
+            lats (sequence): latitudes, NaN if unknown
+            lngs (sequence): longitudes, NaN if unknown
+            walking_distances (sequence): walking distances in meters. Default is None (all NaN)
+            ratings (sequence): ratings. Default is None (all NaN)
+            type_names (list): activity type of each code
+            type_set_codes (sequence): index of each place's Google types in type_sets, -1 for none.
+                Default is None (all -1)
+            type_sets (list): each distinct tuple of Google types
+        """
+        #pip install numpy. Imported here so code that only uses Place never loads it
+        import numpy as np
+
+        self.place_ids = list(place_ids)
+        self.names = list(names)
+        self.type_names = list(type_names)
+        self._type_codes = {name: code for code, name in enumerate(self.type_names)}
+        self.type_codes = np.asarray(type_codes, dtype=np.int32)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lngs = np.asarray(lngs, dtype=float)
+        count = len(self.place_ids)
+        self.walking_distances = (np.full(count, np.nan) if walking_distances is None
+                                  else np.asarray(walking_distances, dtype=float))
+        self.ratings = np.full(count, np.nan) if ratings is None else np.asarray(ratings, dtype=float)
+        self.type_sets = list(type_sets)
+        self.type_set_codes = (np.full(count, -1, dtype=np.int32) if type_set_codes is None
+                               else np.asarray(type_set_codes, dtype=np.int32))
+
+    @classmethod
+    def from_places(cls, places):
+        """ This method packs places (Place objects or dictionaries) into columns.
+
+        Args:
+            places (iterable): places with "place_id", "name", "type_of_activity", "location" and
+                optionally "types", "walking_distance" and "rating"
+
+        Returns:
+            PlaceColumns: the places, in the same order
+        """
+        columns = cls()
+        place_ids, names, codes, lats, lngs, distances, ratings = [], [], [], [], [], [], []
+        set_codes, type_sets = [], {}
+        for place in places:
+            location = place.get("location") or {}
+            place_ids.append(place.get("place_id"))
+            names.append(place.get("name"))
+            codes.append(columns.type_code(place.get("type_of_activity"), add=True))
+            lats.append(location.get("lat", math.nan))
+            lngs.append(location.get("lng", math.nan))
+            distances.append(place.get("walking_distance", math.nan))
+            ratings.append(place.get("rating", math.nan))
+            types = place.get("types")
+            set_codes.append(type_sets.setdefault(tuple(types), len(type_sets)) if types else -1)
+        return cls(place_ids, names, codes, lats, lngs, distances, ratings, columns.type_names,
+                   set_codes, list(type_sets))
+
+    def type_code(self, type_name, add=False):
+        """ This method looks up the code of an activity type.
+
+        Args:
+            type_name (str): the activity type
+            add (bool): whether to give a new code to a type that has none yet. Default is False.
+
+        Returns:
+            int: the type's code, or -1 if it has none
+        """
+        code = self._type_codes.get(type_name)
+        if code is None:
+            if not add:
+                return -1
+            code = self._type_codes[type_name] = len(self.type_names)
+            self.type_names.append(type_name)
+        return code
+
+    def __len__(self):
+        return len(self.place_ids)
+
+    def __getitem__(self, index):
+        """Returns the place at index as a new Place."""
+        code = self.type_codes[index]
+        place = Place(self.place_ids[index], self.names[index])
+        if code >= 0:
+            place.type_of_activity = self.type_names[code]
+        if not math.isnan(self.lats[index]):
+            place.location = {"lat": float(self.lats[index]), "lng": float(self.lngs[index])}
+        if not math.isnan(self.walking_distances[index]):
+            place.walking_distance = float(self.walking_distances[index])
+        if not math.isnan(self.ratings[index]):
+            place.rating = float(self.ratings[index])
+        if self.type_set_codes[index] >= 0:
+            place.types = list(self.type_sets[self.type_set_codes[index]])
+        return place
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def take(self, indices):
+        """ This method picks some of the places.
+
+        Args:
+            indices (sequence): positions of the places to keep, in the order to keep them
+
+        Returns:
+            PlaceColumns: the picked places. Type codes and type set codes stay the same.
+        """
+        import numpy as np
+
+        indices = np.asarray(indices, dtype=np.intp)
+        return PlaceColumns(
+            [self.place_ids[index] for index in indices], [self.names[index] for index in indices],
+            self.type_codes[indices], self.lats[indices], self.lngs[indices],
+            self.walking_distances[indices], self.ratings[indices], self.type_names,
+            self.type_set_codes[indices], self.type_sets,
+        )
+
+    def type_lookup(self, values, default=0):
+        """ This method turns a dictionary keyed by activity type into an array indexed by type code.
+        The last entry holds default, so code -1 (no type) picks it.
+
+        Args:
+            values (dict): activity type mapped to a value, ie: PlaceScorer.activity_ranks
+            default (float): value for types that are not in values. Default is 0.
+
+        Returns:
+            numpy.ndarray: len(self.type_names) + 1 values
+        """
+        import numpy as np
+
+        return np.array([values.get(name, default) for name in self.type_names] + [default], dtype=float)
+
+    def filter_mask(self, activity_types, max_walking_distance):
+        """ This method finds the places that have one of the activity types and are close enough.
+
+        Args:
+            activity_types (list): wanted activity types, matched against all of a place's Google types
+            max_walking_distance (float): maximum walking distance in meters
+
+        Returns:
+            numpy.ndarray: True for every place that passes, same as places_filter
+        """
+        import numpy as np
+
+        wanted = self.type_lookup({activity: 1 for activity in activity_types}).astype(bool)
+        #a place also passes if any of its other Google types is wanted, the extra False is picked by code -1
+        wanted_sets = np.array([not set(types).isdisjoint(activity_types) for types in self.type_sets] + [False])
+        #NaN (no distance yet) compares False, so places without a distance never pass
+        return ((wanted[self.type_codes] | wanted_sets[self.type_set_codes]) &
+                (self.walking_distances <= max_walking_distance))
@@ -0,0 +1,118 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds the request and response formats of the Places API (New) Nearby Search
+(POST https://places.googleapis.com/v1/places:searchNearby). Unlike the legacy nearbysearch
+endpoint, which always sends the full place (photos, opening hours, plus codes and so on), the new
+endpoint only returns the fields named in the X-Goog-FieldMask header. The mask is built from the
+pipeline stages that will actually use the places, so nothing else is transferred, parsed or billed
+(fields such as rating are billed at a higher tier).
+
+MetroPlacesFinder uses this when finder.nearby_search_api is "new" and falls back to the legacy
+endpoint if the new one answers with an error (ie: the API is not enabled for the key).
+"""
+from places import Place
+
+SEARCH_NEARBY_URL = "https://places.googleapis.com/v1/places:searchNearby"
+
+#the new endpoint returns at most 20 places and has no next page
+MAX_RESULT_COUNT = 20
+
+#fields each pipeline stage reads from a place
+FIELDS_BY_STAGE = {
+    "search": ("places.id", "places.displayName"),
+    "filter": ("places.primaryType", "places.types"),
+    "walking_distance": ("places.location",),
+    "ranking": ("places.rating",),
+}
+
+#stages whose fields are requested by default. Ratings are billed at a higher tier and the legacy path never kept them
+DEFAULT_STAGES = ("search", "filter", "walking_distance")
+
+
+def build_field_mask(stages=DEFAULT_STAGES):
+    """ This function builds the X-Goog-FieldMask for the stages that will use the places.
+
+    Args:
+        stages (iterable): names from FIELDS_BY_STAGE. Default is DEFAULT_STAGES.
+
+    Returns:
+        str: comma-separated field paths, always in the same order for the same stages
+
+    Raises:
+        ValueError: if a stage is not in FIELDS_BY_STAGE
+    """
+    unknown = set(stages) - set(FIELDS_BY_STAGE)
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages: {sorted(unknown)}")
+    fields = []
+    for stage, stage_fields in FIELDS_BY_STAGE.items():
+        if stage == "search" or stage in stages:
+            fields.extend(field for field in stage_fields if field not in fields)
+    return ",".join(fields)
+
+
+def search_nearby_body(location, radius_meters, included_types, max_results=MAX_RESULT_COUNT):
+    """ This function builds the JSON body of a searchNearby request.
+
+    Args:
+        location (dict): the 'lat' and 'lng' of the center
+        radius_meters (float): search radius in meters, at most 50000
+        included_types (list): Google place types to include
+        max_results (int): most places to return, at most 20. Default is 20.
+
+    Returns:
+        dict: the request body
+    """
+    return {
+        "includedTypes": list(included_types),
+        "maxResultCount": max_results,
+        "locationRestriction": {"circle": {
+            "center": {"latitude": location["lat"], "longitude": location["lng"]},
+            "radius": float(radius_meters),
+        }},
+    }
+
+
+def cache_params(body, field_mask):
+    """ This function flattens a request into parameters for the response cache, so the same search with
+    the same field mask is a cache hit.
+
+    Args:
+        body (dict): the request body
+        field_mask (str): the X-Goog-FieldMask header
+
+    Returns:
+        dict: flat parameters
+    """
+    circle = body["locationRestriction"]["circle"]
+    return {
+        "location": f"{circle['center']['latitude']},{circle['center']['longitude']}",
+        "radius": circle["radius"],
+        "types": "|".join(body["includedTypes"]),
+        "maxResultCount": body["maxResultCount"],
+        "fieldMask": field_mask,
+    }
+
+
+def parse_place(result):
+    """ This function turns one place of a searchNearby response into a Place.
+
+    Args:
+        result (dict): one entry of the response's "places" list
+
+    Returns:
+        Place: the place in the same shape as the legacy parser gives, plus "rating" if it was requested
+    """
+    types = result.get("types") or ["Unknown Type of Activity"]
+    location = result.get("location")
+    place = Place(
+        result.get("id"),
+        result.get("displayName", {}).get("text", "Unknown Name"),
+        result.get("primaryType") or types[0],
+        {"lat": location["latitude"], "lng": location["longitude"]} if location else {},
+    )
+    if "types" in result:
+        place.types = result["types"]
+    if "rating" in result:
+        place.rating = result["rating"]
+    return place
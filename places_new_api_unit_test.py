@@ -0,0 +1,66 @@
+import unittest
+from fake_google_server import start_fake_server
+from http_transport import HttpTransport, RecordedTransport
+from instrumentation import Metrics
+from MetroPlacesFinder import MetroPlacesFinder
+from places_new_api import build_field_mask
+
+NEW_RESPONSE = {"places": [
+    {"id": "new-1", "displayName": {"text": "Museum"}, "primaryType": "museum", "types": ["museum", "point_of_interest"],
+     "location": {"latitude": 38.891, "longitude": -77.026}},
+]}
+LEGACY_RESPONSE = {"status": "OK", "results": [
+    {"place_id": "old-1", "name": "Museum", "types": ["museum"], "geometry": {"location": {"lat": 38.891, "lng": -77.026}}},
+]}
+
+
+class TestFieldMask(unittest.TestCase):
+    def test_mask_follows_stages(self):
+        """Only the fields of the enabled stages are requested."""
+        self.assertEqual(build_field_mask(), "places.id,places.displayName,places.primaryType,places.types,places.location")
+        self.assertEqual(build_field_mask(["ranking"]), "places.id,places.displayName,places.rating")
+        with self.assertRaises(ValueError):
+            build_field_mask(["photos"])
+
+
+class TestNewNearbySearch(unittest.TestCase):
+    def test_new_api_request(self):
+        """The new API is called with a POST, the API key and field mask headers, and parsed into the usual places."""
+        transport = RecordedTransport({"places:searchNearby": NEW_RESPONSE})
+        finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=transport)
+        finder.nearby_search_api = "new"
+        places = finder.get_nearby_places(included_types=["museum"])
+        self.assertEqual([(place["place_id"], place["type_of_activity"]) for place in places], [("new-1", "museum")])
+        self.assertEqual(places[0]["location"], {"lat": 38.891, "lng": -77.026})
+        self.assertEqual(transport.requests[0][1]["includedTypes"], ["museum"])
+        self.assertEqual(transport.headers[0]["X-Goog-FieldMask"], build_field_mask())
+        self.assertEqual(transport.headers[0]["X-Goog-Api-Key"], "dummy_test_key")
+
+    def test_falls_back_to_legacy(self):
+        """If the new API answers with an error the legacy endpoint is used, now and for later searches."""
+        transport = RecordedTransport({"places:searchNearby": {"error": {"code": 403, "message": "API not enabled"}},
+                                       "nearbysearch": LEGACY_RESPONSE})
+        finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=transport)
+        finder.nearby_search_api = "new"
+        places = finder.get_nearby_places(included_types=["museum"])
+        self.assertEqual(places[0]["place_id"], "old-1")
+        self.assertEqual(finder.nearby_search_api, "legacy")
+
+    def test_fewer_bytes_per_place(self):
+        """Against the fake server, field-masked places are much smaller than legacy ones."""
+        server, base_url = start_fake_server()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        metrics = Metrics()
+        transport = HttpTransport(base_url=base_url, metrics=metrics)
+        self.addCleanup(transport.close)
+        for api in ("legacy", "new"):
+            finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=transport, metrics=metrics)
+            finder.nearby_search_api = api
+            self.assertEqual(len(finder.get_nearby_places(included_types=["museum", "park"])), 20)
+        bytes_per_place = metrics.snapshot()["bytes_per_place"]
+        self.assertLess(bytes_per_place["places_new_nearby"], bytes_per_place["nearbysearch"] / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import pickle
+import unittest
+from http_transport import RecordedTransport
+from MetroPlacesFinder import MetroPlacesFinder
+from places import Place, PlaceColumns, with_score
+from ranking import PlaceScorer
+
+
+def fake_distances(url, params):
+    """Every destination is 100 meters away."""
+    return {"rows": [{"elements": [
+        {"status": "OK", "distance": {"value": 100}} for _ in params["destinations"].split("|")
+    ]}]}
+
+
+class TestPlace(unittest.TestCase):
+    def setUp(self):
+        self.place = Place("id-1", "Museum", "museum", {"lat": 38.89, "lng": -77.02})
+
+    def test_dict_compatible(self):
+        """A Place answers the same way a place dictionary did, including missing keys."""
+        self.assertEqual(self.place["name"], "Museum")
+        self.assertNotIn("walking_distance", self.place)
+        self.assertEqual(self.place.get("walking_distance", 0), 0)
+        with self.assertRaises(KeyError):
+            self.place["walking_distance"]
+        self.place["walking_distance"] = 250
+        self.place["vicinity"] = "Constitution Ave"
+        self.assertEqual({**self.place}, {"place_id": "id-1", "name": "Museum", "type_of_activity": "museum",
+                                          "location": {"lat": 38.89, "lng": -77.02}, "walking_distance": 250,
+                                          "vicinity": "Constitution Ave"})
+
+    def test_with_score_copies(self):
+        """Scoring copies the place and keeps it a Place, and Places can be pickled for worker processes."""
+        scored = with_score(self.place, 7)
+        self.assertIsInstance(scored, Place)
+        self.assertEqual(scored["score"], 7)
+        self.assertNotIn("score", self.place)
+        self.assertEqual(pickle.loads(pickle.dumps(scored)), scored)
+        self.assertFalse(hasattr(scored, "__dict__"))
+
+
+class TestPlaceColumns(unittest.TestCase):
+    def setUp(self):
+        self.places = [
+            {"place_id": f"id-{i}", "name": f"Place {i}", "type_of_activity": ["museum", "park", "bar"][i % 3],
+             "location": {"lat": 38.89 + i * 0.001, "lng": -77.02}, "walking_distance": 100.0 * i}
+            for i in range(30)
+        ]
+        self.columns = PlaceColumns.from_places(self.places)
+
+    def test_filter_matches_list(self):
+        """places_filter gives the same places for columns as for a list of dictionaries."""
+        preferences = {"type_of_activity": ["museum", "bar"], "max_walking_distance": 1500}
+        finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=RecordedTransport({}))
+        finder.places_data = self.places
+        expected = [place["place_id"] for place in finder.places_filter(preferences)]
+        finder.places_data = self.columns
+        filtered = finder.places_filter(preferences)
+        self.assertIsInstance(filtered, PlaceColumns)
+        self.assertEqual(filtered.place_ids, expected)
+
+    def test_ranking_matches_list(self):
+        """Columns are ranked to the same scores and order as the same places in a list."""
+        scorer = PlaceScorer(["park", "museum"], 2000, activity_weight=5, distance_weight=3)
+        expected = [(score, place["place_id"]) for score, place in scorer.top_k(self.places, 5)]
+        ranked = [(score, place["place_id"]) for score, place in scorer.top_k(self.columns, 5)]
+        self.assertEqual(ranked, expected)
+
+    def test_walking_distance_on_columns(self):
+        """The distance stage prefilters and writes distances straight into the columns."""
+        finder = MetroPlacesFinder("Archives", "dummy_test_key", transport=RecordedTransport(fake_distances))
+        finder.location = {"lat": 38.89, "lng": -77.02}
+        finder.places_data = PlaceColumns.from_places(
+            {key: value for key, value in place.items() if key != "walking_distance"} for place in self.places)
+        finder.calculate_walking_distance(max_walking_distance=1050)
+        self.assertEqual(finder.prefilter_counts["dropped"], 20)
+        self.assertEqual(len(finder.places_data), 10)
+        self.assertEqual(finder.api_call_counts["distancematrix"], 1)
+        self.assertTrue((finder.places_data.walking_distances == 100).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
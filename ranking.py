@@ -0,0 +1,242 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds the scoring and ranking engine shared by MetroPlacesFinder.places_ranker
+and User_Preference.sort_activity_types. The user's activity preferences are turned into a
+lookup table once, and only the best k places are kept with a heap, so ranking n places for
+a top 5 costs O(n log k) instead of a full sort. Results are (score, place) pairs that point
+at the original place dictionaries instead of copies.
+
+A place is scored by the best of all its Google types ("types"), not only type_of_activity. With
+categories=ACTIVITY_INDEX the user's categories ("food") are turned into points for their Google
+types ("restaurant") up front, so each type is still one dictionary lookup.
+
+For very large candidate sets (merged catalogs from many stations) the scores are computed
+with NumPy arrays instead of one place at a time, and places stored as a places.PlaceColumns
+are always scored straight from its arrays.
+"""
+import heapq
+from operator import itemgetter
+
+from places import PlaceColumns
+
+#candidate sets at least this large are scored with NumPy
+VECTORIZE_THRESHOLD = 5000
+
+
+def build_activity_rank_map(preferred_activities):
+    """ This function turns an ordered list of preferred activities into activity points.
+
+    Args:
+        preferred_activities (list): activity types, most preferred first
+
+    Returns:
+        dict: activity type mapped to len(preferred_activities) - its position, so the favourite
+            activity gets the most points. If an activity is listed twice its first position counts.
+    """
+    count = len(preferred_activities)
+    ranks = {}
+    for index, activity in enumerate(preferred_activities):
+        ranks.setdefault(activity, count - index)
+    return ranks
+
+
+class PlaceScorer:
+    """Scores places against one user's preferences.
+
+    score = activity points * activity_weight
+            + max(0, max_walking_distance - walking_distance) * distance_weight
+            + max(0, rating - min_rating) * rating_weight
+    """
+
+    def __init__(self, preferred_activities, max_walking_distance, activity_weight=1, distance_weight=1,
+                 rating_weight=0, min_rating=0, case_insensitive=False, categories=None):
+        """ This method precomputes everything that is the same for every place.
+
+        Args:
+            preferred_activities (list): activity types, most preferred first
+            max_walking_distance (float): maximum walking distance the user accepts
+            activity_weight (float): weight of the activity points. Default is 1.
+            distance_weight (float): weight of the distance left under the maximum. Default is 1.
+            rating_weight (float): weight of the rating above min_rating. Default is 0 (ratings ignored).
+            min_rating (float): rating a place must beat to earn rating points. Default is 0.
+            case_insensitive (bool): whether place activity types are lowercased before lookup. Default is False.
+            categories (ActivityIndex): index used to give Google types the points of their categories, when
+                preferred_activities are categories such as "food". Default is None (types are matched as given)
+        """
+        self.activity_ranks = build_activity_rank_map(preferred_activities)
+        if categories is not None:
+            self.activity_ranks = categories.rank_google_types(self.activity_ranks)
+        self.max_walking_distance = max_walking_distance
+        self.activity_weight = activity_weight
+        self.distance_weight = distance_weight
+        self.rating_weight = rating_weight
+        self.min_rating = min_rating
+        self.case_insensitive = case_insensitive
+
+    def activity_points(self, place):
+        """ This method looks up the activity points of one place.
+
+        Args:
+            place (dict): a place with a "type_of_activity" key and optionally a "types" list
+
+        Returns:
+            int: points for the best of the place's types, 0 if the user picked none of them
+        """
+        points = self.type_points(place["type_of_activity"])
+        types = place.get("types")
+        if types:
+            points = max(points, self.types_points(types))
+        return points
+
+    def types_points(self, types):
+        """Returns the points of the best of several activity types, 0 if there are none."""
+        return max((self.type_points(activity) for activity in types), default=0)
+
+    def type_points(self, activity):
+        """ This method looks up the activity points of one activity type.
+
+        Args:
+            activity (str): the activity type
+
+        Returns:
+            int: points for the activity type, 0 if the user did not pick it
+        """
+        if self.case_insensitive and activity is not None:
+            activity = activity.lower()
+        return self.activity_ranks.get(activity, 0)
+
+    def score(self, place):
+        """ This method scores one place.
+
+        Args:
+            place (dict): a place with "type_of_activity" and optionally "walking_distance" and "rating"
+
+        Returns:
+            float: the place's score, higher is better
+        """
+        score = self.activity_points(place) * self.activity_weight
+        score += max(0, self.max_walking_distance - place.get("walking_distance", 0)) * self.distance_weight
+        if self.rating_weight:
+            score += max(0, place.get("rating", 0) - self.min_rating) * self.rating_weight
+        return score
+
+    def score_array(self, places):
+        """ This method scores many places at once with NumPy.
+
+        Args:
+            places (list): places to score
+
+        Returns:
+            numpy.ndarray: the score of each place, in the same order
+        """
+        #pip install numpy. Imported here so ranking a short list never loads it
+        import numpy as np
+
+        count = len(places)
+        activity = np.fromiter((self.activity_points(place) for place in places), dtype=float, count=count)
+        distances = np.fromiter((place.get("walking_distance", 0) for place in places), dtype=float, count=count)
+        scores = activity * self.activity_weight
+        scores += np.maximum(0, self.max_walking_distance - distances) * self.distance_weight
+        if self.rating_weight:
+            ratings = np.fromiter((place.get("rating", 0) for place in places), dtype=float, count=count)
+            scores += np.maximum(0, ratings - self.min_rating) * self.rating_weight
+        return scores
+
+    def score_columns(self, columns):
+        """ This method scores places stored as columns, looking activity points up once per type instead of per place.
+
+        Args:
+            columns (PlaceColumns): places to score
+
+        Returns:
+            numpy.ndarray: the score of each place, in the same order
+        """
+        return self.score_arrays(columns.type_names, columns.type_codes, columns.walking_distances, columns.ratings,
+                                 columns.type_sets, columns.type_set_codes)
+
+    def score_arrays(self, type_names, type_codes, walking_distances, ratings=None, type_sets=None, type_set_codes=None):
+        """ This method scores places given as plain arrays, ie: a PlaceColumns or a memory-mapped distance matrix.
+
+        Args:
+            type_names (list): activity type of each type code
+            type_codes (numpy.ndarray): each place's index into type_names, -1 for no type
+            walking_distances (numpy.ndarray): walking distance of each place, NaN if unknown
+            ratings (numpy.ndarray): rating of each place, NaN if unknown. Default is None (no ratings)
+            type_sets (list): each distinct tuple of a place's Google types. Default is None (only type_codes are used)
+            type_set_codes (numpy.ndarray): each place's index into type_sets, -1 for none. Default is None.
+
+        Returns:
+            numpy.ndarray: the score of each place, in the same order
+        """
+        import numpy as np
+
+        #the extra 0 at the end is picked by code -1
+        points = np.array([self.type_points(name) for name in type_names] + [0], dtype=float)
+        points = points[type_codes]
+        if type_sets:
+            #scored once per distinct set of types, not once per place
+            set_points = np.array([self.types_points(types) for types in type_sets] + [0], dtype=float)
+            points = np.maximum(points, set_points[type_set_codes])
+        #a missing distance or rating counts as 0, the same as place.get(..., 0)
+        distances = np.where(np.isnan(walking_distances), 0, walking_distances)
+        scores = points * self.activity_weight
+        scores += np.maximum(0, self.max_walking_distance - distances) * self.distance_weight
+        if self.rating_weight and ratings is not None:
+            ratings = np.where(np.isnan(ratings), 0, ratings)
+            scores += np.maximum(0, ratings - self.min_rating) * self.rating_weight
+        return scores
+
+    def top_k(self, places, k=None):
+        """ This method picks the best scoring places.
+
+        Args:
+            places (list or PlaceColumns): places to rank
+            k (int): how many places to keep. Default is None, which keeps (and sorts) all of them
+
+        Returns:
+            list: (score, place) pairs from best to worst. Places with equal scores keep their original order.
+                For PlaceColumns, each place is a new Place built from its row.
+        """
+        if isinstance(places, PlaceColumns) or len(places) >= VECTORIZE_THRESHOLD:
+            return self.top_k_vectorized(places, k)
+
+        scored = ((self.score(place), place) for place in places)
+        if k is None:
+            return sorted(scored, key=itemgetter(0), reverse=True)
+        return heapq.nlargest(k, scored, key=itemgetter(0))
+
+    def top_k_vectorized(self, places, k=None):
+        """ This method does the same as top_k but scores with NumPy and selects with argpartition.
+
+        Args:
+            places (list or PlaceColumns): places to rank
+            k (int): how many places to keep. Default is None, which keeps all of them
+
+        Returns:
+            list: (score, place) pairs from best to worst. Places with equal scores keep their original order.
+        """
+        scores = self.score_columns(places) if isinstance(places, PlaceColumns) else self.score_array(places)
+        return [(float(scores[index]), places[index]) for index in select_top_k(scores, k)]
+
+
+def select_top_k(scores, k=None):
+    """ This function finds the positions of the k highest scores with argpartition.
+
+    Args:
+        scores (numpy.ndarray): one score per place
+        k (int): how many positions to keep. Default is None, which keeps all of them
+
+    Returns:
+        numpy.ndarray: positions from best to worst score. Equal scores keep their original order.
+    """
+    import numpy as np
+
+    count = len(scores)
+    candidates = np.arange(count)
+    if k is not None and k < count:
+        if k <= 0:
+            return candidates[:0]
+        threshold = np.partition(scores, count - k)[count - k]
+        #keeps every place tied with the k-th best so ties are broken by original order below
+        candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.lexsort((candidates, -scores[candidates]))][:k]
@@ -0,0 +1,41 @@
+import random
+import unittest
+from ranking import PlaceScorer, build_activity_rank_map
+
+
+class TestRanking(unittest.TestCase):
+    def setUp(self):
+        """Creates a scorer and a few thousand random places with plenty of tied scores."""
+        self.scorer = PlaceScorer(["park", "museum", "cafe"], 1000, activity_weight=5, distance_weight=3)
+        generator = random.Random(326)
+        self.places = [
+            {"name": f"Place {i}", "type_of_activity": generator.choice(["park", "museum", "cafe", "bar"]),
+             "walking_distance": generator.choice([100, 400, 800, 1200])}
+            for i in range(3000)
+        ]
+
+    def test_rank_map_favours_first_choice(self):
+        """The first preference gets the most points and a repeated activity keeps its first position."""
+        self.assertEqual(build_activity_rank_map(["park", "museum", "park"]), {"park": 3, "museum": 2})
+
+    def test_top_k_matches_full_sort(self):
+        """The heap selection returns the same places, in the same order, as sorting everything."""
+        full = self.scorer.top_k(self.places)
+        self.assertEqual(self.scorer.top_k(self.places, 5), full[:5])
+
+    def test_returns_original_places(self):
+        """Results point at the original dictionaries instead of copies."""
+        score, place = self.scorer.top_k(self.places, 1)[0]
+        self.assertTrue(any(place is original for original in self.places))
+        self.assertNotIn("score", place)
+
+    def test_vectorized_matches_python(self):
+        """The NumPy path picks the same places with the same scores, ties in original order."""
+        expected = self.scorer.top_k(self.places, 50)
+        vectorized = self.scorer.top_k_vectorized(self.places, 50)
+        self.assertEqual([place["name"] for _, place in vectorized], [place["name"] for _, place in expected])
+        self.assertEqual([score for score, _ in vectorized], [score for score, _ in expected])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds the scheduler every MetroPlacesFinder request goes through, so parallel
+fetching stays inside Google's limits:
+- each endpoint has a token bucket (requests per second, or elements per second for the
+  Distance Matrix API, which bills and limits per origin x destination element)
+- requests wait in a priority queue per endpoint, so a student waiting for an answer
+  (INTERACTIVE) goes before a background refresh of every station (BACKGROUND)
+- OVER_QUERY_LIMIT is back-pressure, not data: the whole endpoint pauses with exponential
+  backoff and its rate is halved, then grows back as requests succeed. The request is sent
+  again, and RateLimitError is raised if Google still refuses it.
+- optional per-day quotas raise RateLimitError instead of sending a request that would go over
+"""
+import datetime
+import heapq
+import itertools
+import random
+import threading
+import time
+
+#request priorities, lower goes first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+#endpoint: (tokens per second, bucket capacity). Distance Matrix tokens are elements.
+DEFAULT_RATE_LIMITS = {
+    "geocode": (50, 50),
+    "nearbysearch": (100, 100),
+    "places_new_nearby": (10, 10),
+    "distancematrix": (1000, 1000),
+}
+
+#rate used for an endpoint that is not in the limits
+FALLBACK_RATE_LIMIT = (10, 10)
+
+
+class RateLimitError(Exception):
+    """Raised when a request is refused by a daily quota, or by Google with OVER_QUERY_LIMIT after every retry."""
+
+
+class TokenBucket:
+    """A token bucket: tokens refill at a steady rate up to a capacity, and each request takes some."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        """ This method creates a full bucket.
+
+        Args:
+            rate (float): tokens added per second
+            capacity (float): most tokens the bucket holds, which is the largest burst allowed
+            clock (callable): function giving the time in seconds (replaced in tests)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        #no tokens are handed out before this time (set by back-pressure)
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def try_take(self, tokens=1):
+        """ This method takes tokens if the bucket has enough.
+
+        Args:
+            tokens (float): tokens needed. Requests bigger than the capacity are allowed once the bucket is full.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait before trying again
+        """
+        now = self._refill()
+        if now < self.paused_until:
+            return self.paused_until - now
+        needed = min(tokens, self.capacity)
+        if self.tokens >= needed:
+            self.tokens -= needed
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+class RequestScheduler:
+    """Rate limits, orders and backs off requests to every Google endpoint. Safe to share between threads."""
+
+    def __init__(self, rate_limits=None, daily_quotas=None, max_retries=2, backoff_base=1.0, backoff_cap=60.0,
+                 min_rate_fraction=0.1, clock=time.monotonic):
+        """ This method creates one token bucket per endpoint.
+
+        Args:
+            rate_limits (dict): endpoint mapped to (tokens per second, capacity). Default is DEFAULT_RATE_LIMITS.
+            daily_quotas (dict): endpoint mapped to the most tokens allowed per day. Default is None (no quotas)
+            max_retries (int): how many times a request refused with OVER_QUERY_LIMIT is sent again. Default is 2.
+            backoff_base (float): pause in seconds after the first OVER_QUERY_LIMIT, doubled for each one after it
+            backoff_cap (float): longest pause in seconds
+            min_rate_fraction (float): back-pressure never lowers a rate below this fraction of its limit. Default is 0.1.
+            clock (callable): function giving the time in seconds (replaced in tests)
+        """
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits)
+        self.daily_quotas = dict(daily_quotas or {})
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.min_rate_fraction = min_rate_fraction
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._buckets = {}
+        self._queues = {}
+        self._strikes = {}
+        self._order = itertools.count()
+        #(endpoint, date): tokens used that day
+        self._daily_usage = {}
+        self.counts = {"requests": 0, "waited": 0, "over_query_limit": 0, "refused": 0}
+
+    def _bucket(self, endpoint):
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            rate, capacity = self.rate_limits.get(endpoint, FALLBACK_RATE_LIMIT)
+            bucket = self._buckets[endpoint] = TokenBucket(rate, capacity, self.clock)
+        return bucket
+
+    def _use_daily_quota(self, endpoint, cost):
+        quota = self.daily_quotas.get(endpoint)
+        if quota is None:
+            return
+        key = (endpoint, datetime.date.today())
+        used = self._daily_usage.get(key, 0)
+        if used + cost > quota:
+            self.counts["refused"] += 1
+            raise RateLimitError(f"Daily quota of {quota} for {endpoint} would be exceeded ({used} used)")
+        self._daily_usage[key] = used + cost
+
+    def acquire(self, endpoint, cost=1, priority=INTERACTIVE):
+        """ This method waits until a request may be sent. Requests with a lower priority number go first,
+        and requests with the same priority go in the order they arrived.
+
+        Args:
+            endpoint (str): endpoint name, ie: "distancematrix"
+            cost (float): tokens the request uses, ie: its number of Distance Matrix elements. Default is 1.
+            priority (int): INTERACTIVE or BACKGROUND. Default is INTERACTIVE.
+
+        Raises:
+            RateLimitError: if the request would go over the endpoint's daily quota
+        """
+        with self._condition:
+            self._use_daily_quota(endpoint, cost)
+            bucket = self._bucket(endpoint)
+            queue = self._queues.setdefault(endpoint, [])
+            ticket = (priority, next(self._order))
+            heapq.heappush(queue, ticket)
+            self.counts["requests"] += 1
+            waited = False
+            while True:
+                if queue[0] == ticket:
+                    wait = bucket.try_take(cost)
+                    if wait == 0:
+                        heapq.heappop(queue)
+                        #lets the next request in line check the bucket
+                        self._condition.notify_all()
+                        break
+                else:
+                    wait = None
+                waited = True
+                self._condition.wait(wait)
+            if waited:
+                self.counts["waited"] += 1
+
+    def back_off(self, endpoint):
+        """ This method pauses an endpoint after OVER_QUERY_LIMIT and halves its rate.
+
+        Args:
+            endpoint (str): endpoint name
+
+        Returns:
+            float: the pause in seconds
+        """
+        with self._condition:
+            strikes = self._strikes.get(endpoint, 0)
+            self._strikes[endpoint] = strikes + 1
+            self.counts["over_query_limit"] += 1
+            bucket = self._bucket(endpoint)
+            limit = self.rate_limits.get(endpoint, FALLBACK_RATE_LIMIT)[0]
+            bucket.rate = max(limit * self.min_rate_fraction, bucket.rate / 2)
+            pause = min(self.backoff_cap, self.backoff_base * 2 ** strikes) * random.uniform(0.5, 1.0)
+            bucket.paused_until = max(bucket.paused_until, self.clock() + pause)
+            bucket.tokens = 0
+            self._condition.notify_all()
+            return pause
+
+    def recover(self, endpoint):
+        """ This method lets an endpoint's rate grow back by a tenth of its limit after a successful request.
+
+        Args:
+            endpoint (str): endpoint name
+        """
+        with self._condition:
+            self._strikes[endpoint] = 0
+            bucket = self._bucket(endpoint)
+            limit = self.rate_limits.get(endpoint, FALLBACK_RATE_LIMIT)[0]
+            if bucket.rate < limit:
+                bucket.rate = min(limit, bucket.rate + limit * 0.1)
+
+    def request(self, endpoint, send, cost=1, priority=INTERACTIVE):
+        """ This method sends one request through the scheduler.
+
+        Args:
+            endpoint (str): endpoint name
+            send (callable): function with no arguments that sends the request and returns the decoded response
+            cost (float): tokens the request uses. Default is 1.
+            priority (int): INTERACTIVE or BACKGROUND. Default is INTERACTIVE.
+
+        Returns:
+            dict: the decoded response, never an OVER_QUERY_LIMIT one
+
+        Raises:
+            RateLimitError: if Google still answers OVER_QUERY_LIMIT after max_retries, or a daily quota is reached
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(endpoint, cost, priority)
+            response = send()
+            if response.get("status") != "OVER_QUERY_LIMIT":
+                self.recover(endpoint)
+                return response
+            self.back_off(endpoint)
+        raise RateLimitError(f"{endpoint} answered OVER_QUERY_LIMIT {self.max_retries + 1} times")
+
+    def stats(self):
+        """ This method reports what the scheduler has done.
+
+        Returns:
+            dict: request counts and the current rate of each endpoint
+        """
+        with self._condition:
+            return {**self.counts, "rates": {endpoint: bucket.rate for endpoint, bucket in self._buckets.items()}}
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    """ This function returns the scheduler shared by every MetroPlacesFinder, creating it on first use.
+
+    Returns:
+        RequestScheduler: the shared scheduler
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler()
+        return _default_scheduler
+
+
+def set_default_scheduler(scheduler):
+    """ This function swaps the shared scheduler, ie: for different limits.
+
+    Args:
+        scheduler (RequestScheduler): the new scheduler, or None to go back to a fresh default one
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        _default_scheduler = scheduler
@@ -0,0 +1,93 @@
+import threading
+import time
+import unittest
+from fake_google_server import FakeGoogleMaps, start_fake_server
+from http_transport import HttpTransport, RecordedTransport
+from instrumentation import Metrics
+from MetroPlacesFinder import MetroPlacesFinder
+from rate_limiter import BACKGROUND, INTERACTIVE, RateLimitError, RequestScheduler, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_at_rate(self):
+        """A full bucket allows a burst, then one token per 1/rate seconds."""
+        now = [0.0]
+        bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0])
+        self.assertEqual(bucket.try_take(), 0)
+        self.assertEqual(bucket.try_take(), 0)
+        self.assertAlmostEqual(bucket.try_take(), 0.1)
+        now[0] = 0.1
+        self.assertEqual(bucket.try_take(), 0)
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def test_interactive_before_background(self):
+        """A waiting interactive request is let through before a background one that arrived first."""
+        scheduler = RequestScheduler(rate_limits={"geocode": (5, 1)})
+        scheduler.acquire("geocode")
+        order = []
+
+        def send(name, priority):
+            scheduler.acquire("geocode", priority=priority)
+            order.append(name)
+
+        background = threading.Thread(target=send, args=("background", BACKGROUND))
+        background.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=send, args=("interactive", INTERACTIVE))
+        interactive.start()
+        background.join()
+        interactive.join()
+        self.assertEqual(order, ["interactive", "background"])
+
+    def test_over_query_limit_is_back_pressure(self):
+        """OVER_QUERY_LIMIT slows the endpoint down and is sent again instead of being returned as data."""
+        scheduler = RequestScheduler(rate_limits={"geocode": (100, 100)}, backoff_base=0.01)
+        answers = iter([{"status": "OVER_QUERY_LIMIT"}, {"status": "OK"}])
+        self.assertEqual(scheduler.request("geocode", lambda: next(answers))["status"], "OK")
+        stats = scheduler.stats()
+        self.assertEqual(stats["over_query_limit"], 1)
+        self.assertEqual(stats["rates"]["geocode"], 60)
+
+        with self.assertRaises(RateLimitError):
+            scheduler.request("geocode", lambda: {"status": "OVER_QUERY_LIMIT"})
+
+    def test_daily_quota(self):
+        """A request that would go over the day's element quota is refused before it is sent."""
+        scheduler = RequestScheduler(daily_quotas={"distancematrix": 30})
+        scheduler.acquire("distancematrix", cost=25)
+        with self.assertRaises(RateLimitError):
+            scheduler.acquire("distancematrix", cost=25)
+
+    def test_finder_does_not_store_quota_errors_as_distances(self):
+        """A Distance Matrix quota error stops the stage instead of marking every place unreachable."""
+        scheduler = RequestScheduler(max_retries=1, backoff_base=0.01)
+        finder = MetroPlacesFinder("Archives", "dummy_test_key", scheduler=scheduler,
+                                   transport=RecordedTransport({"distancematrix": {"status": "OVER_QUERY_LIMIT"}}))
+        finder.places_data = [{"name": "Place", "location": {"lat": 38.89, "lng": -77.02}}]
+        with self.assertRaises(RateLimitError):
+            finder.calculate_walking_distance()
+        self.assertNotIn("walking_distance", finder.places_data[0])
+
+    def test_every_send_goes_through_the_scheduler(self):
+        """The transport does not retry OVER_QUERY_LIMIT on its own, so each send to Google is one scheduler acquire
+        and one counted call, refused or not."""
+        fake = FakeGoogleMaps(over_query_limit_rate=1.0)
+        server, base_url = start_fake_server(fake)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        transport = HttpTransport(base_url=base_url, sleep=lambda seconds: None)
+        self.addCleanup(transport.close)
+        scheduler = RequestScheduler(max_retries=2, backoff_base=0.01)
+        metrics = Metrics()
+        finder = MetroPlacesFinder("Nowhere", "dummy_test_key", transport=transport, scheduler=scheduler, metrics=metrics)
+        with self.assertRaises(RateLimitError):
+            finder.get_location_coordinates()
+        self.assertEqual(fake.request_counts["geocode"], 3)
+        self.assertEqual(scheduler.stats()["requests"], 3)
+        self.assertEqual(finder.api_call_counts["geocode"], 3)
+        self.assertEqual(metrics.snapshot()["counters"]["http_calls.geocode"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,275 @@
+"""DC Metro Travel Guide for UMD Students
+
+This script runs the travel guide as a small local HTTP service, so many students can get
+recommendations at once without each one launching the command line program.
+
+- Station data (places and walking distances) stays in memory once fetched.
+- Final rankings are kept in a least recently used cache keyed by (station, activity types, distance).
+- Identical requests that arrive while the first one is still being computed wait for that one
+  instead of starting their own, so 100 simultaneous "Archives / food" queries make one upstream fetch.
+- /stats reports p50/p99 latency and cache hit rates.
+- If Google cannot be reached the answer is a JSON 502, or a 503 when the rate limiter or a daily quota refused the request.
+
+Usage: python3 recommendation_service.py [--port 8326]
+Then open http://localhost:8326/recommendations?station=Archives&activities=food,social&distance=1
+"""
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from activity_categories import ACTIVITY_INDEX
+from batch_mode import score_profiles
+from MetroPlacesFinder import MetroPlacesFinder
+from rate_limiter import RateLimitError
+from response_cache import ResponseCache
+from station_coordinates import match_station_name
+
+
+class RecommendationService:
+    """Computes recommendations with in-memory station data, an LRU of rankings and request coalescing."""
+
+    def __init__(self, api_key=None, cache=None, transport=None, max_cached_results=1024, latency_samples=10000):
+        """ This method sets up the empty caches.
+
+        Args:
+            api_key (str): Google Maps API key, or None to read google_api_key.txt only when a request is actually sent. Default is None.
+            cache (ResponseCache): optional on-disk response cache used for upstream calls
+            transport (HttpTransport): object used to send requests. Default is the shared transport
+            max_cached_results (int): most rankings kept in the LRU. Default is 1024.
+            latency_samples (int): how many recent request latencies are kept for the percentiles. Default is 10000.
+        """
+        self.api_key = api_key
+        self.cache = cache
+        self.transport = transport
+        self.max_cached_results = max_cached_results
+        self._lock = threading.Lock()
+        #(station, google types): places with walking distances
+        self._station_data = {}
+        #(station, activity types, distance, k): ranked results, least recently used first
+        self._results = OrderedDict()
+        #keys being computed right now: Future the other callers wait on
+        self._in_flight = {}
+        self._latencies = deque(maxlen=latency_samples)
+        self.counts = {"requests": 0, "result_hits": 0, "result_misses": 0, "coalesced": 0, "upstream_fetches": 0}
+
+    def _coalesced(self, key, compute, lookup):
+        """ This method runs compute() once per key at a time. Callers that ask for a key that is already
+        being computed wait for that result instead of computing it again.
+
+        Args:
+            key (tuple): what is being computed
+            compute (callable): function with no arguments that computes and stores the value
+            lookup (callable): function with no arguments that returns the stored value or None. It is called
+                with self._lock held, in the same critical section as the in-flight check, so a caller always
+                sees either the stored value or the computation in flight.
+
+        Returns:
+            the value computed for key
+        """
+        with self._lock:
+            value = lookup()
+            if value is not None:
+                return value
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.counts["coalesced"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(compute())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def station_places(self, station, google_types):
+        """ This method returns a station's places for some Google types, fetching them only the first time.
+
+        Args:
+            station (str): official station name
+            google_types (tuple): Google place types, sorted
+
+        Returns:
+            list: places with "walking_distance"
+        """
+        key = (station, google_types)
+
+        def fetch():
+            with self._lock:
+                self.counts["upstream_fetches"] += 1
+            finder = MetroPlacesFinder(station, self.api_key, cache=self.cache, transport=self.transport)
+            finder.get_nearby_places(included_types=list(google_types))
+            if finder.places_data:
+                finder.calculate_walking_distance()
+            places = [place for place in finder.places_data if "walking_distance" in place]
+            #stored before the in-flight entry is removed, see _coalesced
+            with self._lock:
+                self._station_data[key] = places
+            return places
+
+        return self._coalesced(("station",) + key, fetch, lambda: self._station_data.get(key))
+
+    def recommend(self, station, activity_types, max_distance, k=5):
+        """ This method returns the top recommendations for one set of preferences.
+
+        Args:
+            station (str): station name as typed by the user
+            activity_types (list): activity types, most preferred first, ie: ["food", "social"]
+            max_distance (float): maximum walking distance in miles
+            k (int): number of recommendations. Default is 5.
+
+        Returns:
+            list: recommendation dictionaries with name, type_of_activity and distance_miles
+        """
+        start = time.perf_counter()
+        station = match_station_name(station) or station
+        activity_types = tuple(activity.strip().lower() for activity in activity_types if activity.strip())
+        key = (station, activity_types, float(max_distance), k)
+
+        with self._lock:
+            self.counts["requests"] += 1
+
+        def lookup():
+            #called by _coalesced with self._lock held
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                self.counts["result_hits"] += 1
+            else:
+                self.counts["result_misses"] += 1
+            return cached
+
+        def compute():
+            google_types = ACTIVITY_INDEX.google_types(activity_types)
+            places = self.station_places(station, google_types) if google_types else []
+            profile = {"name": "Guest", "station": station, "activity_types": list(activity_types),
+                       "max_distance": float(max_distance)}
+            recommendations = score_profiles(places, [profile], k)[0]["recommendations"]
+            #stored before the in-flight entry is removed, see _coalesced
+            with self._lock:
+                self._results[key] = recommendations
+                while len(self._results) > self.max_cached_results:
+                    self._results.popitem(last=False)
+            return recommendations
+
+        recommendations = self._coalesced(key, compute, lookup)
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+        return recommendations
+
+    def stats(self):
+        """ This method reports latency percentiles and cache hit rates.
+
+        Returns:
+            dict: request counts, result cache hit rate, p50/p99 latency in milliseconds and cache sizes
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self.counts)
+            cached_results = len(self._results)
+            cached_stations = len(self._station_data)
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+        lookups = counts["result_hits"] + counts["result_misses"]
+        stats = {
+            **counts,
+            "result_hit_rate": counts["result_hits"] / lookups if lookups else 0.0,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "cached_results": cached_results,
+            "cached_stations": cached_stations,
+        }
+        if self.cache is not None:
+            stats["response_cache"] = self.cache.stats()
+        return stats
+
+
+def make_handler(service):
+    """ This function builds the HTTP request handler class for a service.
+
+    Args:
+        service (RecommendationService): the service answering the requests
+
+    Returns:
+        type: a BaseHTTPRequestHandler subclass
+    """
+    class RecommendationHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/stats":
+                self._send_json(200, service.stats())
+            elif url.path == "/recommendations":
+                try:
+                    station = query["station"][0]
+                    activities = query.get("activities", [""])[0].split(",")
+                    distance = float(query.get("distance", ["1"])[0])
+                except (KeyError, ValueError) as e:
+                    self._send_json(400, {"error": f"bad request: {e}"})
+                    return
+                try:
+                    recommendations = service.recommend(station, activities, distance)
+                except RateLimitError as e:
+                    self._send_json(503, {"error": f"rate limited: {e}"})
+                    return
+                except Exception as e:
+                    #ie: TransportError, or no API key file
+                    self._send_json(502, {"error": f"upstream failure: {e}"})
+                    return
+                self._send_json(200, {"station": station, "recommendations": recommendations})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            #keeps the terminal quiet, /stats has the numbers
+            pass
+
+    return RecommendationHandler
+
+
+def make_server(service, host="127.0.0.1", port=8326):
+    """ This function creates (but does not start) the HTTP server.
+
+    Args:
+        service (RecommendationService): the service answering the requests
+        host (str): address to listen on. Default is "127.0.0.1".
+        port (int): port to listen on, 0 picks a free one. Default is 8326.
+
+    Returns:
+        ThreadingHTTPServer: call serve_forever() on it to start answering
+    """
+    return ThreadingHTTPServer((host, port), make_handler(service))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve travel guide recommendations over HTTP.")
+    parser.add_argument("--port", type=int, default=8326)
+    args = parser.parse_args()
+
+    server = make_server(RecommendationService(cache=ResponseCache()), port=args.port)
+    print(f"Serving recommendations on http://127.0.0.1:{args.port}/recommendations")
+    server.serve_forever()
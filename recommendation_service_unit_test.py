@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from http_transport import RecordedTransport, TransportError
+from rate_limiter import RateLimitError
+from recommendation_service import RecommendationService, make_server
+
+
+def slow_fake_google(url, params):
+    """Answers slowly so that simultaneous requests overlap. Every place is a restaurant 300 meters away."""
+    time.sleep(0.05)
+    if "nearbysearch" in url:
+        return {"status": "OK", "results": [
+            {"place_id": f"id-{i}", "name": f"Restaurant {i}", "types": ["restaurant"],
+             "geometry": {"location": {"lat": 38.894, "lng": -77.0217}}}
+            for i in range(8)
+        ]}
+    destinations = params["destinations"].split("|")
+    return {"rows": [{"elements": [{"status": "OK", "distance": {"value": 300}} for _ in destinations]}]}
+
+
+class TestRecommendationService(unittest.TestCase):
+    def setUp(self):
+        self.transport = RecordedTransport(slow_fake_google)
+        self.service = RecommendationService("dummy_test_key", transport=self.transport)
+
+    def test_simultaneous_requests_coalesce(self):
+        """100 simultaneous Archives / food queries should trigger exactly one upstream nearby search."""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.service.recommend("Archives", ["food"], 1)))
+                   for _ in range(100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum("nearbysearch" in url for url, _ in self.transport.requests), 1)
+        self.assertEqual(len(results), 100)
+        self.assertTrue(all(result == results[0] and len(result) == 5 for result in results))
+        self.assertEqual(self.service.stats()["upstream_fetches"], 1)
+
+    def test_result_cache_and_station_reuse(self):
+        """A repeated query is a cache hit, and a new distance at the same station reuses the station data."""
+        self.service.recommend("Archives", ["food"], 1)
+        self.service.recommend("Archives", ["food"], 1)
+        self.service.recommend("Archives", ["food"], 0.1)
+        stats = self.service.stats()
+        self.assertEqual(stats["result_hits"], 1)
+        self.assertEqual(stats["upstream_fetches"], 1)
+        self.assertGreaterEqual(stats["p99_ms"], stats["p50_ms"])
+
+    def test_caller_finishing_first_is_seen(self):
+        """A caller that finishes just before another one starts waiting is a cache hit for it, not a second fetch."""
+        coalesced = self.service._coalesced
+        raced = set()
+
+        def finish_another_caller_first(key, compute, lookup):
+            if key not in raced:
+                raced.add(key)
+                if key[0] == "station":
+                    self.service.station_places(*key[1:])
+                else:
+                    self.service.recommend("Archives", ["food"], 1)
+            return coalesced(key, compute, lookup)
+
+        with mock.patch.object(self.service, "_coalesced", finish_another_caller_first):
+            self.service.recommend("Archives", ["food"], 1)
+        stats = self.service.stats()
+        self.assertEqual(stats["result_hits"], 1)
+        self.assertEqual(stats["upstream_fetches"], 1)
+
+    def test_http_endpoints(self):
+        """The HTTP server answers recommendation and stats requests with JSON."""
+        server = make_server(self.service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        with urlopen(f"{base}/recommendations?station=Archives&activities=food&distance=1") as response:
+            payload = json.load(response)
+        self.assertEqual(len(payload["recommendations"]), 5)
+        with urlopen(f"{base}/stats") as response:
+            self.assertEqual(json.load(response)["requests"], 1)
+
+    def test_upstream_errors_are_json(self):
+        """A failed upstream call answers 502, and a rate limited one 503, instead of dropping the connection."""
+        def unreachable(url, params):
+            raise TransportError("connection refused")
+
+        service = RecommendationService("dummy_test_key", transport=RecordedTransport(unreachable))
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/recommendations?station=Archives&activities=food"
+
+        with self.assertRaises(HTTPError) as raised:
+            urlopen(url)
+        self.assertEqual(raised.exception.code, 502)
+        self.assertIn("connection refused", json.load(raised.exception)["error"])
+        raised.exception.close()
+
+        with mock.patch.object(service, "recommend", side_effect=RateLimitError("daily quota reached")):
+            with self.assertRaises(HTTPError) as raised:
+                urlopen(url)
+        self.assertEqual(raised.exception.code, 503)
+        raised.exception.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module keeps a persistent, on-disk cache of Google Maps API responses so that
+looking up the same Green Line station or the same places again does not go back to
+the network. Responses are stored in a small SQLite file, keyed by the endpoint name
+and the normalized request parameters (the API key is never part of the key).
+
+Each endpoint has its own time to live, the cache holds at most a fixed number of
+entries (the least recently used ones are evicted first), and hits and misses are
+counted so we can see how well it is working.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+DAY_IN_SECONDS = 24 * 60 * 60
+
+#how long a cached response stays fresh for each endpoint, in seconds
+DEFAULT_TTLS = {
+    "geocode": 30 * DAY_IN_SECONDS,  # station coordinates basically never change
+    "nearbysearch": DAY_IN_SECONDS,
+    "places_new_nearby": DAY_IN_SECONDS,
+    "distancematrix": 7 * DAY_IN_SECONDS,
+}
+
+#response statuses that are real answers and safe to reuse
+CACHEABLE_STATUSES = {"OK", "ZERO_RESULTS"}
+
+
+def make_cache_key(endpoint, params):
+    """ This function builds the cache key for a request.
+
+    Args:
+        endpoint (str): short endpoint name, ie: "geocode"
+        params (dict): query parameters of the request
+
+    Returns:
+        str: the endpoint followed by the parameters sorted by name, with the API key left out
+            and extra whitespace in the values collapsed
+    """
+    normalized = {
+        name: " ".join(str(value).split())
+        for name, value in params.items()
+        if name != "key"
+    }
+    return f"{endpoint}:{json.dumps(normalized, sort_keys=True)}"
+
+
+class ResponseCache:
+    """A SQLite-backed cache of Google API responses with per-endpoint expiry
+    and least recently used eviction.
+    """
+
+    def __init__(self, path="google_api_cache.sqlite3", max_entries=10000, ttls=None):
+        """ This method opens (or creates) the cache database.
+
+        Args:
+            path (str): path of the SQLite file, or ":memory:" for a cache that is not saved.
+                Default is "google_api_cache.sqlite3"
+            max_entries (int): largest number of responses kept before the least recently used ones are removed
+            ttls (dict): seconds each endpoint's responses stay fresh. Missing endpoints use DEFAULT_TTLS
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, endpoint TEXT, response TEXT, created_at REAL, last_used REAL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._connection.commit()
+
+    def get(self, endpoint, params):
+        """ This method looks up a cached response.
+
+        Args:
+            endpoint (str): short endpoint name, ie: "geocode"
+            params (dict): query parameters of the request
+
+        Returns:
+            dict or None: the cached response if there is a fresh one, otherwise None
+        """
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttls.get(endpoint, DAY_IN_SECONDS):
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, endpoint, params, response):
+        """ This method stores a response if it is a real answer (not an error such as OVER_QUERY_LIMIT,
+        or a Places API (New) response with an "error").
+
+        Args:
+            endpoint (str): short endpoint name, ie: "geocode"
+            params (dict): query parameters of the request
+            response (dict): the decoded JSON response
+        """
+        if response.get("status", "OK") not in CACHEABLE_STATUSES or "error" in response:
+            return
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, json.dumps(response), now, now),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def __contains__(self, request):
+        """Checks whether an (endpoint, params) pair has a fresh entry without counting a hit or miss."""
+        endpoint, params = request
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT created_at FROM responses WHERE key = ?", (make_cache_key(endpoint, params),)
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttls.get(endpoint, DAY_IN_SECONDS)
+
+    def _evict(self):
+        """Removes the least recently used entries once the cache holds more than max_entries."""
+        (count,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def stats(self):
+        """ This method reports how the cache is doing.
+
+        Returns:
+            dict: hits, misses, hit_rate and the number of stored entries
+        """
+        with self._lock:
+            (entries,) = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        """Removes every stored response and resets the hit and miss counts."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,54 @@
+import time
+import unittest
+from unittest import mock
+from response_cache import ResponseCache, make_cache_key
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        """Creates an in-memory cache so nothing is written to disk."""
+        self.cache = ResponseCache(":memory:", max_entries=2)
+        self.params = {"address": "Archives Metro Station, DMV Area", "key": "dummy_test_key"}
+        self.response = {"status": "OK", "results": [{"geometry": {"location": {"lat": 38.89, "lng": -77.02}}}]}
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_key_ignores_api_key(self):
+        """Two requests that only differ by API key should share a cache entry."""
+        other_params = {**self.params, "key": "another_key"}
+        self.assertEqual(make_cache_key("geocode", self.params), make_cache_key("geocode", other_params))
+
+    def test_hit_and_miss_counts(self):
+        """The first lookup misses, and after storing the response the next lookup hits."""
+        self.assertIsNone(self.cache.get("geocode", self.params))
+        self.cache.set("geocode", self.params, self.response)
+        self.assertEqual(self.cache.get("geocode", self.params), self.response)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_expired_entries_miss(self):
+        """An entry older than its endpoint's time to live is not returned."""
+        self.cache.set("geocode", self.params, self.response)
+        with mock.patch("response_cache.time.time", return_value=10 ** 12):
+            self.assertIsNone(self.cache.get("geocode", self.params))
+
+    def test_least_recently_used_evicted(self):
+        """Once the cache is full, the entry that was used longest ago is removed."""
+        now = time.time()
+        with mock.patch("response_cache.time.time", side_effect=[now, now + 1, now + 2, now + 3]):
+            self.cache.set("geocode", {"address": "a"}, self.response)
+            self.cache.set("geocode", {"address": "b"}, self.response)
+            self.cache.get("geocode", {"address": "a"})
+            self.cache.set("geocode", {"address": "c"}, self.response)
+        self.assertIn(("geocode", {"address": "a"}), self.cache)
+        self.assertNotIn(("geocode", {"address": "b"}), self.cache)
+
+    def test_errors_not_cached(self):
+        """Quota errors are not real answers and should not be stored."""
+        self.cache.set("geocode", self.params, {"status": "OVER_QUERY_LIMIT", "results": []})
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds an in-process spatial index over places we have already fetched, so that
+a new station or a new walking radius can be answered from local data instead of another
+Nearby Search call. Places are put into square grid cells of a fixed size; a query only looks
+at the cells that can hold matching places and measures the exact great-circle distance to
+those few candidates.
+
+The grid is laid out for the Washington, DC area (cell widths in longitude are computed at
+DC's latitude), which is plenty accurate for places within a few kilometers of the Green Line.
+"""
+import json
+import math
+
+from geo_utils import EARTH_RADIUS_METERS, haversine_meters
+
+#latitude the grid's longitude spacing is computed for (downtown DC)
+REFERENCE_LATITUDE = 38.9
+
+
+class GridIndex:
+    """A grid of place buckets answering radius and k-nearest queries, optionally filtered by type."""
+
+    def __init__(self, cell_size_meters=500):
+        """ This method creates an empty index.
+
+        Args:
+            cell_size_meters (float): width of one grid cell in meters. Default is 500.
+        """
+        self.cell_size_meters = cell_size_meters
+        #on the same sphere as haversine_meters, so a cell is cell_size_meters tall in the distances queries measure
+        self.lat_step = math.degrees(cell_size_meters / EARTH_RADIUS_METERS)
+        self.lng_step = self.lat_step / math.cos(math.radians(REFERENCE_LATITUDE))
+        #(row, column): place_ids in that cell
+        self.cells = {}
+        #place_id: place dictionary
+        self.places = {}
+
+    def __len__(self):
+        return len(self.places)
+
+    def _cell_extent(self, lat):
+        """ This method gives the shortest side of a cell, so that n rings of cells are known to cover n times it.
+        Cells are narrower north of REFERENCE_LATITUDE, where a degree of longitude is shorter.
+
+        Args:
+            lat (float): the latitude closest to the pole that the cells in question reach
+
+        Returns:
+            float: the shortest side in meters
+        """
+        width = EARTH_RADIUS_METERS * math.cos(math.radians(min(abs(lat), 90))) * math.radians(self.lng_step)
+        return min(self.cell_size_meters, width)
+
+    def _rings(self, location, radius_meters):
+        """Returns how many rings around the center cell hold every point within radius_meters of location."""
+        reach = abs(location["lat"]) + math.degrees(radius_meters / EARTH_RADIUS_METERS)
+        return math.ceil(radius_meters / self._cell_extent(reach))
+
+    def _cell(self, lat, lng):
+        """Returns the (row, column) of the cell holding a coordinate."""
+        return (math.floor(lat / self.lat_step), math.floor(lng / self.lng_step))
+
+    def add(self, place):
+        """ This method adds a place to the index. Places without coordinates or a place_id are ignored.
+
+        Args:
+            place (dict): a place with "place_id" and a "location" dictionary
+        """
+        location = place.get("location")
+        place_id = place.get("place_id")
+        if not location or place_id is None or place_id in self.places:
+            return
+        self.places[place_id] = place
+        self.cells.setdefault(self._cell(location["lat"], location["lng"]), []).append(place_id)
+
+    @classmethod
+    def from_places(cls, places, cell_size_meters=500):
+        """ This method builds an index from a list of places, ie: MetroPlacesFinder.places_data.
+
+        Args:
+            places (iterable): places to index
+            cell_size_meters (float): width of one grid cell in meters. Default is 500.
+
+        Returns:
+            GridIndex: the filled index
+        """
+        index = cls(cell_size_meters)
+        for place in places:
+            index.add(place)
+        return index
+
+    @staticmethod
+    def _matches_types(place, types):
+        """Checks a place's activity type (and any other types it was found under) against a set of types."""
+        if types is None:
+            return True
+        if place.get("type_of_activity") in types:
+            return True
+        return any(place_type in types for place_type in place.get("types", ()))
+
+    def _candidates(self, center, ring, types):
+        """Collects the matching places in the cells exactly `ring` cells away from the center cell."""
+        row, column = center
+        if ring == 0:
+            cells = [center]
+        else:
+            cells = [(row + d_row, column + d_column)
+                     for d_row in range(-ring, ring + 1)
+                     for d_column in range(-ring, ring + 1)
+                     if max(abs(d_row), abs(d_column)) == ring]
+        places = []
+        for cell in cells:
+            for place_id in self.cells.get(cell, ()):
+                place = self.places[place_id]
+                if self._matches_types(place, types):
+                    places.append(place)
+        return places
+
+    def _with_distances(self, location, places):
+        """Pairs places with their great-circle distance from location, nearest first."""
+        if not places:
+            return []
+        distances = haversine_meters(
+            location,
+            [place["location"]["lat"] for place in places],
+            [place["location"]["lng"] for place in places],
+        )
+        return sorted(zip(distances.tolist(), places), key=lambda pair: pair[0])
+
+    def query_radius(self, location, radius_meters, types=None):
+        """ This method finds every indexed place within a radius.
+
+        Args:
+            location (dict): a dictionary with 'lat' and 'lng', ie: a metro stop
+            radius_meters (float): search radius in meters
+            types (collection): only return places with one of these types. Default is None (any type)
+
+        Returns:
+            list: (distance in meters, place) pairs, nearest first
+        """
+        center = self._cell(location["lat"], location["lng"])
+        rings = self._rings(location, radius_meters)
+        candidates = []
+        for ring in range(rings + 1):
+            candidates.extend(self._candidates(center, ring, types))
+        return [(distance, place) for distance, place in self._with_distances(location, candidates)
+                if distance <= radius_meters]
+
+    def nearest(self, location, k=5, types=None, max_radius_meters=None):
+        """ This method finds the k indexed places closest to a location.
+
+        Args:
+            location (dict): a dictionary with 'lat' and 'lng', ie: a metro stop
+            k (int): how many places to return. Default is 5.
+            types (collection): only return places with one of these types. Default is None (any type)
+            max_radius_meters (float): ignore places farther than this. Default is None (no limit)
+
+        Returns:
+            list: up to k (distance in meters, place) pairs, nearest first
+        """
+        if not self.cells or k <= 0:
+            return []
+        center = self._cell(location["lat"], location["lng"])
+        #no occupied cell is farther than this many rings from the center
+        last_ring = max(max(abs(row - center[0]), abs(column - center[1])) for row, column in self.cells)
+        if max_radius_meters is not None:
+            last_ring = min(last_ring, self._rings(location, max_radius_meters))
+
+        found = []
+        for ring in range(last_ring + 1):
+            found = self._with_distances(location, [place for _, place in found] + self._candidates(center, ring, types))
+            #everything outside the rings searched so far is at least this far away
+            if len(found) >= k and found[k - 1][0] <= ring * self._cell_extent(abs(location["lat"]) + (ring + 1) * self.lat_step):
+                break
+        if max_radius_meters is not None:
+            found = [(distance, place) for distance, place in found if distance <= max_radius_meters]
+        return found[:k]
+
+    def to_dict(self, include_places=True):
+        """ This method returns the index as plain data that can be written as JSON.
+
+        Args:
+            include_places (bool): whether to include the place dictionaries. A PlaceCatalog leaves them
+                out because it already saves the same places. Default is True.
+
+        Returns:
+            dict: the cell size, the cells and (optionally) the places
+        """
+        data = {
+            "cell_size_meters": self.cell_size_meters,
+            "cells": [[row, column, place_ids] for (row, column), place_ids in self.cells.items()],
+        }
+        if include_places:
+            data["places"] = self.places
+        return data
+
+    @classmethod
+    def from_dict(cls, data, places=None):
+        """ This method rebuilds an index from the output of to_dict without recomputing any cells.
+
+        Args:
+            data (dict): output of to_dict
+            places (dict): place_id mapped to place, used when data was saved without its places
+
+        Returns:
+            GridIndex: the rebuilt index
+        """
+        index = cls(data["cell_size_meters"])
+        index.cells = {(row, column): place_ids for row, column, place_ids in data["cells"]}
+        index.places = data["places"] if places is None else places
+        return index
+
+    def save(self, path):
+        """ This method writes the index to a JSON file.
+
+        Args:
+            path (str): file to write
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        """ This method reads an index written by save.
+
+        Args:
+            path (str): file to read
+
+        Returns:
+            GridIndex: the loaded index
+        """
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,56 @@
+import math
+import random
+import unittest
+from geo_utils import EARTH_RADIUS_METERS, haversine_meters
+from spatial_index import GridIndex
+
+
+class TestGridIndex(unittest.TestCase):
+    def setUp(self):
+        """Indexes 2000 random places around downtown DC."""
+        generator = random.Random(326)
+        self.places = [
+            {"place_id": f"id-{i}", "name": f"Place {i}", "type_of_activity": generator.choice(["museum", "park", "cafe"]),
+             "location": {"lat": 38.88 + generator.random() * 0.06, "lng": -77.05 + generator.random() * 0.06}}
+            for i in range(2000)
+        ]
+        self.index = GridIndex.from_places(self.places, cell_size_meters=300)
+        self.archives = {"lat": 38.8936, "lng": -77.0217}
+
+    def brute_force(self, types=None):
+        """Returns (distance, place_id) for every place of the given types, nearest first."""
+        places = [place for place in self.places if types is None or place["type_of_activity"] in types]
+        distances = haversine_meters(self.archives, [p["location"]["lat"] for p in places], [p["location"]["lng"] for p in places])
+        return sorted(zip(distances.tolist(), [place["place_id"] for place in places]))
+
+    def test_radius_query_matches_brute_force(self):
+        """A radius query finds exactly the places a full scan finds."""
+        expected = [place_id for distance, place_id in self.brute_force({"park"}) if distance <= 800]
+        found = [place["place_id"] for _, place in self.index.query_radius(self.archives, 800, types={"park"})]
+        self.assertEqual(sorted(found), sorted(expected))
+
+    def test_nearest_matches_brute_force(self):
+        """The k nearest places are the same as the first k of a full sort."""
+        expected = [place_id for _, place_id in self.brute_force({"museum", "cafe"})[:7]]
+        found = [place["place_id"] for _, place in self.index.nearest(self.archives, k=7, types={"museum", "cafe"})]
+        self.assertEqual(found, expected)
+
+    def test_cell_boundary(self):
+        """From the southern edge of a cell, a place just inside the radius two cells to the south is still found."""
+        index = GridIndex(cell_size_meters=500)
+        row = math.floor(38.89 / index.lat_step)
+        center = {"lat": (row + 1e-9) * index.lat_step, "lng": -77.02}
+        place = {"place_id": "south", "name": "South", "type_of_activity": "park",
+                 "location": {"lat": center["lat"] - math.degrees(999.0 / EARTH_RADIUS_METERS), "lng": -77.02}}
+        index.add(place)
+        self.assertEqual([p["place_id"] for _, p in index.query_radius(center, 1000)], ["south"])
+        self.assertEqual([p["place_id"] for _, p in index.nearest(center, k=1, max_radius_meters=1000)], ["south"])
+
+    def test_round_trip(self):
+        """An index rebuilt from to_dict answers queries the same way."""
+        loaded = GridIndex.from_dict(self.index.to_dict())
+        self.assertEqual(loaded.nearest(self.archives, k=3), self.index.nearest(self.archives, k=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
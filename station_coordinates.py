@@ -0,0 +1,123 @@
+"""DC Metro Travel Guide for UMD Students
+
+This module holds a built-in table of coordinates for every stop on the Washington, DC
+Metro Green Line. MetroPlacesFinder looks stations up here first, so building a finder
+for a known stop does not need a Geocoding API call. Station names are normalized
+(case, punctuation, common abbreviations) and then fuzzy matched, so spellings such as
+"Mt Vernon", "Fort Trotten" or "Gallery PI-Chinatown" still resolve.
+"""
+import difflib
+import re
+from functools import lru_cache
+
+#bump this whenever a coordinate in the table is added or corrected
+STATION_TABLE_VERSION = "2025.05.1"
+
+#official station name: (latitude, longitude) of the station entrance, north to south
+GREEN_LINE_STATIONS = {
+    "Greenbelt": (39.0111, -76.9111),
+    "College Park-U of Md": (38.9785, -76.9287),
+    "Hyattsville Crossing": (38.9651, -76.9560),
+    "West Hyattsville": (38.9550, -76.9690),
+    "Fort Totten": (38.9517, -77.0022),
+    "Georgia Ave-Petworth": (38.9373, -77.0235),
+    "Columbia Heights": (38.9284, -77.0326),
+    "U Street": (38.9170, -77.0282),
+    "Shaw-Howard U": (38.9134, -77.0219),
+    "Mt Vernon Sq": (38.9055, -77.0219),
+    "Gallery Pl-Chinatown": (38.8983, -77.0219),
+    "Archives": (38.8936, -77.0217),
+    "L'Enfant Plaza": (38.8848, -77.0219),
+    "Waterfront": (38.8765, -77.0175),
+    "Navy Yard-Ballpark": (38.8765, -77.0050),
+    "Anacostia": (38.8627, -76.9952),
+    "Congress Heights": (38.8455, -76.9884),
+    "Southern Ave": (38.8410, -76.9750),
+    "Naylor Road": (38.8513, -76.9563),
+    "Suitland": (38.8437, -76.9319),
+    "Branch Ave": (38.8267, -76.9122),
+}
+
+#other names people use for some stations
+STATION_ALIASES = {
+    "Prince George's Plaza": "Hyattsville Crossing",
+    "College Park": "College Park-U of Md",
+    "Mount Vernon": "Mt Vernon Sq",
+    "Convention Center": "Mt Vernon Sq",
+    "Gallery Place": "Gallery Pl-Chinatown",
+    "Chinatown": "Gallery Pl-Chinatown",
+    "Navy Yard": "Navy Yard-Ballpark",
+    "Petworth": "Georgia Ave-Petworth",
+    "Howard University": "Shaw-Howard U",
+}
+
+#abbreviations expanded during normalization so "Mt Vernon Sq" and "Mount Vernon Square" match
+_ABBREVIATIONS = {
+    "mt": "mount",
+    "ft": "fort",
+    "sq": "square",
+    "pl": "place",
+    "st": "street",
+    "ave": "avenue",
+    "av": "avenue",
+    "rd": "road",
+    "md": "maryland",
+}
+
+#words that do not help tell stations apart
+_IGNORED_WORDS = {"metro", "station", "stop", "dmv", "area", "dc"}
+
+
+def normalize_station_name(name):
+    """ This function puts a station name into a standard form for lookups.
+
+    Args:
+        name (str): a station name as typed by a user, ie: "Mt Vernon" or "L'Enfant Plaza Metro Station"
+
+    Returns:
+        str: lowercase words separated by single spaces, with punctuation removed and abbreviations expanded
+    """
+    words = re.findall(r"[a-z0-9]+", name.lower().replace("'", ""))
+    return " ".join(_ABBREVIATIONS.get(word, word) for word in words if word not in _IGNORED_WORDS)
+
+
+#normalized name (including aliases): official station name
+_NORMALIZED_STATIONS = {normalize_station_name(station): station for station in GREEN_LINE_STATIONS}
+_NORMALIZED_STATIONS.update(
+    {normalize_station_name(alias): station for alias, station in STATION_ALIASES.items()}
+)
+
+
+@lru_cache(maxsize=256)
+def match_station_name(name):
+    """ This function finds the official Green Line station name closest to the given name.
+
+    Args:
+        name (str): a station name as typed by a user
+
+    Returns:
+        str or None: the official station name, or None if nothing is close enough
+    """
+    normalized = normalize_station_name(name)
+    if normalized in _NORMALIZED_STATIONS:
+        return _NORMALIZED_STATIONS[normalized]
+    matches = difflib.get_close_matches(normalized, _NORMALIZED_STATIONS.keys(), n=1, cutoff=0.75)
+    if matches:
+        return _NORMALIZED_STATIONS[matches[0]]
+    return None
+
+
+def lookup_station_coordinates(name):
+    """ This function looks up the coordinates of a Green Line station in the built-in table.
+
+    Args:
+        name (str): a station name as typed by a user
+
+    Returns:
+        dict or None: a dictionary with 'lat' and 'lng' if the station is in the table, otherwise None
+    """
+    station = match_station_name(name)
+    if station is None:
+        return None
+    lat, lng = GREEN_LINE_STATIONS[station]
+    return {"lat": lat, "lng": lng}
@@ -0,0 +1,25 @@
+import unittest
+from station_coordinates import GREEN_LINE_STATIONS, lookup_station_coordinates, match_station_name, normalize_station_name
+
+
+class TestStationCoordinates(unittest.TestCase):
+    def test_normalize_expands_abbreviations(self):
+        """Abbreviated and spelled out names should normalize to the same text."""
+        self.assertEqual(normalize_station_name("Mt Vernon Sq"), normalize_station_name("Mount Vernon Square"))
+        self.assertEqual(normalize_station_name("L'Enfant Plaza Metro Station"), "lenfant plaza")
+
+    def test_user_preference_stops_resolve(self):
+        """Every stop printed by User_Preference.user_preferences, typos included, should be in the table."""
+        stops = ['Anacostia', 'Archives', 'Columbia Heights', 'Congress Heights', 'Fort Trotten', 'Gallery PI-Chinatown',
+                 'Georgia Ave-Petworth', 'L''Enfant Plaza', 'Mt Vernon', 'Shaw-Howard U', 'U Street', 'Waterfront']
+        for stop in stops:
+            self.assertIn(match_station_name(stop), GREEN_LINE_STATIONS, stop)
+
+    def test_lookup_returns_coordinates(self):
+        """A known station gives a lat/lng dictionary, and a stop off the Green Line gives None."""
+        self.assertEqual(lookup_station_coordinates("Archives"), {"lat": 38.8936, "lng": -77.0217})
+        self.assertIsNone(lookup_station_coordinates("Dupont Circle"))
+
+
+if __name__ == '__main__':
+    unittest.main()
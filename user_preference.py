@@ -17,7 +17,17 @@ by the API. This was fixed by matching the label for our activity types to the l
 """
 
 #importing the MetroPlacesFinder file that accesses the API
+import logging
 import MetroPlacesFinder
+from activity_categories import ACTIVITY_INDEX
+from instrumentation import get_metrics
+from places import with_score
+from ranking import PlaceScorer
+from response_cache import ResponseCache
+
+#Green Line stops shown to the user, from College Park to D.C.
+ALL_METRO_STOPS = ['Anacostia', 'Archives', 'Columbia Heights', 'Congress Heights', 'Fort Trotten', 'Gallery PI-Chinatown', 
+                   'Georgia Ave-Petworth', 'L''Enfant Plaza', 'Mt Vernon', 'Shaw-Howard U', 'U Street', 'Waterfront']
 
 class User_Preference: 
     """A class for obtaining the user preferences for a travel guide from Green Line Metro stops. Based on the user's stop, the program
@@ -52,59 +62,49 @@ class User_Preference:
             types that the user selects 
             
         Returns: 
-            list: list of API specific types as strings that match what the user selects. Duplicates are removed.
+            list: list of API specific types as strings that match what the user selects. Duplicates are removed
+            and the types are sorted, so the same activity types always give the same list.
         """
         
-        #matches our assigned labels for acitivty types to the Google API categories for activity types
-        google_api_types = {
-            "food": ["restaurant", "cafe", "bakery", "meal_takeaway", "meal_delivery"],
-            "museums and monuments": ["museum", "art_gallery", "historical_landmark", "tourist_attraction"],
-            "sporty": ["gym", "stadium", "park", "sports_club"],
-            "social": ["bar", "night_club", "cafe"],
-            "nature": ["park", "campground", "natural_feature"]
-        }
-        
-        mapped_types = []
-        for user_type in user_activity_types:
-            if user_type in google_api_types:
-                mapped_types.extend(google_api_types[user_type])
-        
-        # Remove duplicates by converting to a set and back to a list
-        return list(set(mapped_types))
+        #the labels for activity types are matched to Google API types by the shared index in activity_categories
+        return list(ACTIVITY_INDEX.google_types(user_activity_types))
 
-    def sort_activity_types(self, places):
+    def sort_activity_types(self, places, k=None):
         """Sorts the places based on how well they match the user's input preferences.
         
         Args:
-            places(list): list of dictionaries with name value and activity key. Each dictionary represnts a place. 
-                Each dictionary has:
+            places(list or PlaceColumns): list of places (dictionaries or Place objects) with name value and activity key.
+                Each one has:
                     type_of_activity(str): activity type of the place
                     walking_distance(float,optional): walking distance 
                     rating(float,optional): place's rating
+            k(int): only return the k best places. Default is None (all of them)
             
         Returns:
             list: list of places with a "score" key sorted from highest to lowest. 
         """
-        ranked_places = []
-        
-        for place in places:
-                score = 0
-                
-                #checks if the activity type matches user preference and adds points to "rank" based on user preference
-                if place["type_of_activity"].lower() in self.preferences["type_of_activity"]:
-                    rank = self.preferences["type_of_activity"].index(place["type_of_activity"].lower())
-                    score += (len(self.preferences["type_of_activity"]) - rank ) *5
-                    
-                #calculates walking distance score
-                distance_score = max(0, self.preferences["max_walking_distance"] - place.get("walking_distance", 0))
-                score += distance_score*3
-                
-                #calculates rating score
-                rating_score = max(0, place.get("rating", 0) - self.preferences.get("min_rating", 0))
-                score += rating_score *1
-                
-                ranked_places.append({**place, "score": score})
-        return sorted(ranked_places, key=lambda x:x["score"], reverse = True)
+        with get_metrics().span("ranking"):
+            return [with_score(place, score) for score, place in self.place_scorer().top_k(places, k)]
+
+    def place_scorer(self):
+        """Builds the scorer for this user's preferences.
+        
+        Returns:
+            PlaceScorer: activity type matches add points based on user preference (5 per rank), walking distance
+                under the maximum adds 3 per unit and rating above the minimum adds 1 per point. A place's Google
+                types ("restaurant") get the points of the best category they belong to ("food"). Its top_k method
+                returns (score, place) pairs without copying the places.
+        """
+        return PlaceScorer(
+            self.preferences["type_of_activity"],
+            self.preferences["max_walking_distance"],
+            activity_weight=5,
+            distance_weight=3,
+            rating_weight=1,
+            min_rating=self.preferences.get("min_rating", 0),
+            case_insensitive=True,
+            categories=ACTIVITY_INDEX,
+        )
     
     def user_preferences(self):
         """
@@ -120,8 +120,7 @@ class User_Preference:
                     max_walking_distance (float): Max distance the user wants to walk.
                     min_rating (float): Minimum rating the user wants for a place.
         """
-        all_metro_stops = ['Anacostia', 'Archives', 'Columbia Heights', 'Congress Heights', 'Fort Trotten', 'Gallery PI-Chinatown', 
-                           'Georgia Ave-Petworth', 'L''Enfant Plaza', 'Mt Vernon', 'Shaw-Howard U', 'U Street', 'Waterfront']
+        all_metro_stops = ALL_METRO_STOPS
         
         activity_types = ["Food", "Museums and Monuments", "Sporty", "Social", "Nature"]
       
@@ -159,28 +158,37 @@ class User_Preference:
     
 
 if __name__ == "__main__":
+    #warnings and errors only; set the level to INFO to also see the metrics snapshot at the end
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
 
-    #calls MetroPlacesFinder to get the API key from a file
-    API_KEY = MetroPlacesFinder.load_api_key()
-    
     user = User_Preference()
     user.user_preferences()
 
-    scraper = MetroPlacesFinder.MetroPlacesFinder(user.metro_stop_name, API_KEY)
+    #reuses saved API responses from earlier runs so repeated stations and places are not fetched again.
+    #the API key is read from its file (and requests imported) only once a request has to be sent
+    scraper = MetroPlacesFinder.MetroPlacesFinder(user.metro_stop_name, cache=ResponseCache())
     
     # Map the user's preferred activity types to Google Places API types
     google_places_types = user.map_activity_types_to_google_places_api(user.preferences["type_of_activity"])
 
-    # Pass the mapped types to get_nearby_places
-    scraper.get_nearby_places(included_types=google_places_types)
+    # Convert miles to meters (1 mile = 1609.34 meters)
+    max_distance_in_meters = user.preferences["max_walking_distance"] * 1609.34
+
+    # Pass the mapped types to get_nearby_places. Later result pages are only fetched until there are
+    # 10 places close enough in a straight line (twice the 5 we show, since some are longer on foot)
+    scraper.get_nearby_places(included_types=google_places_types, max_pages=3, enough=10,
+                              qualifies=lambda place: scraper.straight_line_distance(place) <= max_distance_in_meters)
     
-    # Now calculate walking distances for each place
-    scraper.calculate_walking_distance()
+    # Now calculate walking distances for each place, skipping places that are too far away in a straight line
+    scraper.calculate_walking_distance(max_walking_distance=max_distance_in_meters)
 
-    ranked_places = user.sort_activity_types(scraper.places_data)   
+    ranked_places = user.sort_activity_types(scraper.places_data, k=5)   
     print("\nTop 5 recommendations for you are:")
     for place in ranked_places[:5]:
         # Convert meters to miles (1 mile = 1609.34 meters)
         distance_in_miles = place['walking_distance'] / 1609.34
         #For each stop prints the name, activity type, and distance separated by commas
-        print(f"- {place['name']}, {place['type_of_activity'].title()}, {distance_in_miles:.1f} miles")
\ No newline at end of file
+        print(f"- {place['name']}, {place['type_of_activity'].title()}, {distance_in_miles:.1f} miles")
+
+    #stage timings, API calls, cache hits and the estimated billable usage of this run
+    get_metrics().log_snapshot()
\ No newline at end of file